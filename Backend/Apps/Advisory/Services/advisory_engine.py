@@ -304,8 +304,57 @@ class AdvisoryEngine:
             "confidence": 0.80,
         }
 
+        projections = self._get_field_water_balance(farm_data)
+        if projections:
+            dates = [
+                p["next_irrigation_date"]
+                for p in projections
+                if p.get("next_irrigation_date")
+            ]
+            irrigation_plan["next_irrigation_date"] = min(dates) if dates else None
+            irrigation_plan["irrigation_needed"] = bool(dates)
+            irrigation_plan["field_projections"] = projections
+            irrigation_plan["confidence"] = 0.85
+
         return irrigation_plan
 
+    def _get_field_water_balance(self, farm_data: Dict) -> List[Dict]:
+        """FAO-56 water balance projections for the owner's active fields"""
+        owner_id = farm_data.get("owner_id")
+        if owner_id is None:
+            return []
+
+        try:
+            from Apps.IrrigationAdvisor.models import Field
+            from Apps.IrrigationAdvisor.water_balance import WaterBalanceSimulator
+
+            field_ids = list(
+                Field.objects.filter(user_id=owner_id, is_active=True).values_list(
+                    "id", flat=True
+                )
+            )
+            if not field_ids:
+                return []
+
+            projections = WaterBalanceSimulator().project(field_ids, days=7)
+            return [
+                {
+                    key: projection.get(key)
+                    for key in (
+                        "field_id",
+                        "field_name",
+                        "status",
+                        "next_irrigation_date",
+                        "irrigation_events",
+                    )
+                }
+                for projection in projections.values()
+                if projection.get("status") == "ok"
+            ]
+        except Exception as e:
+            logger.warning(f"Water balance projection unavailable: {e}")
+            return []
+
     def _get_market_analysis(self, farm_data: Dict) -> Dict:
         """Get market analysis and price recommendations (Mock implementation)"""
 
@@ -261,6 +261,7 @@ class FarmViewSet(viewsets.ModelViewSet, TokenAuthenticationMixin):
             farm_data = {
                 "id": str(farm.id),
                 "name": farm.name,
+                "owner_id": farm.owner_id,
                 "latitude": farm.latitude,
                 "longitude": farm.longitude,
                 "total_area": farm.total_area,
@@ -1200,6 +1201,7 @@ class StandaloneAdvisoryView(APIView, TokenAuthenticationMixin):
             farm_data = {
                 "id": str(farm.id),
                 "name": farm.name,
+                "owner_id": farm.owner_id,
                 "latitude": farm.latitude,
                 "longitude": farm.longitude,
                 "total_area": farm.total_area,
@@ -14,6 +14,7 @@ from django.conf import settings
 import logging
 import os
 from datetime import datetime, timedelta
+from Apps.WeatherIntegration.weather_surface import get_weather_surface
 
 logger = logging.getLogger(__name__)
 
@@ -251,7 +252,26 @@ class YieldPredictor:
 
     def _get_weather_data(self, field):
         """Get weather data for field location"""
-        # This would integrate with weather API
+        try:
+            estimate = get_weather_surface().estimate(
+                field.location_lat, field.location_lon
+            )
+            if estimate and estimate["current"]:
+                current = estimate["current"]
+                forecast_rain = sum(
+                    day["precipitation_amount"] or 0 for day in estimate["forecast"]
+                )
+                return {
+                    "temperature": current["temperature"],
+                    "rainfall": round(forecast_rain, 2),
+                    "humidity": current["humidity"],
+                    "forecast": estimate["forecast"],
+                    "nearest_station_km": estimate["nearest_station_km"],
+                    "is_interpolated": True,
+                }
+        except Exception as e:
+            logger.warning(f"Interpolated weather unavailable: {str(e)}")
+
         return {
             "temperature": 25,
             "rainfall": 800,
@@ -2,10 +2,13 @@ from django.contrib import admin
 from .models import (
     Field,
     SoilMoisture,
+    FieldMoistureState,
     IrrigationSchedule,
     IrrigationHistory,
+    IrrigationDailySummary,
     WaterSource,
     CropWaterRequirement,
+    ScheduleRun,
 )
 
 
@@ -40,6 +43,19 @@ class SoilMoistureAdmin(admin.ModelAdmin):
     date_hierarchy = "timestamp"
 
 
+@admin.register(FieldMoistureState)
+class FieldMoistureStateAdmin(admin.ModelAdmin):
+    list_display = (
+        "field",
+        "last_timestamp",
+        "last_moisture",
+        "depletion_rate",
+        "days_to_critical",
+    )
+    search_fields = ("field__name",)
+    readonly_fields = ("updated_at",)
+
+
 @admin.register(IrrigationSchedule)
 class IrrigationScheduleAdmin(admin.ModelAdmin):
     list_display = (
@@ -70,6 +86,14 @@ class IrrigationHistoryAdmin(admin.ModelAdmin):
     date_hierarchy = "irrigation_date"
 
 
+@admin.register(IrrigationDailySummary)
+class IrrigationDailySummaryAdmin(admin.ModelAdmin):
+    list_display = ("field", "date", "event_count", "total_water", "total_duration")
+    list_filter = ("date",)
+    search_fields = ("field__name",)
+    date_hierarchy = "date"
+
+
 @admin.register(WaterSource)
 class WaterSourceAdmin(admin.ModelAdmin):
     list_display = (
@@ -95,3 +119,17 @@ class CropWaterRequirementAdmin(admin.ModelAdmin):
     )
     list_filter = ("crop_name", "growth_stage")
     search_fields = ("crop_name",)
+
+
+@admin.register(ScheduleRun)
+class ScheduleRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "run_date",
+        "status",
+        "total_cells",
+        "fields_processed",
+        "schedules_created",
+        "finished_at",
+    )
+    list_filter = ("status",)
+    readonly_fields = ("started_at", "finished_at")
@@ -5,3 +5,6 @@ class IrrigationAdvisorConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "Apps.IrrigationAdvisor"
     verbose_name = "Irrigation Advisor"
+
+    def ready(self):
+        import Apps.IrrigationAdvisor.signals
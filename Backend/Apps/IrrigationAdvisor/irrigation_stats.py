@@ -0,0 +1,224 @@
+import logging
+from decimal import Decimal
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Avg,
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Max,
+    Min,
+    Q,
+    Sum,
+)
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from .models import IrrigationDailySummary, IrrigationHistory
+
+logger = logging.getLogger(__name__)
+
+GROUP_BY_TRUNC = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+
+# Moisture gain per 1000 liters; events without both readings are left out
+EFFICIENCY = ExpressionWrapper(
+    (F("moisture_after") - F("moisture_before")) * 1000.0 / F("water_used"),
+    output_field=FloatField(),
+)
+HAS_EFFICIENCY = Q(moisture_before__gt=0, moisture_after__gt=0, water_used__gt=0)
+
+
+def summary_enabled() -> bool:
+    """Whether statistics are served from IrrigationDailySummary"""
+    return getattr(settings, "IRRIGATION_DAILY_SUMMARY", False)
+
+
+def history_efficiency(history: IrrigationHistory) -> Optional[float]:
+    if history.moisture_before and history.moisture_after and history.water_used > 0:
+        return (
+            (history.moisture_after - history.moisture_before)
+            / history.water_used
+            * 1000
+        )
+    return None
+
+
+class IrrigationStatistics:
+    """Irrigation history aggregates computed by the database.
+
+    Reads either the raw history or, with summary=True, the per-field daily
+    summary rows, which hold the same totals with far fewer rows.
+    """
+
+    def __init__(self, summary: Optional[bool] = None):
+        self.summary = summary_enabled() if summary is None else summary
+
+    def statistics(self, user, start_date, field_id=None) -> Dict:
+        """Totals, averages and efficiency range since start_date"""
+        if self.summary:
+            queryset = IrrigationDailySummary.objects.filter(
+                field__user=user, date__gte=start_date
+            )
+            if field_id:
+                queryset = queryset.filter(field_id=field_id)
+            totals = queryset.aggregate(
+                events=Sum("event_count"),
+                water=Sum("total_water"),
+                duration=Sum("total_duration"),
+                cost=Sum("total_cost"),
+                energy=Sum("total_energy"),
+                efficiency_count=Sum("efficiency_count"),
+                efficiency_sum=Sum("efficiency_sum"),
+                efficiency_max=Max("efficiency_max"),
+                efficiency_min=Min("efficiency_min"),
+            )
+            events = totals["events"] or 0
+            efficiency_count = totals["efficiency_count"] or 0
+            stats = {
+                "total_events": events,
+                "total_water": totals["water"],
+                "avg_water": totals["water"] / events if events else None,
+                "total_duration": totals["duration"],
+                "avg_duration": totals["duration"] / events if events else None,
+                "total_cost": totals["cost"],
+                "total_energy": totals["energy"],
+                "avg_efficiency": (
+                    totals["efficiency_sum"] / efficiency_count
+                    if efficiency_count
+                    else None
+                ),
+                "max_efficiency": totals["efficiency_max"],
+                "min_efficiency": totals["efficiency_min"],
+            }
+        else:
+            queryset = IrrigationHistory.objects.filter(
+                field__user=user, irrigation_date__gte=start_date
+            )
+            if field_id:
+                queryset = queryset.filter(field_id=field_id)
+            stats = queryset.aggregate(
+                total_events=Count("id"),
+                total_water=Sum("water_used"),
+                avg_water=Avg("water_used"),
+                total_duration=Sum("actual_duration"),
+                avg_duration=Avg("actual_duration"),
+                total_cost=Sum("cost"),
+                total_energy=Sum("energy_consumed"),
+                avg_efficiency=Avg(EFFICIENCY, filter=HAS_EFFICIENCY),
+                max_efficiency=Max(EFFICIENCY, filter=HAS_EFFICIENCY),
+                min_efficiency=Min(EFFICIENCY, filter=HAS_EFFICIENCY),
+            )
+
+        # Efficiency keys are only reported when some event had readings
+        if stats["avg_efficiency"] is None:
+            for key in ("avg_efficiency", "max_efficiency", "min_efficiency"):
+                stats.pop(key)
+        return stats
+
+    def consumption(self, user, start_date, group_by: str = "day") -> List[Dict]:
+        """Water used and events per day, week or month since start_date"""
+        trunc = GROUP_BY_TRUNC[group_by]
+        if self.summary:
+            queryset = IrrigationDailySummary.objects.filter(
+                field__user=user, date__gte=start_date
+            )
+            rows = (
+                queryset.annotate(period=trunc("date"))
+                .values("period")
+                .annotate(
+                    total_water=Sum("total_water"), event_count=Sum("event_count")
+                )
+            )
+        else:
+            queryset = IrrigationHistory.objects.filter(
+                field__user=user, irrigation_date__gte=start_date
+            )
+            rows = (
+                queryset.annotate(period=trunc("irrigation_date"))
+                .values("period")
+                .annotate(total_water=Sum("water_used"), event_count=Count("id"))
+            )
+
+        return [
+            {
+                "date": entry["period"].isoformat(),
+                "water_used": entry["total_water"],
+                "events": entry["event_count"],
+            }
+            for entry in rows.order_by("period")
+        ]
+
+
+def record_execution(history: IrrigationHistory):
+    """Fold a newly executed irrigation into its field's daily summary"""
+    efficiency = history_efficiency(history)
+    with transaction.atomic():
+        summary, _ = IrrigationDailySummary.objects.select_for_update().get_or_create(
+            field_id=history.field_id, date=history.irrigation_date
+        )
+        summary.event_count += 1
+        summary.total_water += history.water_used
+        summary.total_duration += history.actual_duration
+        if history.cost is not None:
+            summary.total_cost = (summary.total_cost or 0) + Decimal(str(history.cost))
+        if history.energy_consumed is not None:
+            summary.total_energy = (summary.total_energy or 0) + history.energy_consumed
+        if efficiency is not None:
+            summary.efficiency_count += 1
+            summary.efficiency_sum += efficiency
+            if summary.efficiency_min is None or efficiency < summary.efficiency_min:
+                summary.efficiency_min = efficiency
+            if summary.efficiency_max is None or efficiency > summary.efficiency_max:
+                summary.efficiency_max = efficiency
+        summary.save()
+
+
+def rebuild_daily_summary(field_ids: Optional[List[int]] = None) -> int:
+    """Recompute daily summaries from the full history; returns rows written"""
+    history = IrrigationHistory.objects.all()
+    summaries = IrrigationDailySummary.objects.all()
+    if field_ids is not None:
+        history = history.filter(field_id__in=field_ids)
+        summaries = summaries.filter(field_id__in=field_ids)
+
+    rows = (
+        history.values("field_id", "irrigation_date")
+        .annotate(
+            event_count=Count("id"),
+            total_water=Sum("water_used"),
+            total_duration=Sum("actual_duration"),
+            total_cost=Sum("cost"),
+            total_energy=Sum("energy_consumed"),
+            efficiency_count=Count("id", filter=HAS_EFFICIENCY),
+            efficiency_sum=Sum(EFFICIENCY, filter=HAS_EFFICIENCY),
+            efficiency_min=Min(EFFICIENCY, filter=HAS_EFFICIENCY),
+            efficiency_max=Max(EFFICIENCY, filter=HAS_EFFICIENCY),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        summaries.delete()
+        created = IrrigationDailySummary.objects.bulk_create(
+            [
+                IrrigationDailySummary(
+                    field_id=row["field_id"],
+                    date=row["irrigation_date"],
+                    event_count=row["event_count"],
+                    total_water=row["total_water"] or 0,
+                    total_duration=row["total_duration"] or 0,
+                    total_cost=row["total_cost"],
+                    total_energy=row["total_energy"],
+                    efficiency_count=row["efficiency_count"],
+                    efficiency_sum=row["efficiency_sum"] or 0,
+                    efficiency_min=row["efficiency_min"],
+                    efficiency_max=row["efficiency_max"],
+                )
+                for row in rows.iterator()
+            ],
+            batch_size=1000,
+        )
+
+    logger.info(f"Rebuilt {len(created)} daily irrigation summaries")
+    return len(created)
@@ -0,0 +1,63 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from Apps.IrrigationAdvisor.schedule_precompute import SchedulePrecomputer
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute irrigation schedules for all active fields, one forecast per "
+        "weather grid cell; an interrupted run resumes where it stopped"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=7, help="Planning horizon (days)"
+        )
+        parser.add_argument(
+            "--date", help="First scheduled day as YYYY-MM-DD (default: today)"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Worker processes (default: CPU count, 1 runs in-process)",
+        )
+        parser.add_argument(
+            "--priority-mode",
+            default="balanced",
+            choices=["balanced", "water_saving", "crop_yield"],
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Recompute every cell even if the run already progressed",
+        )
+
+    def handle(self, *args, **options):
+        run_date = None
+        if options["date"]:
+            try:
+                run_date = date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("--date must be YYYY-MM-DD")
+
+        summary = SchedulePrecomputer(
+            days=options["days"],
+            priority_mode=options["priority_mode"],
+            workers=options["workers"],
+        ).run(run_date=run_date, restart=options["restart"])
+
+        if summary["skipped"]:
+            self.stdout.write(
+                f"Schedules for {summary['run_date']} already precomputed "
+                "(use --restart to recompute)"
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Precomputed {summary['schedules']} schedules for "
+                f"{summary['fields']} fields in {summary['cells']} cells "
+                f"({'resumed, ' if summary['resumed'] else ''}"
+                f"{summary['seconds']}s)"
+            )
+        )
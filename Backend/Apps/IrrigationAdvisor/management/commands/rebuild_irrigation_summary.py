@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from Apps.IrrigationAdvisor.irrigation_stats import rebuild_daily_summary
+
+
+class Command(BaseCommand):
+    help = "Recompute per-field daily irrigation summaries from the full history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--field",
+            type=int,
+            action="append",
+            dest="field_ids",
+            help="Only rebuild these field ids (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_daily_summary(options["field_ids"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {written} daily irrigation summaries")
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from Apps.IrrigationAdvisor.moisture_state import MoistureStateTracker
+
+
+class Command(BaseCommand):
+    help = "Recompute per-field moisture state from the full reading history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--field",
+            type=int,
+            action="append",
+            dest="field_ids",
+            help="Only rebuild these field ids (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        processed = MoistureStateTracker().rebuild(options["field_ids"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt moisture state from {processed} readings")
+        )
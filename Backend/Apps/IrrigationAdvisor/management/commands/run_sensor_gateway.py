@@ -0,0 +1,92 @@
+import signal
+import threading
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from Apps.IrrigationAdvisor.sensor_gateway import (
+    SensorGateway,
+    DEFAULT_HOST,
+    DEFAULT_FLUSH_SIZE,
+    DEFAULT_FLUSH_INTERVAL,
+    DEFAULT_QUEUE_SIZE,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the buffered soil moisture sensor gateway (NDJSON over TCP/UDP). "
+        "Listens on localhost unless SENSOR_GATEWAY_TOKEN (or --token) is set; "
+        "sensors then send the token as the first line of each connection or "
+        "datagram."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--host",
+            default=DEFAULT_HOST,
+            help="Address to listen on; other than localhost requires a token",
+        )
+        parser.add_argument(
+            "--token",
+            default=getattr(settings, "SENSOR_GATEWAY_TOKEN", ""),
+            help="Shared token sensors must send (default: SENSOR_GATEWAY_TOKEN)",
+        )
+        parser.add_argument(
+            "--user",
+            help="Username readings are ingested for; only their fields accepted",
+        )
+        parser.add_argument("--tcp-port", type=int, default=9020)
+        parser.add_argument("--udp-port", type=int, default=9021)
+        parser.add_argument(
+            "--spool-dir",
+            default=str(settings.BASE_DIR / "Spool" / "sensors"),
+            help="Directory for crash-safe spool segments",
+        )
+        parser.add_argument("--flush-size", type=int, default=DEFAULT_FLUSH_SIZE)
+        parser.add_argument(
+            "--flush-interval", type=float, default=DEFAULT_FLUSH_INTERVAL
+        )
+        parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        gateway = SensorGateway(
+            spool_dir=options["spool_dir"],
+            flush_size=options["flush_size"],
+            flush_interval=options["flush_interval"],
+            queue_size=options["queue_size"],
+            token=options["token"] or None,
+            user=user,
+        )
+
+        stop_requested = threading.Event()
+        signal.signal(signal.SIGINT, lambda *_: stop_requested.set())
+        signal.signal(signal.SIGTERM, lambda *_: stop_requested.set())
+
+        try:
+            gateway.start(
+                host=options["host"],
+                tcp_port=options["tcp_port"],
+                udp_port=options["udp_port"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Sensor gateway running (tcp {options['tcp_port']}, "
+                f"udp {options['udp_port']}); press Ctrl+C to stop"
+            )
+        )
+
+        while not stop_requested.wait(60):
+            self.stdout.write(f"Gateway stats: {gateway.stats}")
+
+        self.stdout.write("Draining buffered readings...")
+        gateway.stop()
+        self.stdout.write(self.style.SUCCESS(f"Gateway stopped: {gateway.stats}"))
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.11 on 2026-10-19 03:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("IrrigationAdvisor", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FieldMoistureState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("reading_count", models.IntegerField(default=0)),
+                ("last_timestamp", models.DateTimeField(blank=True, null=True)),
+                ("last_moisture", models.FloatField(blank=True, null=True)),
+                ("sum_weight", models.FloatField(default=0)),
+                ("sum_x", models.FloatField(default=0)),
+                ("sum_y", models.FloatField(default=0)),
+                ("sum_xx", models.FloatField(default=0)),
+                ("sum_xy", models.FloatField(default=0)),
+                (
+                    "depletion_rate",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Regression depletion rate in % per day",
+                        null=True,
+                    ),
+                ),
+                (
+                    "depletion_rate_ewma",
+                    models.FloatField(
+                        blank=True,
+                        help_text="EWMA of pairwise depletion in % per day",
+                        null=True,
+                    ),
+                ),
+                ("critical_level", models.FloatField(blank=True, null=True)),
+                ("days_to_critical", models.FloatField(blank=True, null=True)),
+                ("critical_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "field",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="moisture_state",
+                        to="IrrigationAdvisor.field",
+                    ),
+                ),
+            ],
+        ),
+    ]
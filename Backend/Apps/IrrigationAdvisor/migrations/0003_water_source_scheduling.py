@@ -0,0 +1,48 @@
+# Generated by Django 4.2.11 on 2026-10-19 04:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("IrrigationAdvisor", "0002_fieldmoisturestate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="field",
+            name="water_source",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="fields",
+                to="IrrigationAdvisor.watersource",
+            ),
+        ),
+        migrations.AddField(
+            model_name="watersource",
+            name="flow_capacity",
+            field=models.FloatField(
+                blank=True,
+                help_text="Maximum delivery flow in liters per minute",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="watersource",
+            name="pump_available_from",
+            field=models.TimeField(
+                blank=True, help_text="Start of the daily pumping window", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="watersource",
+            name="pump_available_until",
+            field=models.TimeField(
+                blank=True, help_text="End of the daily pumping window", null=True
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.11 on 2026-10-19 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("IrrigationAdvisor", "0003_water_source_scheduling"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduleRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("run_date", models.DateField(unique=True)),
+                ("horizon_days", models.IntegerField(default=7)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="running",
+                        max_length=20,
+                    ),
+                ),
+                ("total_cells", models.IntegerField(default=0)),
+                (
+                    "completed_cells",
+                    models.JSONField(
+                        default=list, help_text="Weather grid cells already written"
+                    ),
+                ),
+                ("fields_processed", models.IntegerField(default=0)),
+                ("schedules_created", models.IntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("started_at", models.DateTimeField(auto_now_add=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["-run_date"],
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.11 on 2026-10-19 03:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("IrrigationAdvisor", "0004_schedulerun"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IrrigationDailySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("event_count", models.IntegerField(default=0)),
+                (
+                    "total_water",
+                    models.FloatField(default=0, help_text="Water used in liters"),
+                ),
+                (
+                    "total_duration",
+                    models.IntegerField(default=0, help_text="Duration in minutes"),
+                ),
+                (
+                    "total_cost",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=12, null=True
+                    ),
+                ),
+                (
+                    "total_energy",
+                    models.FloatField(blank=True, help_text="Energy in kWh", null=True),
+                ),
+                (
+                    "efficiency_count",
+                    models.IntegerField(
+                        default=0, help_text="Events with moisture before and after"
+                    ),
+                ),
+                ("efficiency_sum", models.FloatField(default=0)),
+                ("efficiency_min", models.FloatField(blank=True, null=True)),
+                ("efficiency_max", models.FloatField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "field",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_irrigation",
+                        to="IrrigationAdvisor.field",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-date"],
+                "unique_together": {("field", "date")},
+            },
+        ),
+    ]
@@ -33,6 +33,13 @@ class Field(models.Model):
     elevation = models.FloatField(
         null=True, blank=True, help_text="Elevation in meters"
     )
+    water_source = models.ForeignKey(
+        "WaterSource",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="fields",
+    )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -81,6 +88,42 @@ class SoilMoisture(models.Model):
         return f"{self.field.name} - {self.timestamp} - {self.moisture_level}%"
 
 
+class FieldMoistureState(models.Model):
+    """Incrementally maintained moisture summary for a field.
+
+    Regression sums are exponentially decayed with reading age and centred on
+    the latest reading, so the slope tracks recent behaviour.
+    """
+
+    field = models.OneToOneField(
+        Field, on_delete=models.CASCADE, related_name="moisture_state"
+    )
+    reading_count = models.IntegerField(default=0)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    last_moisture = models.FloatField(null=True, blank=True)
+
+    # Weighted sums of x (days relative to last_timestamp) and y (moisture)
+    sum_weight = models.FloatField(default=0)
+    sum_x = models.FloatField(default=0)
+    sum_y = models.FloatField(default=0)
+    sum_xx = models.FloatField(default=0)
+    sum_xy = models.FloatField(default=0)
+
+    depletion_rate = models.FloatField(
+        null=True, blank=True, help_text="Regression depletion rate in % per day"
+    )
+    depletion_rate_ewma = models.FloatField(
+        null=True, blank=True, help_text="EWMA of pairwise depletion in % per day"
+    )
+    critical_level = models.FloatField(null=True, blank=True)
+    days_to_critical = models.FloatField(null=True, blank=True)
+    critical_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.field.name} - {self.last_moisture}% at {self.last_timestamp}"
+
+
 class IrrigationSchedule(models.Model):
     """Irrigation schedule for fields"""
 
@@ -171,6 +214,36 @@ class IrrigationHistory(models.Model):
         return f"{self.field.name} - {self.irrigation_date}"
 
 
+class IrrigationDailySummary(models.Model):
+    """Per-field daily totals of irrigation history, kept current on execute"""
+
+    field = models.ForeignKey(
+        Field, on_delete=models.CASCADE, related_name="daily_irrigation"
+    )
+    date = models.DateField()
+    event_count = models.IntegerField(default=0)
+    total_water = models.FloatField(default=0, help_text="Water used in liters")
+    total_duration = models.IntegerField(default=0, help_text="Duration in minutes")
+    total_cost = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True
+    )
+    total_energy = models.FloatField(null=True, blank=True, help_text="Energy in kWh")
+    efficiency_count = models.IntegerField(
+        default=0, help_text="Events with moisture before and after"
+    )
+    efficiency_sum = models.FloatField(default=0)
+    efficiency_min = models.FloatField(null=True, blank=True)
+    efficiency_max = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-date"]
+        unique_together = ["field", "date"]
+
+    def __str__(self):
+        return f"{self.field.name} - {self.date} ({self.event_count} events)"
+
+
 class WaterSource(models.Model):
     """Water sources for irrigation"""
 
@@ -203,6 +276,15 @@ class WaterSource(models.Model):
     location_lon = models.FloatField(
         validators=[MinValueValidator(-180), MaxValueValidator(180)]
     )
+    flow_capacity = models.FloatField(
+        null=True, blank=True, help_text="Maximum delivery flow in liters per minute"
+    )
+    pump_available_from = models.TimeField(
+        null=True, blank=True, help_text="Start of the daily pumping window"
+    )
+    pump_available_until = models.TimeField(
+        null=True, blank=True, help_text="End of the daily pumping window"
+    )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -252,3 +334,32 @@ class CropWaterRequirement(models.Model):
 
     def __str__(self):
         return f"{self.crop_name} - {self.growth_stage}"
+
+
+class ScheduleRun(models.Model):
+    """Progress of a nightly schedule precomputation, one row per run date"""
+
+    STATUS_CHOICES = [
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+
+    run_date = models.DateField(unique=True)
+    horizon_days = models.IntegerField(default=7)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="running")
+    total_cells = models.IntegerField(default=0)
+    completed_cells = models.JSONField(
+        default=list, help_text="Weather grid cells already written"
+    )
+    fields_processed = models.IntegerField(default=0)
+    schedules_created = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-run_date"]
+
+    def __str__(self):
+        return f"Schedule run {self.run_date} ({self.status})"
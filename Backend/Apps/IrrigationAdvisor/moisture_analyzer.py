@@ -1,7 +1,14 @@
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-from .models import Field, SoilMoisture, CropWaterRequirement, IrrigationHistory
+from django.utils import timezone
+from .models import (
+    Field,
+    FieldMoistureState,
+    SoilMoisture,
+    CropWaterRequirement,
+    IrrigationHistory,
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,17 +24,15 @@ class MoistureAnalyzer:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
 
-            moisture_readings = SoilMoisture.objects.filter(
-                field=field, timestamp__range=[start_date, end_date]
-            ).order_by("timestamp")
+            timestamps, moisture_levels = self._load_series(
+                SoilMoisture.objects.filter(
+                    field=field, timestamp__range=[start_date, end_date]
+                ).order_by("timestamp")
+            )
 
-            if not moisture_readings:
+            if not len(moisture_levels):
                 return {"error": "No moisture data available for the specified period"}
 
-            # Extract data for analysis
-            timestamps = [r.timestamp for r in moisture_readings]
-            moisture_levels = [r.moisture_level for r in moisture_readings]
-
             # Calculate statistics
             analysis = {
                 "field": field.name,
@@ -37,15 +42,15 @@ class MoistureAnalyzer:
                     "days": days,
                 },
                 "statistics": {
-                    "current_moisture": moisture_levels[-1] if moisture_levels else 0,
-                    "average_moisture": np.mean(moisture_levels),
-                    "min_moisture": min(moisture_levels),
-                    "max_moisture": max(moisture_levels),
-                    "std_deviation": np.std(moisture_levels),
+                    "current_moisture": float(moisture_levels[-1]),
+                    "average_moisture": float(moisture_levels.mean()),
+                    "min_moisture": float(moisture_levels.min()),
+                    "max_moisture": float(moisture_levels.max()),
+                    "std_deviation": float(moisture_levels.std()),
                     "trend": self._calculate_trend(timestamps, moisture_levels),
                 },
                 "alerts": self._generate_moisture_alerts(
-                    field, moisture_levels[-1] if moisture_levels else 0
+                    field, float(moisture_levels[-1])
                 ),
                 "recommendations": [],
             }
@@ -80,40 +85,35 @@ class MoistureAnalyzer:
     def predict_moisture_depletion(self, field_id: int) -> Dict:
         """Predict when soil moisture will reach critical levels"""
         try:
-            field = Field.objects.get(id=field_id)
+            field = Field.objects.select_related("moisture_state").get(id=field_id)
 
-            # Get recent moisture readings
-            recent_readings = SoilMoisture.objects.filter(field=field).order_by(
-                "-timestamp"
-            )[:10]
-
-            if len(recent_readings) < 2:
+            # Depletion rate is maintained incrementally as readings arrive
+            state = self._get_state(field)
+            if state is None or state.reading_count < 2 or state.depletion_rate is None:
                 return {"error": "Insufficient data for prediction"}
 
-            # Calculate depletion rate
-            timestamps = [r.timestamp for r in reversed(recent_readings)]
-            moisture_levels = [r.moisture_level for r in reversed(recent_readings)]
-
-            depletion_rate = self._calculate_depletion_rate(timestamps, moisture_levels)
+            depletion_rate = state.depletion_rate
 
             # Get crop requirements
             crop_req = self._get_crop_requirements(field.crop_type, field)
             if not crop_req:
                 return {"error": "Crop requirements not configured"}
 
-            current_moisture = moisture_levels[-1]
+            current_moisture = state.last_moisture
             critical_level = crop_req.critical_moisture_level
 
             prediction = {
                 "current_moisture": current_moisture,
                 "critical_level": critical_level,
                 "depletion_rate_per_day": depletion_rate,
+                "depletion_rate_ewma": state.depletion_rate_ewma,
+                "last_reading": state.last_timestamp.isoformat(),
                 "status": "normal",
             }
 
             if current_moisture > critical_level and depletion_rate > 0:
-                days_to_critical = (current_moisture - critical_level) / depletion_rate
-                critical_date = datetime.now() + timedelta(days=days_to_critical)
+                critical_date = self.projected_critical_at(state, critical_level)
+                days_to_critical = self.days_until(critical_date)
 
                 prediction.update(
                     {
@@ -137,6 +137,128 @@ class MoistureAnalyzer:
             logger.error(f"Error predicting moisture depletion: {e}")
             return {"error": str(e)}
 
+    def moisture_status(self, field: Field) -> Dict:
+        """Current moisture status read from the field's incremental state"""
+        state = self._get_state(field)
+        if state is None or state.last_moisture is None:
+            return {
+                "field": field.name,
+                "status": "no_data",
+                "message": "No moisture readings available",
+            }
+
+        current_moisture = state.last_moisture
+        status = {
+            "field": field.name,
+            "last_reading": state.last_timestamp.isoformat(),
+            "statistics": {
+                "current_moisture": current_moisture,
+                "trend": (
+                    "insufficient_data"
+                    if state.depletion_rate is None
+                    else self._trend_label(-state.depletion_rate)
+                ),
+                "depletion_rate_per_day": state.depletion_rate,
+                "depletion_rate_ewma": state.depletion_rate_ewma,
+                "readings": state.reading_count,
+            },
+            "projection": {
+                "critical_level": state.critical_level,
+                "days_to_critical": (
+                    None
+                    if state.critical_at is None
+                    else round(self.days_until(state.critical_at), 1)
+                ),
+                "critical_date": (
+                    state.critical_at.isoformat() if state.critical_at else None
+                ),
+            },
+            "alerts": self._generate_moisture_alerts(field, current_moisture),
+            "recommendations": [],
+        }
+
+        crop_req = self._get_crop_requirements(field.crop_type, field)
+        if crop_req:
+            status["crop_requirements"] = {
+                "optimal_moisture": crop_req.optimal_moisture_level,
+                "critical_moisture": crop_req.critical_moisture_level,
+                "max_moisture": crop_req.max_moisture_level,
+            }
+            status["recommendations"] = self._generate_recommendations(
+                current_moisture, crop_req
+            )
+
+        return status
+
+    def analyze_many(self, field_ids: List[int], days: int = 7) -> Dict[int, Dict]:
+        """Moisture statistics, trend and depletion rate for many fields.
+
+        Readings of every field are fetched in one query and grouped in NumPy.
+        Fields without readings in the period are reported with "no_data".
+        """
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+
+        rows = list(
+            SoilMoisture.objects.filter(
+                field_id__in=field_ids, timestamp__range=[start_date, end_date]
+            )
+            .order_by("field_id", "timestamp")
+            .values_list("field_id", "timestamp", "moisture_level")
+        )
+        results = {
+            field_id: {"field_id": field_id, "status": "no_data"}
+            for field_id in field_ids
+        }
+        if not rows:
+            return results
+
+        count = len(rows)
+        fields = np.fromiter((r[0] for r in rows), dtype=np.int64, count=count)
+        timestamps = (
+            np.fromiter((r[1].timestamp() for r in rows), dtype=np.float64, count=count)
+            / 86400
+        )
+        levels = np.fromiter((r[2] for r in rows), dtype=np.float64, count=count)
+
+        # Contiguous group per field
+        starts = np.flatnonzero(np.r_[True, fields[1:] != fields[:-1]])
+        ends = np.r_[starts[1:], count]
+        sizes = ends - starts
+        group = np.repeat(np.arange(len(starts)), sizes)
+
+        means = np.add.reduceat(levels, starts) / sizes
+        variances = np.add.reduceat((levels - means[group]) ** 2, starts) / sizes
+        minimums = np.minimum.reduceat(levels, starts)
+        maximums = np.maximum.reduceat(levels, starts)
+
+        positions = np.arange(count, dtype=np.float64) - starts[group]
+        trend_slopes = self._least_squares_slopes(positions, levels, starts)
+        time_slopes = self._least_squares_slopes(
+            timestamps - timestamps[starts][group], levels, starts
+        )
+
+        for i, field_id in enumerate(fields[starts].tolist()):
+            results[field_id] = {
+                "field_id": field_id,
+                "status": "ok",
+                "readings": int(sizes[i]),
+                "last_reading": rows[ends[i] - 1][1].isoformat(),
+                "statistics": {
+                    "current_moisture": float(levels[ends[i] - 1]),
+                    "average_moisture": float(means[i]),
+                    "min_moisture": float(minimums[i]),
+                    "max_moisture": float(maximums[i]),
+                    "std_deviation": float(np.sqrt(variances[i])),
+                    "trend": self._trend_label(trend_slopes[i]),
+                    "depletion_rate_per_day": (
+                        0 if np.isnan(time_slopes[i]) else float(-time_slopes[i])
+                    ),
+                },
+            }
+
+        return results
+
     def calculate_evapotranspiration(
         self, field_id: int, date: datetime = None
     ) -> Dict:
@@ -182,16 +304,55 @@ class MoistureAnalyzer:
             logger.error(f"Error calculating ET: {e}")
             return {"error": str(e)}
 
-    def _calculate_trend(self, timestamps: List[datetime], values: List[float]) -> str:
+    def _load_series(self, readings) -> Tuple[np.ndarray, np.ndarray]:
+        """Load (timestamp, moisture_level) pairs into arrays.
+
+        Timestamps are returned as fractional days since the epoch.
+        """
+        rows = list(readings.values_list("timestamp", "moisture_level"))
+        timestamps = np.fromiter(
+            (row[0].timestamp() for row in rows), dtype=np.float64, count=len(rows)
+        )
+        levels = np.fromiter(
+            (row[1] for row in rows), dtype=np.float64, count=len(rows)
+        )
+        return timestamps / 86400, levels
+
+    def _calculate_trend(self, timestamps: np.ndarray, values: np.ndarray) -> str:
         """Calculate trend from time series data"""
         if len(values) < 2:
             return "insufficient_data"
 
-        # Simple linear regression
-        x = np.arange(len(values))
-        coefficients = np.polyfit(x, values, 1)
-        slope = coefficients[0]
-
+        # Least-squares slope per reading
+        slope = self._least_squares_slopes(
+            np.arange(len(values), dtype=np.float64), values, np.array([0])
+        )[0]
+        return self._trend_label(slope)
+
+    @staticmethod
+    def _least_squares_slopes(
+        x: np.ndarray, y: np.ndarray, starts: np.ndarray
+    ) -> np.ndarray:
+        """Slope of y over x for each contiguous group beginning at starts.
+
+        Groups with fewer than two points or no spread in x get NaN.
+        """
+        n = np.diff(np.r_[starts, len(x)]).astype(np.float64)
+        sum_x = np.add.reduceat(x, starts)
+        sum_y = np.add.reduceat(y, starts)
+        sum_xx = np.add.reduceat(x * x, starts)
+        sum_xy = np.add.reduceat(x * y, starts)
+
+        denominator = n * sum_xx - sum_x**2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slopes = (n * sum_xy - sum_x * sum_y) / denominator
+        slopes[(n < 2) | np.isclose(denominator, 0)] = np.nan
+        return slopes
+
+    @staticmethod
+    def _trend_label(slope: float) -> str:
+        if np.isnan(slope):
+            return "insufficient_data"
         if abs(slope) < 0.1:
             return "stable"
         elif slope > 0:
@@ -199,25 +360,35 @@ class MoistureAnalyzer:
         else:
             return "decreasing"
 
-    def _calculate_depletion_rate(
-        self, timestamps: List[datetime], moisture_levels: List[float]
-    ) -> float:
-        """Calculate moisture depletion rate per day"""
-        if len(moisture_levels) < 2:
-            return 0
-
-        # Calculate daily changes
-        daily_changes = []
-        for i in range(1, len(moisture_levels)):
-            time_diff = (
-                timestamps[i] - timestamps[i - 1]
-            ).total_seconds() / 86400  # Days
-            moisture_diff = moisture_levels[i - 1] - moisture_levels[i]  # Depletion
-
-            if time_diff > 0:
-                daily_changes.append(moisture_diff / time_diff)
-
-        return np.mean(daily_changes) if daily_changes else 0
+    @staticmethod
+    def projected_critical_at(
+        state: FieldMoistureState, critical_level: float
+    ) -> Optional[datetime]:
+        """When moisture projected from the last reading reaches critical_level"""
+        if state.last_moisture <= critical_level:
+            return state.last_timestamp
+        if not state.depletion_rate or state.depletion_rate <= 0:
+            return None
+        days = (state.last_moisture - critical_level) / state.depletion_rate
+        return state.last_timestamp + timedelta(days=days)
+
+    @staticmethod
+    def days_until(critical_at: Optional[datetime]) -> Optional[float]:
+        """Days from now until critical_at, 0 once it has passed.
+
+        The state is projected from its last reading, so a quiet sensor
+        counts down rather than repeating the same days_to_critical.
+        """
+        if critical_at is None:
+            return None
+        return max((critical_at - timezone.now()).total_seconds() / 86400, 0.0)
+
+    @staticmethod
+    def _get_state(field: Field) -> Optional[FieldMoistureState]:
+        try:
+            return field.moisture_state
+        except FieldMoistureState.DoesNotExist:
+            return None
 
     def _get_crop_requirements(
         self, crop_name: str, field: Field
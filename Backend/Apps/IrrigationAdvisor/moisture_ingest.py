@@ -0,0 +1,269 @@
+import csv
+import json
+import logging
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import Field, SoilMoisture
+from .moisture_state import MoistureStateTracker
+
+logger = logging.getLogger(__name__)
+
+READING_COLUMNS = [
+    "field",
+    "timestamp",
+    "moisture_level",
+    "depth",
+    "temperature",
+    "ph_level",
+    "electrical_conductivity",
+]
+NUMERIC_COLUMNS = [
+    "moisture_level",
+    "depth",
+    "temperature",
+    "ph_level",
+    "electrical_conductivity",
+]
+# (min, max) bounds mirroring the SoilMoisture validators
+RANGES = {"moisture_level": (0, 100), "ph_level": (0, 14)}
+DEFAULT_DEPTH = 30.0
+
+BATCH_SIZE = 5000
+INSERT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+IDEMPOTENCY_TIMEOUT = 86400  # Replay results for a day
+IDEMPOTENCY_PENDING = "pending"
+
+
+class IngestInProgress(Exception):
+    """Raised when a request with the same idempotency key is still running"""
+
+
+class MoistureIngestor:
+    """Batched validation and bulk insertion of soil moisture readings"""
+
+    def __init__(self, user=None, batch_size: int = BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+
+    def ingest_stream(
+        self, stream, content_type: str, idempotency_key: Optional[str] = None
+    ) -> Dict:
+        """Ingest an NDJSON or CSV byte stream"""
+        if "csv" in content_type:
+            records = self._iter_csv(stream)
+        else:
+            records = self._iter_ndjson(stream)
+        return self.ingest_records(records, idempotency_key)
+
+    def ingest_records(
+        self, records: Iterable[Tuple[int, Dict]], idempotency_key: Optional[str] = None
+    ) -> Dict:
+        """Ingest (row_number, reading) pairs; returns counts and per-row errors"""
+        cache_key = None
+        if idempotency_key:
+            cache_key = self._idempotency_cache_key(idempotency_key)
+            if not cache.add(cache_key, IDEMPOTENCY_PENDING, IDEMPOTENCY_TIMEOUT):
+                previous = cache.get(cache_key)
+                if previous == IDEMPOTENCY_PENDING:
+                    raise IngestInProgress(idempotency_key)
+                if previous is not None:
+                    return dict(previous, replayed=True)
+                cache.set(cache_key, IDEMPOTENCY_PENDING, IDEMPOTENCY_TIMEOUT)
+
+        started = time.perf_counter()
+        result = {"received": 0, "created": 0, "error_count": 0, "errors": []}
+
+        try:
+            for batch in self._batched(records):
+                created, errors = self._ingest_batch(batch)
+                result["received"] += len(batch)
+                result["created"] += created
+                result["error_count"] += len(errors)
+                room = MAX_REPORTED_ERRORS - len(result["errors"])
+                if room > 0:
+                    result["errors"].extend(errors[:room])
+        except Exception:
+            if cache_key:
+                cache.delete(cache_key)
+            raise
+
+        elapsed = time.perf_counter() - started
+        result["elapsed_seconds"] = round(elapsed, 3)
+        result["rows_per_second"] = (
+            round(result["received"] / elapsed) if elapsed > 0 else result["received"]
+        )
+        result["errors_truncated"] = result["error_count"] > len(result["errors"])
+
+        if cache_key:
+            cache.set(cache_key, result, IDEMPOTENCY_TIMEOUT)
+
+        logger.info(
+            f"Ingested {result['created']}/{result['received']} moisture readings "
+            f"in {elapsed:.2f}s"
+        )
+        return result
+
+    def _ingest_batch(self, batch: List[Tuple[int, Dict]]) -> Tuple[int, List[Dict]]:
+        row_numbers = np.array([row for row, _ in batch])
+        frame = pd.DataFrame.from_records(
+            [record or {} for _, record in batch], columns=READING_COLUMNS
+        )
+        errors = {}
+
+        def reject(mask: np.ndarray, column: str, message: str):
+            for row in row_numbers[mask]:
+                errors.setdefault(int(row), {}).setdefault(column, []).append(message)
+
+        malformed = np.array([record is None for _, record in batch])
+        reject(malformed, "non_field_errors", "Row could not be parsed.")
+
+        # Field ownership: one query for every field referenced by the batch
+        field_ids = pd.to_numeric(frame["field"], errors="coerce")
+        reject(field_ids.isna().to_numpy(), "field", "A valid field id is required.")
+        allowed = Field.objects.filter(id__in=field_ids.dropna().unique().tolist())
+        if self.user is not None and self.user.is_authenticated:
+            allowed = allowed.filter(user=self.user)
+        allowed_ids = set(allowed.values_list("id", flat=True))
+        unknown = field_ids.notna() & ~field_ids.isin(allowed_ids)
+        reject(unknown.to_numpy(), "field", "Field does not exist.")
+
+        timestamps = self._parse_timestamps(frame["timestamp"])
+        reject(
+            timestamps.isna().to_numpy(),
+            "timestamp",
+            "A valid ISO 8601 timestamp is required.",
+        )
+
+        numeric = {}
+        for column in NUMERIC_COLUMNS:
+            raw = frame[column]
+            values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64)
+            provided = raw.notna().to_numpy() & (raw.astype(str) != "").to_numpy()
+            reject(provided & np.isnan(values), column, "A valid number is required.")
+            if column == "moisture_level":
+                reject(~provided, column, "This field is required.")
+            if column in RANGES:
+                low, high = RANGES[column]
+                reject(
+                    ~np.isnan(values) & ((values < low) | (values > high)),
+                    column,
+                    f"Ensure this value is between {low} and {high}.",
+                )
+            numeric[column] = values
+
+        valid = ~np.isin(row_numbers, list(errors.keys()))
+        indices = np.flatnonzero(valid)
+
+        # Convert the surviving rows to Python scalars column by column
+        depth = np.where(np.isnan(numeric["depth"]), DEFAULT_DEPTH, numeric["depth"])
+        columns = zip(
+            field_ids.to_numpy()[indices].astype(np.int64).tolist(),
+            timestamps.iloc[indices].dt.to_pydatetime().tolist(),
+            numeric["moisture_level"][indices].tolist(),
+            depth[indices].tolist(),
+            self._optional_list(numeric["temperature"][indices]),
+            self._optional_list(numeric["ph_level"][indices]),
+            self._optional_list(numeric["electrical_conductivity"][indices]),
+        )
+        readings = [
+            SoilMoisture(
+                field_id=field_id,
+                timestamp=timestamp,
+                moisture_level=moisture_level,
+                depth=reading_depth,
+                temperature=temperature,
+                ph_level=ph_level,
+                electrical_conductivity=conductivity,
+            )
+            for (
+                field_id,
+                timestamp,
+                moisture_level,
+                reading_depth,
+                temperature,
+                ph_level,
+                conductivity,
+            ) in columns
+        ]
+
+        with transaction.atomic():
+            SoilMoisture.objects.bulk_create(readings, batch_size=INSERT_CHUNK_SIZE)
+            # bulk_create skips post_save, so fold the batch into field state here
+            MoistureStateTracker().apply(readings)
+
+        error_list = [
+            {"row": row, "errors": row_errors}
+            for row, row_errors in sorted(errors.items())
+        ]
+        return len(readings), error_list
+
+    @staticmethod
+    def _parse_timestamps(raw: pd.Series) -> pd.Series:
+        """Vectorized ISO 8601 parsing; naive values use the current timezone"""
+        text = raw.astype("string").str.strip()
+        has_offset = text.str.contains(r"(?:Z|[+-]\d{2}:?\d{2})$", regex=True).fillna(
+            False
+        )
+        parsed = pd.Series(pd.NaT, index=raw.index, dtype="datetime64[ns, UTC]")
+
+        if has_offset.any():
+            parsed[has_offset] = pd.to_datetime(
+                text[has_offset], utc=True, errors="coerce", format="ISO8601"
+            )
+
+        naive = ~has_offset & text.notna()
+        if naive.any():
+            local = pd.to_datetime(text[naive], errors="coerce", format="ISO8601")
+            parsed[naive] = local.dt.tz_localize(
+                str(timezone.get_current_timezone()),
+                ambiguous="NaT",
+                nonexistent="NaT",
+            ).dt.tz_convert("UTC")
+
+        return parsed
+
+    @staticmethod
+    def _optional_list(values: np.ndarray) -> List[Optional[float]]:
+        return [None if value != value else value for value in values.tolist()]
+
+    def _batched(self, records: Iterable[Tuple[int, Dict]]) -> Iterator[List]:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _iter_ndjson(stream) -> Iterator[Tuple[int, Dict]]:
+        for row, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield row, record if isinstance(record, dict) else None
+
+    @staticmethod
+    def _iter_csv(stream) -> Iterator[Tuple[int, Dict]]:
+        lines = (
+            line.decode("utf-8") if isinstance(line, bytes) else line for line in stream
+        )
+        reader = csv.DictReader(lines)
+        for row, record in enumerate(reader, start=1):
+            yield row, {key: (value or None) for key, value in record.items()}
+
+    def _idempotency_cache_key(self, key: str) -> str:
+        user_id = getattr(self.user, "id", None) or "anonymous"
+        return f"moisture_ingest_{user_id}_{key}"
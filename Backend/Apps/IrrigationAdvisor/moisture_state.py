@@ -0,0 +1,182 @@
+import logging
+import math
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from django.db import transaction
+from django.utils import timezone
+from .models import Field, FieldMoistureState, SoilMoisture
+from .moisture_analyzer import MoistureAnalyzer
+
+logger = logging.getLogger(__name__)
+
+DECAY_DAYS = 3.0  # e-folding age of a reading in the regression sums
+EWMA_ALPHA = 0.3
+REBUILD_CHUNK_SIZE = 10000
+
+STATE_FIELDS = [
+    "reading_count",
+    "last_timestamp",
+    "last_moisture",
+    "sum_weight",
+    "sum_x",
+    "sum_y",
+    "sum_xx",
+    "sum_xy",
+    "depletion_rate",
+    "depletion_rate_ewma",
+    "critical_level",
+    "days_to_critical",
+    "critical_at",
+    "updated_at",
+]
+
+
+class MoistureStateTracker:
+    """Fold soil moisture readings into per-field FieldMoistureState rows"""
+
+    def __init__(self):
+        self.analyzer = MoistureAnalyzer()
+
+    def apply(self, readings: Iterable[SoilMoisture]) -> int:
+        """Update the state of every field touched by readings; returns fields updated"""
+        by_field = defaultdict(list)
+        for reading in readings:
+            by_field[reading.field_id].append(
+                (reading.timestamp, reading.moisture_level)
+            )
+        if not by_field:
+            return 0
+
+        with transaction.atomic():
+            FieldMoistureState.objects.bulk_create(
+                [FieldMoistureState(field_id=field_id) for field_id in by_field],
+                ignore_conflicts=True,
+            )
+            states = list(
+                FieldMoistureState.objects.select_for_update(of=("self",))
+                .select_related("field")
+                .filter(field_id__in=list(by_field))
+            )
+
+            critical_levels = {}
+            now = timezone.now()
+            for state in states:
+                for timestamp, moisture_level in sorted(by_field[state.field_id]):
+                    self.fold(state, timestamp, moisture_level)
+                self.project(state, self._critical_level(state.field, critical_levels))
+                state.updated_at = now
+
+            FieldMoistureState.objects.bulk_update(states, STATE_FIELDS)
+
+        return len(states)
+
+    def rebuild(self, field_ids: Optional[List[int]] = None) -> int:
+        """Recompute states from the full reading history"""
+        readings = SoilMoisture.objects.order_by("field_id", "timestamp").only(
+            "field_id", "timestamp", "moisture_level"
+        )
+        states = FieldMoistureState.objects.all()
+        if field_ids is not None:
+            readings = readings.filter(field_id__in=field_ids)
+            states = states.filter(field_id__in=field_ids)
+        states.delete()
+
+        processed = 0
+        batch = []
+        for reading in readings.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            batch.append(reading)
+            if len(batch) >= REBUILD_CHUNK_SIZE:
+                self.apply(batch)
+                processed += len(batch)
+                batch = []
+        if batch:
+            self.apply(batch)
+            processed += len(batch)
+
+        logger.info(f"Rebuilt moisture state from {processed} readings")
+        return processed
+
+    @staticmethod
+    def fold(state: FieldMoistureState, timestamp: datetime, moisture_level: float):
+        """Add one reading to the decayed regression sums and depletion EWMA"""
+        if state.last_timestamp is None:
+            state.last_timestamp = timestamp
+            state.last_moisture = moisture_level
+            state.sum_weight, state.sum_x, state.sum_xx = 1.0, 0.0, 0.0
+            state.sum_y, state.sum_xy = moisture_level, 0.0
+            state.reading_count = 1
+            return
+
+        x = (timestamp - state.last_timestamp).total_seconds() / 86400
+
+        if x > 0:
+            # Re-centre the sums on the new reading, then decay older readings
+            state.sum_xx += x * x * state.sum_weight - 2 * x * state.sum_x
+            state.sum_xy -= x * state.sum_y
+            state.sum_x -= x * state.sum_weight
+
+            decay = math.exp(-x / DECAY_DAYS)
+            state.sum_weight = state.sum_weight * decay + 1
+            state.sum_x *= decay
+            state.sum_y = state.sum_y * decay + moisture_level
+            state.sum_xx *= decay
+            state.sum_xy *= decay
+
+            rate = (state.last_moisture - moisture_level) / x
+            state.depletion_rate_ewma = (
+                rate
+                if state.depletion_rate_ewma is None
+                else EWMA_ALPHA * rate + (1 - EWMA_ALPHA) * state.depletion_rate_ewma
+            )
+            state.last_timestamp = timestamp
+            state.last_moisture = moisture_level
+        else:
+            # Late reading: weight it by its age, the latest reading stays current
+            weight = math.exp(x / DECAY_DAYS)
+            state.sum_weight += weight
+            state.sum_x += weight * x
+            state.sum_y += weight * moisture_level
+            state.sum_xx += weight * x * x
+            state.sum_xy += weight * x * moisture_level
+
+        state.reading_count += 1
+
+        denominator = state.sum_weight * state.sum_xx - state.sum_x**2
+        if denominator > 1e-12:
+            slope = (
+                state.sum_weight * state.sum_xy - state.sum_x * state.sum_y
+            ) / denominator
+            state.depletion_rate = -slope
+        else:
+            state.depletion_rate = None
+
+    @staticmethod
+    def project(state: FieldMoistureState, critical_level: Optional[float]):
+        """Project when the field reaches its critical moisture level.
+
+        days_to_critical counts from the last reading; readers derive the
+        days left from critical_at.
+        """
+        state.critical_level = critical_level
+        state.days_to_critical = None
+        state.critical_at = None
+
+        if critical_level is None or state.last_moisture is None:
+            return
+
+        state.critical_at = MoistureAnalyzer.projected_critical_at(
+            state, critical_level
+        )
+        if state.critical_at is not None:
+            state.days_to_critical = (
+                state.critical_at - state.last_timestamp
+            ).total_seconds() / 86400
+
+    def _critical_level(self, field: Field, cache: Dict) -> Optional[float]:
+        # Fields sharing crop and season resolve to the same growth stage
+        key = (field.crop_type, field.planting_date, field.expected_harvest_date)
+        if key not in cache:
+            crop_req = self.analyzer._get_crop_requirements(field.crop_type, field)
+            cache[key] = crop_req.critical_moisture_level if crop_req else None
+        return cache[key]
@@ -6,9 +6,13 @@ from .models import (
     IrrigationSchedule,
     WaterSource,
     CropWaterRequirement,
-    SoilMoisture,
+    FieldMoistureState,
 )
 from .moisture_analyzer import MoistureAnalyzer
+from .water_allocation import WaterAllocator
+from .slot_scheduler import SlotScheduler
+from .water_balance import WaterBalanceSimulator
+from Apps.WeatherIntegration.weather_surface import get_weather_surface
 import logging
 
 logger = logging.getLogger(__name__)
@@ -72,11 +76,19 @@ class ScheduleOptimizer:
             return {"error": str(e)}
 
     def optimize_multiple_fields(
-        self, field_ids: List[int], water_source_id: int = None
+        self,
+        field_ids: List[int],
+        water_source_id: int = None,
+        allocation_mode: str = "optimal",
     ) -> Dict:
-        """Optimize irrigation for multiple fields considering water constraints"""
+        """Optimize irrigation for multiple fields considering water constraints.
+
+        allocation_mode selects the solver: "optimal" (knapsack), "lp"
+        (benefit per liter) or "greedy" (priority order).
+        """
         try:
-            fields = Field.objects.filter(id__in=field_ids)
+            allocator = WaterAllocator(self)
+            fields, field_data = allocator.prefetch(field_ids)
 
             if not fields:
                 return {"error": "No fields found"}
@@ -92,56 +104,42 @@ class ScheduleOptimizer:
                 except WaterSource.DoesNotExist:
                     pass
 
-            # Analyze each field
-            field_priorities = []
-            for field in fields:
-                priority_score = self._calculate_field_priority(field)
-                water_need = self._calculate_water_need(field)
-
-                field_priorities.append(
-                    {
-                        "field": field,
-                        "priority_score": priority_score,
-                        "water_need": water_need,
-                        "urgency": self._calculate_irrigation_urgency(field),
-                    }
-                )
-
-            # Sort by priority
-            field_priorities.sort(key=lambda x: x["priority_score"], reverse=True)
+            allocation = allocator.allocate(
+                field_data, water_constraint, allocation_mode
+            )
 
-            # Allocate water and generate schedules
-            allocated_water = 0
+            # Generate schedules in priority order
+            field_priorities = []
             optimized_schedules = []
-
-            for field_data in field_priorities:
-                field = field_data["field"]
-                water_need = field_data["water_need"]
-
-                if water_constraint:
-                    if allocated_water + water_need > water_constraint:
-                        # Partial allocation
-                        available_water = water_constraint - allocated_water
-                        if available_water > water_need * 0.5:  # At least 50% of need
-                            schedule = self._create_schedule(field, available_water)
-                            optimized_schedules.append(schedule)
-                            allocated_water += available_water
-                        else:
-                            field_data["status"] = "postponed"
-                            field_data["reason"] = "Insufficient water"
-                    else:
-                        schedule = self._create_schedule(field, water_need)
-                        optimized_schedules.append(schedule)
-                        allocated_water += water_need
+            for i in np.argsort(-field_data["priority"], kind="stable"):
+                field = fields[i]
+                water_need = float(field_data["need"][i])
+                allocated = float(allocation[i])
+
+                entry = {
+                    "field_id": field.id,
+                    "field_name": field.name,
+                    "priority_score": float(field_data["priority"][i]),
+                    "water_need": water_need,
+                    "water_allocated": allocated,
+                    "urgency": field_data["urgency"][i],
+                }
+                if allocated > 0:
+                    optimized_schedules.append(self._create_schedule(field, allocated))
+                    entry["status"] = (
+                        "scheduled" if allocated >= water_need else "partial"
+                    )
                 else:
-                    schedule = self._create_schedule(field, water_need)
-                    optimized_schedules.append(schedule)
+                    entry["status"] = "postponed"
+                    entry["reason"] = "Insufficient water"
+                field_priorities.append(entry)
 
             return {
                 "fields_count": len(fields),
                 "water_source": water_source_id,
                 "water_constraint": water_constraint,
-                "total_water_allocated": allocated_water,
+                "allocation_mode": allocation_mode,
+                "total_water_allocated": float(allocation.sum()),
                 "schedules": optimized_schedules,
                 "field_priorities": field_priorities,
                 "optimization_summary": self._generate_optimization_summary(
@@ -153,6 +151,34 @@ class ScheduleOptimizer:
             logger.error(f"Error optimizing multiple fields: {e}")
             return {"error": str(e)}
 
+    def plan_water_source(
+        self,
+        water_source_id: int,
+        days: int = 7,
+        field_ids: Optional[List[int]] = None,
+        save: bool = False,
+    ) -> Dict:
+        """Plan non-overlapping irrigation slots for the fields of a water source"""
+        try:
+            water_source = WaterSource.objects.get(id=water_source_id)
+            return SlotScheduler(self).plan(water_source, days, field_ids, save)
+
+        except WaterSource.DoesNotExist:
+            return {"error": "Water source not found"}
+        except Exception as e:
+            logger.error(f"Error planning water source schedule: {e}")
+            return {"error": str(e)}
+
+    def project_irrigation_dates(
+        self, field_ids: List[int], days: int = 7
+    ) -> Dict[int, Dict]:
+        """Project irrigation dates for many fields with the FAO-56 water balance"""
+        try:
+            return WaterBalanceSimulator().project(field_ids, days)
+        except Exception as e:
+            logger.error(f"Error projecting irrigation dates: {e}")
+            return {"error": str(e)}
+
     def suggest_irrigation_timing(self, field_id: int) -> Dict:
         """Suggest optimal irrigation timing for today"""
         try:
@@ -163,14 +189,14 @@ class ScheduleOptimizer:
 
             # Analyze best time slots
             time_slots = []
+            slot_scores = self._evaluate_time_slots([weather_today])[0]
 
             for hour in range(24):
-                slot_score = self._evaluate_time_slot(hour, weather_today)
                 time_slots.append(
                     {
                         "hour": hour,
                         "time": f"{hour:02d}:00",
-                        "score": slot_score,
+                        "score": float(slot_scores[hour]),
                         "factors": self._get_time_slot_factors(hour, weather_today),
                     }
                 )
@@ -203,6 +229,8 @@ class ScheduleOptimizer:
         weather_forecast: List[Dict],
         days: int,
         priority_mode: str,
+        crop_req: Optional[CropWaterRequirement] = None,
+        start_date=None,
     ) -> List[Dict]:
         """Generate optimal irrigation schedule"""
         schedule = []
@@ -213,15 +241,19 @@ class ScheduleOptimizer:
         daily_et = et_data.get("crop_et", 5)
 
         # Get crop requirements
-        crop_req = self._get_crop_requirements(field.crop_type, field)
+        if crop_req is None:
+            crop_req = self._get_crop_requirements(field.crop_type, field)
         if not crop_req:
             return []
 
+        if start_date is None:
+            start_date = datetime.now().date()
+
         # Simulate moisture for each day
         simulated_moisture = current_moisture
 
         for day in range(days):
-            date = datetime.now().date() + timedelta(days=day)
+            date = start_date + timedelta(days=day)
             weather = weather_forecast[day] if day < len(weather_forecast) else {}
 
             # Calculate expected moisture depletion
@@ -264,20 +296,31 @@ class ScheduleOptimizer:
 
     def _calculate_field_priority(self, field: Field) -> float:
         """Calculate irrigation priority for a field"""
-        priority = 0.5
-
-        # Get latest moisture reading
-        latest_moisture = (
-            SoilMoisture.objects.filter(field=field).order_by("-timestamp").first()
-        )
+        # Latest moisture reading from the incrementally maintained state
+        try:
+            latest_moisture = field.moisture_state.last_moisture
+        except FieldMoistureState.DoesNotExist:
+            latest_moisture = None
 
-        if latest_moisture:
+        crop_req = None
+        if latest_moisture is not None:
             crop_req = self._get_crop_requirements(field.crop_type, field)
+
+        return self._score_priority(field, latest_moisture, crop_req)
+
+    def _score_priority(
+        self,
+        field: Field,
+        latest_moisture: Optional[float],
+        crop_req: Optional[CropWaterRequirement],
+    ) -> float:
+        """Priority score from already loaded moisture and crop requirements"""
+        priority = 0.5
+
+        if latest_moisture is not None:
             if crop_req:
                 # Priority based on moisture deficit
-                moisture_ratio = (
-                    latest_moisture.moisture_level / crop_req.optimal_moisture_level
-                )
+                moisture_ratio = latest_moisture / crop_req.optimal_moisture_level
                 if moisture_ratio < 0.5:
                     priority += 0.4
                 elif moisture_ratio < 0.7:
@@ -309,8 +352,12 @@ class ScheduleOptimizer:
             field.id
         )
 
-        days_to_critical = depletion_prediction.get("days_to_critical", float("inf"))
+        return self._urgency_from_days(
+            depletion_prediction.get("days_to_critical", float("inf"))
+        )
 
+    @staticmethod
+    def _urgency_from_days(days_to_critical: float) -> str:
         if days_to_critical < 1:
             return "critical"
         elif days_to_critical < 3:
@@ -339,36 +386,38 @@ class ScheduleOptimizer:
 
     def _evaluate_time_slot(self, hour: int, weather: Dict) -> float:
         """Evaluate suitability of a time slot for irrigation"""
-        score = 0.5
-
-        # Prefer early morning (4-8 AM)
-        if 4 <= hour <= 8:
-            score += 0.3
-        # Second preference: late evening (18-21)
-        elif 18 <= hour <= 21:
-            score += 0.2
-        # Avoid mid-day (11-15)
-        elif 11 <= hour <= 15:
-            score -= 0.3
-
-        # Consider temperature
-        hourly_temp = weather.get("hourly_temperature", {}).get(hour, 25)
-        if hourly_temp < 20:
-            score += 0.1
-        elif hourly_temp > 30:
-            score -= 0.2
-
-        # Consider wind
-        hourly_wind = weather.get("hourly_wind", {}).get(hour, 2)
-        if hourly_wind > 5:
-            score -= 0.2
-
-        # Consider humidity
-        hourly_humidity = weather.get("hourly_humidity", {}).get(hour, 60)
-        if hourly_humidity > 70:
-            score += 0.1
+        return float(self._evaluate_time_slots([weather])[0, hour])
+
+    def _evaluate_time_slots(self, weather_days: List[Dict]) -> np.ndarray:
+        """Irrigation suitability of each hour: (days, 24) scores for hourly weather"""
+        hours = np.arange(24)
+
+        def hourly(key, default):
+            return np.array(
+                [
+                    [weather.get(key, {}).get(hour, default) for hour in hours]
+                    for weather in weather_days
+                ],
+                dtype=np.float64,
+            ).reshape(-1, 24)
+
+        temperature = hourly("hourly_temperature", 25)
+        wind = hourly("hourly_wind", 2)
+        humidity = hourly("hourly_humidity", 60)
+
+        # Prefer early morning (4-8 AM), then late evening (18-21), avoid mid-day
+        score = np.full(temperature.shape, 0.5)
+        score += np.select(
+            [(hours >= 4) & (hours <= 8), (hours >= 18) & (hours <= 21)],
+            [0.3, 0.2],
+            default=np.where((hours >= 11) & (hours <= 15), -0.3, 0.0),
+        )
+        # Cool, calm and humid hours lose less water to evaporation and drift
+        score += np.where(temperature < 20, 0.1, np.where(temperature > 30, -0.2, 0))
+        score -= np.where(wind > 5, 0.2, 0)
+        score += np.where(humidity > 70, 0.1, 0)
 
-        return max(0, min(score, 1))
+        return np.clip(score, 0, 1)
 
     def _get_time_slot_factors(self, hour: int, weather: Dict) -> List[str]:
         """Get factors affecting time slot suitability"""
@@ -552,8 +601,24 @@ class ScheduleOptimizer:
         return max_consecutive
 
     def _get_weather_forecast(self, lat: float, lon: float, days: int) -> List[Dict]:
-        """Get weather forecast (placeholder - would integrate with WeatherIntegration)"""
-        # In production, this would call the WeatherIntegration service
+        """Get weather forecast from the interpolated station surface"""
+        try:
+            estimate = get_weather_surface().estimate(lat, lon)
+            if estimate and estimate["forecast"]:
+                return [
+                    {
+                        "date": day["date"].isoformat(),
+                        "temperature": day["temperature_avg"],
+                        "humidity": day["humidity"],
+                        "rainfall": day["precipitation_amount"] or 0,
+                        "wind_speed": day["wind_speed"],
+                    }
+                    for day in estimate["forecast"][:days]
+                ]
+        except Exception as e:
+            logger.warning(f"Interpolated forecast unavailable: {e}")
+
+        # Placeholder forecast when no station data covers the field
         forecast = []
         for day in range(days):
             forecast.append(
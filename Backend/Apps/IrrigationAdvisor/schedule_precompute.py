@@ -0,0 +1,312 @@
+import logging
+import math
+import os
+import time
+import django
+import numpy as np
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from django.db import connections, transaction
+from django.utils import timezone
+from Apps.WeatherIntegration.weather_surface import get_weather_surface
+from .models import (
+    Field,
+    FieldMoistureState,
+    IrrigationSchedule,
+    CropWaterRequirement,
+    ScheduleRun,
+)
+from .schedule_optimizer import ScheduleOptimizer
+from .water_allocation import WaterAllocator
+
+logger = logging.getLogger(__name__)
+
+GRID_CELL_DEGREES = 0.25  # Fields in the same cell share one forecast
+CELLS_PER_TASK = 64  # Cells per worker task, and per committed write
+PRECOMPUTE_NOTE = "Precomputed nightly schedule"
+DEFAULT_MOISTURE = 50  # Same default as _generate_optimal_schedule
+
+# Used for forecast days no station covers, instead of a random placeholder
+DEFAULT_FORECAST_DAY = {
+    "temperature": 25,
+    "humidity": 60,
+    "rainfall": 0,
+    "wind_speed": 2,
+}
+
+
+def grid_cell(lat: float, lon: float) -> str:
+    """Key of the weather grid cell containing a point"""
+    return (
+        f"{math.floor(lat / GRID_CELL_DEGREES)}:{math.floor(lon / GRID_CELL_DEGREES)}"
+    )
+
+
+def _cell_center(cell: str) -> Tuple[float, float]:
+    row, col = (int(part) for part in cell.split(":"))
+    return (row + 0.5) * GRID_CELL_DEGREES, (col + 0.5) * GRID_CELL_DEGREES
+
+
+def _plan_cells(task: Dict) -> Tuple[List[str], List[int], List[Dict]]:
+    """Generate the schedules of a batch of cells.
+
+    Runs in a worker process without touching the database: fields, crop
+    requirements and forecasts are all part of the task.
+    """
+    optimizer = ScheduleOptimizer()
+    analyzer = optimizer.moisture_analyzer
+    cells, field_ids, rows = [], [], []
+
+    for cell, forecast, entries in task["cells"]:
+        reference_et = analyzer._calculate_reference_et(forecast[0])
+        for field, crop_req, moisture in entries:
+            schedule = optimizer._generate_optimal_schedule(
+                field,
+                {"statistics": {"current_moisture": moisture}},
+                {"crop_et": reference_et * crop_req.crop_coefficient},
+                forecast,
+                task["days"],
+                task["priority_mode"],
+                crop_req=crop_req,
+                start_date=task["run_date"],
+            )
+            field_ids.append(field.id)
+            rows.extend(dict(entry, field_id=field.id) for entry in schedule)
+        cells.append(cell)
+
+    return cells, field_ids, rows
+
+
+class SchedulePrecomputer:
+    """Nightly irrigation schedule generation for every active field.
+
+    Fields are grouped by weather grid cell so each cell needs a single
+    forecast, and batches of cells are planned in a process pool. Each
+    finished batch is written together with the run progress, so an
+    interrupted run resumes with the cells it had not written yet.
+    """
+
+    def __init__(
+        self,
+        days: int = 7,
+        priority_mode: str = "balanced",
+        workers: Optional[int] = None,
+    ):
+        self.days = days
+        self.priority_mode = priority_mode
+        self.workers = workers or os.cpu_count() or 1
+
+    def run(self, run_date: Optional[date] = None, restart: bool = False) -> Dict:
+        """Precompute schedules starting at run_date (today by default)"""
+        started = time.perf_counter()
+        run_date = run_date or timezone.localdate()
+        run, created = ScheduleRun.objects.get_or_create(
+            run_date=run_date, defaults={"horizon_days": self.days}
+        )
+
+        if run.status == "completed" and not restart:
+            return self._summary(run, started, resumed=False, skipped=True)
+
+        resumed = not created and not restart and bool(run.completed_cells)
+        if restart or run.horizon_days != self.days:
+            # Progress of a different horizon cannot be reused
+            resumed = False
+            run.completed_cells = []
+            run.fields_processed = 0
+            run.schedules_created = 0
+        run.horizon_days = self.days
+        run.status = "running"
+        run.error = ""
+        run.finished_at = None
+
+        try:
+            cells = self._group_fields(run_date)
+            run.total_cells = len(cells)
+            run.save()
+
+            done = set(run.completed_cells)
+            pending = sorted(cell for cell in cells if cell not in done)
+            if pending:
+                forecasts = self._cell_forecasts(pending, run_date)
+                tasks = [
+                    {
+                        "run_date": run_date,
+                        "days": self.days,
+                        "priority_mode": self.priority_mode,
+                        "cells": [
+                            (cell, forecasts[cell], cells[cell])
+                            for cell in pending[i : i + CELLS_PER_TASK]
+                        ],
+                    }
+                    for i in range(0, len(pending), CELLS_PER_TASK)
+                ]
+                self._execute(run, tasks)
+
+            run.status = "completed"
+            run.finished_at = timezone.now()
+            run.save(update_fields=["status", "finished_at"])
+        except Exception as e:
+            logger.error(f"Schedule precomputation for {run_date} failed: {e}")
+            run.status = "failed"
+            run.error = str(e)
+            run.save(update_fields=["status", "error"])
+            raise
+
+        return self._summary(run, started, resumed=resumed, skipped=False)
+
+    def _execute(self, run: ScheduleRun, tasks: List[Dict]):
+        if self.workers <= 1 or len(tasks) == 1:
+            for task in tasks:
+                self._write(run, *_plan_cells(task))
+            return
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=min(self.workers, len(tasks)), initializer=django.setup
+        ) as pool:
+            futures = [pool.submit(_plan_cells, task) for task in tasks]
+            for future in as_completed(futures):
+                self._write(run, *future.result())
+
+    def _group_fields(self, run_date: date) -> Dict[str, List[Tuple]]:
+        """(field, crop requirement, moisture) entries per weather grid cell.
+
+        Fields without crop requirements get no schedule, as on demand, and
+        fields that already have schedules from the water source planner or
+        a user are left alone.
+        """
+        horizon_end = run_date + timedelta(days=self.days)
+        planned_elsewhere = set(
+            IrrigationSchedule.objects.filter(
+                status__in=["scheduled", "in_progress"],
+                scheduled_date__gte=run_date,
+                scheduled_date__lt=horizon_end,
+            )
+            .exclude(notes=PRECOMPUTE_NOTE)
+            .values_list("field_id", flat=True)
+        )
+
+        fields = list(
+            Field.objects.filter(is_active=True)
+            .exclude(id__in=planned_elsewhere)
+            .select_related("moisture_state")
+        )
+
+        requirements, fallback = {}, {}
+        for crop_req in CropWaterRequirement.objects.filter(
+            crop_name__in={field.crop_type for field in fields}
+        ):
+            requirements[(crop_req.crop_name, crop_req.growth_stage)] = crop_req
+            fallback.setdefault(crop_req.crop_name, crop_req)
+
+        cells = defaultdict(list)
+        for field in fields:
+            stage = WaterAllocator._growth_stage(field, run_date)
+            crop_req = requirements.get((field.crop_type, stage)) or fallback.get(
+                field.crop_type
+            )
+            if crop_req is None:
+                continue
+
+            try:
+                moisture = field.moisture_state.last_moisture
+            except FieldMoistureState.DoesNotExist:
+                moisture = None
+            if moisture is None:
+                moisture = DEFAULT_MOISTURE
+
+            cells[grid_cell(field.latitude, field.longitude)].append(
+                (field, crop_req, moisture)
+            )
+        return cells
+
+    def _cell_forecasts(self, cells: List[str], run_date: date) -> Dict[str, List]:
+        """One daily forecast per cell, estimated at the cell centres at once"""
+        forecasts = {
+            cell: [dict(DEFAULT_FORECAST_DAY) for _ in range(self.days)]
+            for cell in cells
+        }
+
+        try:
+            surface = get_weather_surface()
+            rows = surface.forecast_many(
+                np.array([_cell_center(cell) for cell in cells])
+            )
+        except Exception as e:
+            logger.warning(f"Weather surface unavailable for precomputation: {e}")
+            return forecasts
+
+        for cell, cell_rows in zip(cells, rows):
+            for row in cell_rows:
+                offset = (row["date"] - run_date).days
+                if not 0 <= offset < self.days:
+                    continue
+                day = forecasts[cell][offset]
+                for key, source in (
+                    ("temperature", "temperature_avg"),
+                    ("humidity", "humidity"),
+                    ("rainfall", "precipitation_amount"),
+                    ("wind_speed", "wind_speed"),
+                ):
+                    if row.get(source) is not None:
+                        day[key] = row[source]
+        return forecasts
+
+    def _write(
+        self,
+        run: ScheduleRun,
+        cells: List[str],
+        field_ids: List[int],
+        rows: List[Dict],
+    ):
+        """Replace the precomputed schedules of a batch and record its progress"""
+        with transaction.atomic():
+            IrrigationSchedule.objects.filter(
+                field_id__in=field_ids,
+                status="scheduled",
+                notes=PRECOMPUTE_NOTE,
+                scheduled_date__gte=run.run_date,
+            ).delete()
+            IrrigationSchedule.objects.bulk_create(
+                [
+                    IrrigationSchedule(
+                        field_id=row["field_id"],
+                        scheduled_date=row["date"],
+                        scheduled_time=row["time"],
+                        duration_minutes=row["duration_minutes"],
+                        water_amount=row["water_amount"],
+                        irrigation_type=row["irrigation_type"],
+                        priority=row["priority"],
+                        notes=PRECOMPUTE_NOTE,
+                    )
+                    for row in rows
+                ],
+                batch_size=1000,
+            )
+
+            run.completed_cells = run.completed_cells + cells
+            run.fields_processed += len(field_ids)
+            run.schedules_created += len(rows)
+            run.save(
+                update_fields=[
+                    "completed_cells",
+                    "fields_processed",
+                    "schedules_created",
+                ]
+            )
+
+    @staticmethod
+    def _summary(run: ScheduleRun, started: float, resumed: bool, skipped: bool):
+        return {
+            "run_date": run.run_date.isoformat(),
+            "status": run.status,
+            "cells": run.total_cells,
+            "fields": run.fields_processed,
+            "schedules": run.schedules_created,
+            "resumed": resumed,
+            "skipped": skipped,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
@@ -0,0 +1,344 @@
+import hmac
+import ipaddress
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from django.db import close_old_connections
+from .moisture_ingest import MoistureIngestor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SIZE = 2000
+DEFAULT_FLUSH_INTERVAL = 5.0  # seconds
+DEFAULT_QUEUE_SIZE = 50000
+DEFAULT_PENDING_SEGMENTS = 8
+MAX_DATAGRAM_SIZE = 65535
+DEFAULT_HOST = "127.0.0.1"
+
+# Failed segments are retried after RETRY_BASE_DELAY, doubling up to the max
+RETRY_BASE_DELAY = 1.0  # seconds
+RETRY_MAX_DELAY = 300.0  # seconds
+
+ACTIVE_SUFFIX = ".ndjson"
+READY_SUFFIX = ".ready"
+
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    """TCP line protocol: one JSON reading per line"""
+
+    def handle(self):
+        gateway = self.server.gateway
+        if not gateway.authenticate(self.rfile.readline()):
+            return
+        for line in self.rfile:
+            # Blocks while the gateway is saturated, pushing back on the sensor
+            if not gateway.submit(line, block=True):
+                break
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SensorGateway:
+    """Write-behind gateway that decouples sensor ingest from DB writes.
+
+    Readings arrive as NDJSON lines over TCP (with backpressure) or UDP
+    (dropped when saturated). A writer thread appends them to a spool
+    segment on disk; segments are rotated by size or age and handed to a
+    flusher thread that bulk-inserts them through MoistureIngestor and then
+    deletes them. Segments left behind by a crash are replayed on start,
+    so delivery is at-least-once. A segment that fails to flush, e.g.
+    while the database is unavailable, stays on disk and is retried with
+    exponential backoff.
+
+    Listeners bind to localhost unless a shared token is configured. With a
+    token, the first line of every TCP connection and of every UDP datagram
+    must be the token; other connections are closed and datagrams dropped.
+    Readings are ingested on behalf of user when given, so only that user's
+    fields are accepted; without one any field may be written.
+    """
+
+    def __init__(
+        self,
+        spool_dir,
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        pending_segments: int = DEFAULT_PENDING_SEGMENTS,
+        token: Optional[str] = None,
+        user=None,
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.token = token.encode() if token else None
+        self.user = user
+
+        self._lines = queue.Queue(maxsize=queue_size)
+        self._segments = queue.Queue(maxsize=pending_segments)
+        self._accepting = threading.Event()
+        self._writer_done = threading.Event()
+        self._threads = {}
+        self._servers = []
+        # [due, attempts, segment] of segments that failed to flush
+        self._retries: List[list] = []
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "received": 0,
+            "dropped": 0,
+            "unauthorized": 0,
+            "segments_flushed": 0,
+            "readings_created": 0,
+            "readings_rejected": 0,
+            "flush_failures": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(
+        self, host: str = DEFAULT_HOST, tcp_port: int = None, udp_port: int = None
+    ):
+        """Replay leftover spool segments, then start flusher, writer and listeners"""
+        listening = tcp_port is not None or udp_port is not None
+        if listening and self.token is None and not _is_loopback(host):
+            raise ValueError(
+                f"Sensor gateway requires a token to listen on {host}; "
+                "set SENSOR_GATEWAY_TOKEN or bind to localhost"
+            )
+
+        self._accepting.set()
+        self._writer_done.clear()
+        self._replay_spool()
+
+        self._spawn(self._flusher_loop, "sensor-gateway-flusher")
+        self._spawn(self._writer_loop, "sensor-gateway-writer")
+
+        if tcp_port is not None:
+            server = _ThreadingTCPServer((host, tcp_port), _LineHandler)
+            server.gateway = self
+            self._servers.append(server)
+            self._spawn(server.serve_forever, "sensor-gateway-tcp")
+            logger.info(f"Sensor gateway listening on tcp://{host}:{tcp_port}")
+
+        if udp_port is not None:
+            udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            udp_socket.bind((host, udp_port))
+            udp_socket.settimeout(0.5)
+            self._udp_socket = udp_socket
+            self._spawn(self._udp_loop, "sensor-gateway-udp")
+            logger.info(f"Sensor gateway listening on udp://{host}:{udp_port}")
+
+    def stop(self, timeout: float = 30.0):
+        """Stop listeners, then drain the buffer and flush remaining segments"""
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._accepting.clear()
+
+        # Writer drains the line queue before the flusher drains the segments
+        deadline = time.monotonic() + timeout
+        for name in (
+            "sensor-gateway-udp",
+            "sensor-gateway-writer",
+            "sensor-gateway-flusher",
+        ):
+            thread = self._threads.get(name)
+            if thread is not None:
+                thread.join(max(deadline - time.monotonic(), 0))
+
+        if getattr(self, "_udp_socket", None):
+            self._udp_socket.close()
+
+    def authenticate(self, line: bytes) -> bool:
+        """Check the token line a connection or datagram starts with"""
+        if self.token is None:
+            return True
+        if hmac.compare_digest(line.strip(), self.token):
+            return True
+        self._count("unauthorized")
+        return False
+
+    def submit(self, line: bytes, block: bool = False) -> bool:
+        """Queue one raw reading line; returns False if it was dropped"""
+        line = line.strip()
+        if not line:
+            return True
+
+        while self._accepting.is_set():
+            try:
+                self._lines.put(line, block=block, timeout=0.5 if block else None)
+                self._count("received")
+                return True
+            except queue.Full:
+                if not block:
+                    break
+
+        self._count("dropped")
+        return False
+
+    # ------------------------------------------------------------------
+    # Worker loops
+    # ------------------------------------------------------------------
+
+    def _udp_loop(self):
+        while self._accepting.is_set():
+            try:
+                datagram, _ = self._udp_socket.recvfrom(MAX_DATAGRAM_SIZE)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            lines = datagram.splitlines()
+            if self.token is not None:
+                if not lines or not self.authenticate(lines[0]):
+                    continue
+                lines = lines[1:]
+            for line in lines:
+                self.submit(line, block=False)
+
+    def _writer_loop(self):
+        """Append queued lines to the active segment and rotate it by size or age"""
+        segment, handle, count, opened_at = None, None, 0, 0.0
+
+        while self._accepting.is_set() or not self._lines.empty():
+            timeout = 0.5
+            if handle is not None:
+                timeout = max(
+                    min(opened_at + self.flush_interval - time.monotonic(), 0.5), 0
+                )
+
+            buffered = []
+            try:
+                buffered.append(self._lines.get(timeout=timeout))
+                while len(buffered) < 1000:
+                    buffered.append(self._lines.get_nowait())
+            except queue.Empty:
+                pass
+
+            if buffered:
+                if handle is None:
+                    segment = self.spool_dir / f"{time.time_ns()}{ACTIVE_SUFFIX}"
+                    handle = open(segment, "ab")
+                    opened_at = time.monotonic()
+                handle.write(b"\n".join(buffered) + b"\n")
+                handle.flush()
+                os.fsync(handle.fileno())
+                count += len(buffered)
+
+            expired = handle is not None and (
+                time.monotonic() - opened_at >= self.flush_interval
+            )
+            if handle is not None and (count >= self.flush_size or expired):
+                self._rotate(segment, handle)
+                segment, handle, count = None, None, 0
+
+        if handle is not None:
+            self._rotate(segment, handle)
+        self._writer_done.set()
+
+    def _flusher_loop(self):
+        """Bulk-insert ready segments and delete them once committed"""
+        while not self._writer_done.is_set() or not self._segments.empty():
+            self._retry_due()
+            try:
+                segment = self._segments.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if self._flush_segment(segment) is None:
+                self._schedule_retry(segment, 0)
+
+        # One last attempt on stop; what still fails is replayed on next start
+        self._retry_due(force=True)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _rotate(self, segment: Path, handle):
+        handle.close()
+        ready = segment.with_suffix(READY_SUFFIX)
+        os.replace(segment, ready)
+        # Blocks when the flusher falls behind, which backs up the line queue
+        self._segments.put(ready)
+
+    def _flush_segment(self, segment: Path) -> Optional[Dict]:
+        close_old_connections()
+        try:
+            with open(segment, "rb") as stream:
+                result = MoistureIngestor(user=self.user).ingest_stream(
+                    stream, "application/x-ndjson"
+                )
+        except Exception as e:
+            # Keep the segment on disk so it can be retried
+            logger.error(f"Error flushing sensor spool segment {segment.name}: {e}")
+            self._count("flush_failures")
+            return None
+
+        os.remove(segment)
+        self._count("segments_flushed")
+        self._count("readings_created", result["created"])
+        self._count("readings_rejected", result["error_count"])
+
+        if result["error_count"]:
+            logger.warning(
+                f"Sensor segment {segment.name}: {result['error_count']} rejected "
+                f"readings, first errors: {result['errors'][:3]}"
+            )
+        return result
+
+    def _replay_spool(self):
+        """Flush segments left behind by a previous run before accepting data"""
+        leftovers = sorted(
+            list(self.spool_dir.glob(f"*{ACTIVE_SUFFIX}"))
+            + list(self.spool_dir.glob(f"*{READY_SUFFIX}"))
+        )
+        for segment in leftovers:
+            logger.info(f"Replaying sensor spool segment {segment.name}")
+            if self._flush_segment(segment) is None:
+                self._schedule_retry(segment, 0)
+
+    def _schedule_retry(self, segment: Path, attempts: int):
+        delay = min(RETRY_BASE_DELAY * 2**attempts, RETRY_MAX_DELAY)
+        self._retries.append([time.monotonic() + delay, attempts + 1, segment])
+        logger.warning(f"Retrying sensor spool segment {segment.name} in {delay:.0f}s")
+
+    def _retry_due(self, force: bool = False):
+        """Flush failed segments whose backoff has elapsed, oldest first"""
+        now = time.monotonic()
+        due = [retry for retry in self._retries if force or retry[0] <= now]
+        if not due:
+            return
+        self._retries = [retry for retry in self._retries if retry not in due]
+        for _, attempts, segment in sorted(due, key=lambda retry: retry[2].name):
+            if self._flush_segment(segment) is None and not force:
+                self._schedule_retry(segment, attempts)
+
+    def _spawn(self, target, name: str):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads[name] = thread
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import SoilMoisture
+from .moisture_state import MoistureStateTracker
+
+
+@receiver(post_save, sender=SoilMoisture)
+def update_moisture_state(sender, instance, created, **kwargs):
+    """Fold each newly saved reading into its field's moisture state"""
+    if created:
+        MoistureStateTracker().apply([instance])
@@ -0,0 +1,262 @@
+import logging
+import math
+import numpy as np
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Optional
+from django.db import transaction
+from .models import Field, IrrigationSchedule, WaterSource
+from .water_allocation import WaterAllocator
+
+logger = logging.getLogger(__name__)
+
+SLOTS_PER_DAY = 24
+FIELD_FLOW_RATE = 100  # liters per minute, as in ScheduleOptimizer._calculate_duration
+
+# Latest day (from today) by which a field should be irrigated, per urgency
+URGENCY_DEADLINE_DAYS = {"critical": 0, "high": 1, "medium": 3, "low": None}
+URGENCY_ORDER = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+URGENCY_PRIORITY = {"critical": 10, "high": 8, "medium": 6, "low": 4}
+LATE_PENALTY_PER_DAY = 0.5  # slot score lost per day past the deadline
+
+
+class SlotScheduler:
+    """Assign the fields of a water source to non-overlapping hourly slots.
+
+    Each field needs a contiguous block of slots long enough to deliver its
+    allocation at FIELD_FLOW_RATE. Concurrent deliveries may not exceed the
+    source flow capacity and only slots inside the pumping window are used.
+    Fields are placed most urgent first into the feasible block with the best
+    mean _evaluate_time_slot score, penalized for lateness.
+    """
+
+    def __init__(self, optimizer):
+        self.optimizer = optimizer
+
+    def plan(
+        self,
+        water_source: WaterSource,
+        days: int = 7,
+        field_ids: Optional[List[int]] = None,
+        save: bool = False,
+    ) -> Dict:
+        """Plan irrigation for the fields of water_source over the next days"""
+        if field_ids is None:
+            field_ids = list(
+                Field.objects.filter(
+                    water_source=water_source, is_active=True
+                ).values_list("id", flat=True)
+            )
+
+        allocator = WaterAllocator(self.optimizer)
+        fields, field_data = allocator.prefetch(field_ids)
+        if not fields:
+            return {"error": "No fields found"}
+
+        budget = water_source.current_level * 1000  # Convert to liters
+        allocation = allocator.allocate(field_data, budget, "optimal")
+
+        now = datetime.now()
+        start_date = now.date()
+        n_slots = days * SLOTS_PER_DAY
+        capacity = water_source.flow_capacity or FIELD_FLOW_RATE
+        rate = min(FIELD_FLOW_RATE, capacity)
+
+        scores = self._slot_scores(water_source, days).ravel()
+        available = self._pump_mask(water_source, days)
+        available[: now.hour + 1] = False  # Current and past hours of today
+        used = self._reserved_flow(water_source, field_ids, start_date, days)
+
+        order = sorted(
+            range(len(fields)),
+            key=lambda i: (
+                URGENCY_ORDER[field_data["urgency"][i]],
+                -field_data["weight"][i],
+            ),
+        )
+
+        planned, unscheduled = [], []
+        for i in order:
+            field = fields[i]
+            water_amount = float(allocation[i])
+            if water_amount <= 0:
+                unscheduled.append(
+                    {"field_id": field.id, "reason": "No water allocated"}
+                )
+                continue
+
+            duration = water_amount / rate
+            length = math.ceil(duration / 60)
+            start = self._best_start(
+                scores,
+                available & (used + rate <= capacity),
+                length,
+                URGENCY_DEADLINE_DAYS[field_data["urgency"][i]],
+            )
+            if start is None:
+                unscheduled.append(
+                    {"field_id": field.id, "reason": "No free slot within horizon"}
+                )
+                continue
+
+            used[start : start + length] += rate
+            slot_date = start_date + timedelta(days=start // SLOTS_PER_DAY)
+            planned.append(
+                {
+                    "field_id": field.id,
+                    "field_name": field.name,
+                    "scheduled_date": slot_date.isoformat(),
+                    "scheduled_time": time(start % SLOTS_PER_DAY).isoformat(),
+                    "water_amount": round(water_amount, 0),
+                    "duration_minutes": int(math.ceil(duration)),
+                    "irrigation_type": "drip",
+                    "priority": URGENCY_PRIORITY[field_data["urgency"][i]],
+                    "urgency": field_data["urgency"][i],
+                    "slot_score": round(
+                        float(scores[start : start + length].mean()), 3
+                    ),
+                    "status": "scheduled",
+                }
+            )
+
+        if save:
+            self._save(fields, planned, start_date, days)
+
+        planned.sort(key=lambda s: (s["scheduled_date"], s["scheduled_time"]))
+        return {
+            "water_source": water_source.id,
+            "flow_capacity": capacity,
+            "planning_days": days,
+            "fields_count": len(fields),
+            "schedules": planned,
+            "unscheduled": unscheduled,
+            "peak_flow": float(used.max()) if n_slots else 0.0,
+            "saved": save,
+        }
+
+    @staticmethod
+    def _best_start(
+        scores: np.ndarray,
+        feasible: np.ndarray,
+        length: int,
+        deadline_day: Optional[int],
+    ) -> Optional[int]:
+        """Start slot of the best fully feasible block of length slots"""
+        if length > len(scores):
+            return None
+
+        # Sliding-window sums via cumulative sums
+        free = np.r_[0, np.cumsum(feasible)]
+        total = np.r_[0.0, np.cumsum(scores)]
+        free_in_block = free[length:] - free[:-length]
+        block_score = (total[length:] - total[:-length]) / length
+
+        candidates = free_in_block == length
+        if not candidates.any():
+            return None
+
+        if deadline_day is not None:
+            start_day = np.arange(len(block_score)) // SLOTS_PER_DAY
+            block_score = block_score - LATE_PENALTY_PER_DAY * np.maximum(
+                start_day - deadline_day, 0
+            )
+
+        # argmax keeps the earliest start among equal scores
+        return int(np.argmax(np.where(candidates, block_score, -np.inf)))
+
+    def _slot_scores(self, water_source: WaterSource, days: int) -> np.ndarray:
+        """(days, 24) slot scores from the forecast at the source location"""
+        weather_days = [
+            self.optimizer._get_weather_today(
+                water_source.location_lat, water_source.location_lon
+            )
+        ]
+        forecast = self.optimizer._get_weather_forecast(
+            water_source.location_lat, water_source.location_lon, days
+        )
+        for day in forecast[1:days]:
+            weather_days.append(self._hourly_weather(day))
+        while len(weather_days) < days:
+            weather_days.append({})
+
+        return self.optimizer._evaluate_time_slots(weather_days)
+
+    @staticmethod
+    def _hourly_weather(day: Dict) -> Dict:
+        """Spread a daily forecast over the hours with a diurnal cycle"""
+        temperature = day.get("temperature") or 25
+        humidity = day.get("humidity") or 60
+        wind = day.get("wind_speed") or 2
+        return {
+            "hourly_temperature": {
+                hour: temperature + 6 * np.sin((hour - 9) * np.pi / 12)
+                for hour in range(SLOTS_PER_DAY)
+            },
+            "hourly_wind": {hour: wind for hour in range(SLOTS_PER_DAY)},
+            "hourly_humidity": {
+                hour: humidity + 15 * np.cos(hour * np.pi / 12)
+                for hour in range(SLOTS_PER_DAY)
+            },
+        }
+
+    @staticmethod
+    def _pump_mask(water_source: WaterSource, days: int) -> np.ndarray:
+        """Slots inside the daily pumping window (which may wrap midnight)"""
+        hours = np.arange(SLOTS_PER_DAY)
+        start = water_source.pump_available_from
+        end = water_source.pump_available_until
+        if start is None or end is None:
+            daily = np.ones(SLOTS_PER_DAY, dtype=bool)
+        elif start < end:
+            daily = (hours >= start.hour) & (hours < max(end.hour, start.hour + 1))
+        else:
+            daily = (hours >= start.hour) | (hours < end.hour)
+        return np.tile(daily, days)
+
+    @staticmethod
+    def _reserved_flow(
+        water_source: WaterSource, field_ids: List[int], start_date, days: int
+    ) -> np.ndarray:
+        """Flow already committed by other fields' schedules on this source"""
+        used = np.zeros(days * SLOTS_PER_DAY)
+        existing = (
+            IrrigationSchedule.objects.filter(
+                field__water_source=water_source,
+                status__in=["scheduled", "in_progress"],
+                scheduled_date__gte=start_date,
+                scheduled_date__lt=start_date + timedelta(days=days),
+            )
+            .exclude(field_id__in=field_ids)
+            .values_list("scheduled_date", "scheduled_time", "duration_minutes")
+        )
+        for scheduled_date, scheduled_time, duration in existing:
+            start = (scheduled_date - start_date).days * SLOTS_PER_DAY
+            start += scheduled_time.hour
+            used[start : start + math.ceil(max(duration, 1) / 60)] += FIELD_FLOW_RATE
+        return used
+
+    @staticmethod
+    def _save(fields: List[Field], planned: List[Dict], start_date, days: int):
+        """Replace the pending schedules of the planned fields within the horizon"""
+        with transaction.atomic():
+            IrrigationSchedule.objects.filter(
+                field__in=fields,
+                status="scheduled",
+                scheduled_date__gte=start_date,
+                scheduled_date__lt=start_date + timedelta(days=days),
+            ).delete()
+            IrrigationSchedule.objects.bulk_create(
+                [
+                    IrrigationSchedule(
+                        field_id=entry["field_id"],
+                        scheduled_date=entry["scheduled_date"],
+                        scheduled_time=entry["scheduled_time"],
+                        duration_minutes=entry["duration_minutes"],
+                        water_amount=entry["water_amount"],
+                        irrigation_type=entry["irrigation_type"],
+                        priority=entry["priority"],
+                        notes="Planned by water source scheduler",
+                    )
+                    for entry in planned
+                ],
+                batch_size=1000,
+            )
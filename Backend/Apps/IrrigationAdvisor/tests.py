@@ -1,3 +1,82 @@
+import numpy as np
+from datetime import timedelta
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+from .models import CropWaterRequirement, Field, FieldMoistureState, SoilMoisture
+from .moisture_analyzer import MoistureAnalyzer
+from .moisture_state import DECAY_DAYS
 
-# Create your tests here.
+CRITICAL_LEVEL = 30.0
+
+
+class FieldMoistureStateTests(TestCase):
+    """The decayed regression folded per reading against the raw readings"""
+
+    def setUp(self):
+        today = timezone.localdate()
+        self.field = Field.objects.create(
+            user=User.objects.create_user("grower"),
+            name="North",
+            area=2.0,
+            soil_type="loam",
+            crop_type="wheat",
+            planting_date=today - timedelta(days=10),
+            expected_harvest_date=today + timedelta(days=90),
+            latitude=18.5,
+            longitude=73.8,
+        )
+        CropWaterRequirement.objects.create(
+            crop_name="wheat",
+            growth_stage="initial",
+            daily_water_requirement=4.0,
+            critical_moisture_level=CRITICAL_LEVEL,
+            optimal_moisture_level=60.0,
+            max_moisture_level=80.0,
+            root_depth=30.0,
+            crop_coefficient=0.7,
+        )
+        self.start = timezone.now() - timedelta(days=6)
+
+    def read(self, hours: float, moisture_level: float):
+        SoilMoisture.objects.create(
+            field=self.field,
+            timestamp=self.start + timedelta(hours=hours),
+            moisture_level=moisture_level,
+        )
+
+    def expected_rate(self) -> float:
+        """Depletion rate recomputed by weighted least squares over every reading"""
+        days, levels = MoistureAnalyzer()._load_series(
+            SoilMoisture.objects.filter(field=self.field)
+        )
+        weights = np.exp(-(days.max() - days) / DECAY_DAYS)
+        slope = np.polyfit(days, levels, 1, w=np.sqrt(weights))[0]
+        return -slope
+
+    def test_folded_readings_match_raw_regression(self):
+        rng = np.random.default_rng(5)
+        hours = [0, 9, 20, 31, 50, 64, 75, 90, 101, 118]
+        levels = 70 - 0.12 * np.array(hours) + rng.normal(0, 0.8, len(hours))
+        for hour, level in zip(hours[:6], levels[:6]):
+            self.read(hour, float(level))
+        # Arrives after later readings were folded
+        self.read(40, 65.0)
+        for hour, level in zip(hours[6:], levels[6:]):
+            self.read(hour, float(level))
+
+        state = FieldMoistureState.objects.get(field=self.field)
+        self.assertEqual(state.reading_count, len(hours) + 1)
+        expected_rate = self.expected_rate()
+        self.assertAlmostEqual(state.depletion_rate, expected_rate, 9)
+
+        expected_days = (state.last_moisture - CRITICAL_LEVEL) / expected_rate
+        self.assertEqual(state.critical_level, CRITICAL_LEVEL)
+        self.assertAlmostEqual(state.days_to_critical, expected_days, 6)
+        self.assertEqual(
+            state.critical_at,
+            MoistureAnalyzer.projected_critical_at(state, CRITICAL_LEVEL),
+        )
+
+        prediction = MoistureAnalyzer().predict_moisture_depletion(self.field.id)
+        self.assertAlmostEqual(prediction["depletion_rate_per_day"], expected_rate, 9)
@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Sum, Avg, Count, Q
 from datetime import datetime, timedelta
 from .models import (
@@ -12,6 +13,7 @@ from .models import (
     IrrigationHistory,
     WaterSource,
     CropWaterRequirement,
+    ScheduleRun,
 )
 from .serializers import (
     FieldSerializer,
@@ -25,6 +27,14 @@ from .serializers import (
 )
 from .moisture_analyzer import MoistureAnalyzer
 from .schedule_optimizer import ScheduleOptimizer
+from .moisture_ingest import MoistureIngestor, IngestInProgress
+from .water_allocation import ALLOCATION_MODES
+from .irrigation_stats import (
+    GROUP_BY_TRUNC,
+    IrrigationStatistics,
+    record_execution,
+    summary_enabled,
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -47,25 +57,44 @@ class FieldViewSet(viewsets.ModelViewSet):
         """Get current moisture status for a field"""
         field = self.get_object()
 
-        # Get latest moisture reading
-        latest_reading = (
-            SoilMoisture.objects.filter(field=field).order_by("-timestamp").first()
-        )
+        analyzer = MoistureAnalyzer()
+        return Response(analyzer.moisture_status(field))
 
-        if not latest_reading:
-            return Response(
-                {
-                    "field": field.name,
-                    "status": "no_data",
-                    "message": "No moisture readings available",
-                }
-            )
+    @action(detail=False, methods=["get"])
+    def moisture_overview(self, request):
+        """Moisture trends for every field of the user in one call"""
+        days = int(request.query_params.get("days", 7))
+        fields = dict(
+            self.get_queryset().filter(is_active=True).values_list("id", "name")
+        )
 
-        # Analyze moisture
         analyzer = MoistureAnalyzer()
-        analysis = analyzer.analyze_moisture_trends(field.id, days=7)
+        analyses = analyzer.analyze_many(list(fields), days=days)
 
-        return Response(analysis)
+        return Response(
+            {
+                "period_days": days,
+                "fields": [
+                    dict(analysis, field=fields[field_id])
+                    for field_id, analysis in analyses.items()
+                ],
+            }
+        )
+
+    @action(detail=False, methods=["get"])
+    def irrigation_projection(self, request):
+        """Projected irrigation dates for every field of the user"""
+        days = int(request.query_params.get("days", 7))
+        field_ids = list(
+            self.get_queryset().filter(is_active=True).values_list("id", flat=True)
+        )
+
+        optimizer = ScheduleOptimizer()
+        projections = optimizer.project_irrigation_dates(field_ids, days)
+        if "error" in projections:
+            return Response(projections, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({"period_days": days, "fields": list(projections.values())})
 
     @action(detail=True, methods=["get"])
     def irrigation_history(self, request, pk=None):
@@ -177,18 +206,44 @@ class SoilMoistureViewSet(viewsets.ModelViewSet):
     def bulk_upload(self, request):
         """Bulk upload moisture readings"""
         readings = request.data.get("readings", [])
-        created_count = 0
-        errors = []
 
-        for reading_data in readings:
-            serializer = self.get_serializer(data=reading_data)
-            if serializer.is_valid():
-                serializer.save()
-                created_count += 1
-            else:
-                errors.append({"data": reading_data, "errors": serializer.errors})
+        ingestor = MoistureIngestor(user=request.user)
+        result = ingestor.ingest_records(
+            (row, reading if isinstance(reading, dict) else None)
+            for row, reading in enumerate(readings, start=1)
+        )
+
+        errors = [
+            {"data": readings[error["row"] - 1], "errors": error["errors"]}
+            for error in result["errors"]
+        ]
+
+        return Response({"created": result["created"], "errors": errors})
+
+    @action(detail=False, methods=["post"])
+    def ingest(self, request):
+        """Stream NDJSON or CSV moisture readings in batches"""
+        content_type = request.content_type or ""
+        if "ndjson" not in content_type and "csv" not in content_type:
+            return Response(
+                {"error": "Content-Type must be application/x-ndjson or text/csv"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
 
-        return Response({"created": created_count, "errors": errors})
+        ingestor = MoistureIngestor(user=request.user)
+        try:
+            result = ingestor.ingest_stream(
+                request.stream or [],
+                content_type,
+                idempotency_key=request.headers.get("Idempotency-Key"),
+            )
+        except IngestInProgress:
+            return Response(
+                {"error": "A request with this Idempotency-Key is still processing"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(result)
 
     @action(detail=False, methods=["get"])
     def analyze_trends(self, request):
@@ -268,25 +323,31 @@ class IrrigationScheduleViewSet(viewsets.ModelViewSet):
         schedule.save()
 
         # Create history record (in production, this would be done after actual irrigation)
-        actual_duration = request.data.get("duration", schedule.duration_minutes)
-        water_used = request.data.get("water_used", schedule.water_amount)
-
-        history = IrrigationHistory.objects.create(
-            field=schedule.field,
-            schedule=schedule,
-            irrigation_date=schedule.scheduled_date,
-            start_time=schedule.scheduled_time,
-            end_time=(
-                datetime.combine(datetime.today(), schedule.scheduled_time)
-                + timedelta(minutes=actual_duration)
-            ).time(),
-            actual_duration=actual_duration,
-            water_used=water_used,
-            irrigation_type=schedule.irrigation_type,
-            moisture_before=request.data.get("moisture_before"),
-            moisture_after=request.data.get("moisture_after"),
-            notes=request.data.get("notes", ""),
-        )
+        actual_duration = int(request.data.get("duration", schedule.duration_minutes))
+        water_used = float(request.data.get("water_used", schedule.water_amount))
+
+        # The summary folds the history as stored, and only if it is stored
+        with transaction.atomic():
+            history = IrrigationHistory.objects.create(
+                field=schedule.field,
+                schedule=schedule,
+                irrigation_date=schedule.scheduled_date,
+                start_time=schedule.scheduled_time,
+                end_time=(
+                    datetime.combine(datetime.today(), schedule.scheduled_time)
+                    + timedelta(minutes=actual_duration)
+                ).time(),
+                actual_duration=actual_duration,
+                water_used=water_used,
+                irrigation_type=schedule.irrigation_type,
+                moisture_before=request.data.get("moisture_before"),
+                moisture_after=request.data.get("moisture_after"),
+                notes=request.data.get("notes", ""),
+            )
+
+            if summary_enabled():
+                history.refresh_from_db()
+                record_execution(history)
 
         # Update schedule status to completed
         schedule.status = "completed"
@@ -317,26 +378,36 @@ class IrrigationScheduleViewSet(viewsets.ModelViewSet):
         """Optimize schedules for multiple fields"""
         field_ids = request.data.get("field_ids", [])
         water_source_id = request.data.get("water_source_id")
+        allocation_mode = request.data.get("allocation_mode", "optimal")
 
         if not field_ids:
             return Response(
                 {"error": "Field IDs are required"}, status=status.HTTP_400_BAD_REQUEST
             )
 
+        if allocation_mode not in ALLOCATION_MODES:
+            return Response(
+                {"error": f"allocation_mode must be one of {ALLOCATION_MODES}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         optimizer = ScheduleOptimizer()
         optimization_result = optimizer.optimize_multiple_fields(
-            field_ids, water_source_id
+            field_ids, water_source_id, allocation_mode
         )
 
         return Response(optimization_result)
 
     @action(detail=False, methods=["get"])
     def today_schedule(self, request):
-        """Get today's irrigation schedule"""
+        """Get today's irrigation schedule (precomputed nightly, read only)"""
         today = timezone.now().date()
 
         schedules = (
-            self.get_queryset().filter(scheduled_date=today).order_by("scheduled_time")
+            self.get_queryset()
+            .filter(scheduled_date=today)
+            .select_related("field")
+            .order_by("scheduled_time")
         )
 
         serializer = self.get_serializer(schedules, many=True)
@@ -354,6 +425,11 @@ class IrrigationScheduleViewSet(viewsets.ModelViewSet):
                 "date": today.isoformat(),
                 "schedules": serializer.data,
                 "summary": summary,
+                "precomputed_at": (
+                    ScheduleRun.objects.filter(run_date__lte=today, status="completed")
+                    .values_list("finished_at", flat=True)
+                    .first()
+                ),
             }
         )
 
@@ -373,38 +449,8 @@ class IrrigationHistoryViewSet(viewsets.ReadOnlyModelViewSet):
         field_id = request.query_params.get("field")
         days = int(request.query_params.get("days", 30))
 
-        queryset = self.get_queryset()
-
-        if field_id:
-            queryset = queryset.filter(field_id=field_id)
-
-        start_date = timezone.now() - timedelta(days=days)
-        queryset = queryset.filter(irrigation_date__gte=start_date.date())
-
-        # Calculate statistics
-        stats = queryset.aggregate(
-            total_events=Count("id"),
-            total_water=Sum("water_used"),
-            avg_water=Avg("water_used"),
-            total_duration=Sum("actual_duration"),
-            avg_duration=Avg("actual_duration"),
-            total_cost=Sum("cost"),
-            total_energy=Sum("energy_consumed"),
-        )
-
-        # Calculate efficiency metrics
-        efficiency_data = []
-        for history in queryset:
-            if history.moisture_before and history.moisture_after:
-                improvement = history.moisture_after - history.moisture_before
-                if history.water_used > 0:
-                    efficiency = (improvement / history.water_used) * 1000
-                    efficiency_data.append(efficiency)
-
-        if efficiency_data:
-            stats["avg_efficiency"] = sum(efficiency_data) / len(efficiency_data)
-            stats["max_efficiency"] = max(efficiency_data)
-            stats["min_efficiency"] = min(efficiency_data)
+        start_date = (timezone.now() - timedelta(days=days)).date()
+        stats = IrrigationStatistics().statistics(request.user, start_date, field_id)
 
         return Response({"period_days": days, "statistics": stats})
 
@@ -414,27 +460,16 @@ class IrrigationHistoryViewSet(viewsets.ReadOnlyModelViewSet):
         days = int(request.query_params.get("days", 30))
         group_by = request.query_params.get("group_by", "day")  # day, week, month
 
-        start_date = timezone.now() - timedelta(days=days)
-        queryset = self.get_queryset().filter(irrigation_date__gte=start_date.date())
-
-        consumption_data = []
-
-        if group_by == "day":
-            # Group by day
-            dates = (
-                queryset.values("irrigation_date")
-                .annotate(total_water=Sum("water_used"), event_count=Count("id"))
-                .order_by("irrigation_date")
+        if group_by not in GROUP_BY_TRUNC:
+            return Response(
+                {"error": f"group_by must be one of {list(GROUP_BY_TRUNC)}"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-            for entry in dates:
-                consumption_data.append(
-                    {
-                        "date": entry["irrigation_date"].isoformat(),
-                        "water_used": entry["total_water"],
-                        "events": entry["event_count"],
-                    }
-                )
+        start_date = (timezone.now() - timedelta(days=days)).date()
+        consumption_data = IrrigationStatistics().consumption(
+            request.user, start_date, group_by
+        )
 
         return Response(
             {
@@ -471,6 +506,21 @@ class WaterSourceViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(water_source)
         return Response(serializer.data)
 
+    @action(detail=True, methods=["post"])
+    def plan_irrigation(self, request, pk=None):
+        """Plan irrigation slots for all fields sharing this source"""
+        water_source = self.get_object()
+        days = int(request.data.get("days", 7))
+        field_ids = request.data.get("field_ids")
+        save = bool(request.data.get("save", False))
+
+        optimizer = ScheduleOptimizer()
+        plan = optimizer.plan_water_source(water_source.id, days, field_ids, save)
+
+        if "error" in plan:
+            return Response(plan, status=status.HTTP_400_BAD_REQUEST)
+        return Response(plan)
+
     @action(detail=False, methods=["get"])
     def availability(self, request):
         """Check water availability across all sources"""
@@ -0,0 +1,240 @@
+import logging
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from .models import Field, FieldMoistureState, CropWaterRequirement
+
+logger = logging.getLogger(__name__)
+
+ALLOCATION_MODES = ["optimal", "lp", "greedy"]
+
+# Fractions of its need a field may receive; below half the irrigation is postponed
+ALLOCATION_LEVELS = (0.5, 0.75, 1.0)
+MIN_ALLOCATION_FRACTION = ALLOCATION_LEVELS[0]
+
+# Knapsack solver: fields around the LP break item solved exactly, and the
+# resolution of the budget they share
+CORE_SIZE = 200
+BUDGET_BINS = 10000
+
+URGENCY_WEIGHTS = {"critical": 2.0, "high": 1.5, "medium": 1.2, "low": 1.0}
+DEFAULT_WATER_NEED = 5000  # liters, used when crop requirements are missing
+
+
+class WaterAllocator:
+    """Allocate a water budget across fields to maximize weighted benefit.
+
+    Serving a fraction f of a field's need yields weight * f, where the
+    weight combines the field priority score and its irrigation urgency.
+    """
+
+    def __init__(self, optimizer):
+        self.optimizer = optimizer
+
+    def prefetch(self, field_ids: List[int]) -> Tuple[List[Field], Dict]:
+        """Load fields, moisture state and crop requirements in two queries"""
+        fields = list(
+            Field.objects.filter(id__in=field_ids).select_related("moisture_state")
+        )
+        crop_names = {field.crop_type for field in fields}
+
+        requirements, fallback = {}, {}
+        for crop_req in CropWaterRequirement.objects.filter(crop_name__in=crop_names):
+            requirements[(crop_req.crop_name, crop_req.growth_stage)] = crop_req
+            fallback.setdefault(crop_req.crop_name, crop_req)
+
+        analyzer = self.optimizer.moisture_analyzer
+        today = datetime.now().date()
+        n = len(fields)
+        data = {
+            "priority": np.zeros(n),
+            "need": np.zeros(n),
+            "weight": np.zeros(n),
+            "urgency": [],
+        }
+
+        for i, field in enumerate(fields):
+            stage = self._growth_stage(field, today)
+            crop_req = None
+            if stage is not None:
+                crop_req = requirements.get((field.crop_type, stage)) or fallback.get(
+                    field.crop_type
+                )
+
+            try:
+                state = field.moisture_state
+            except FieldMoistureState.DoesNotExist:
+                state = None
+            latest_moisture = state.last_moisture if state else None
+
+            priority = self.optimizer._score_priority(field, latest_moisture, crop_req)
+
+            if crop_req:
+                weather = analyzer._get_weather_data(
+                    field.latitude, field.longitude, datetime.now()
+                )
+                etc = analyzer._calculate_reference_et(weather) * (
+                    crop_req.crop_coefficient
+                )
+                need = round(etc * field.area * 10000 / 1000, 0)
+            else:
+                need = DEFAULT_WATER_NEED
+
+            days_to_critical = float("inf")
+            if crop_req and state and latest_moisture is not None:
+                days = analyzer.days_until(
+                    analyzer.projected_critical_at(
+                        state, crop_req.critical_moisture_level
+                    )
+                )
+                if days is not None:
+                    days_to_critical = days
+            urgency = self.optimizer._urgency_from_days(days_to_critical)
+
+            data["priority"][i] = priority
+            data["need"][i] = need
+            data["weight"][i] = priority * URGENCY_WEIGHTS[urgency]
+            data["urgency"].append(urgency)
+
+        return fields, data
+
+    def allocate(
+        self, data: Dict, budget: Optional[float], mode: str = "optimal"
+    ) -> np.ndarray:
+        """Liters allocated to each field under the budget"""
+        need = data["need"]
+        if budget is None or need.sum() <= budget:
+            return need.copy()
+
+        if mode == "greedy":
+            return self._allocate_greedy(need, data["priority"], budget)
+        if mode == "lp":
+            return self._allocate_lp(need, data["weight"], budget)
+        return self._allocate_knapsack(need, data["weight"], budget)
+
+    @staticmethod
+    def _allocate_greedy(
+        need: np.ndarray, priority: np.ndarray, budget: float
+    ) -> np.ndarray:
+        """Original policy: serve by priority, partial when at least half fits"""
+        allocation = np.zeros_like(need)
+        remaining = budget
+        for i in np.argsort(-priority, kind="stable"):
+            if need[i] <= remaining:
+                allocation[i] = need[i]
+            elif remaining > need[i] * MIN_ALLOCATION_FRACTION:
+                allocation[i] = remaining
+            remaining -= allocation[i]
+        return allocation
+
+    @staticmethod
+    def _allocate_lp(need: np.ndarray, weight: np.ndarray, budget: float) -> np.ndarray:
+        """LP relaxation: fill by benefit per liter, skipping too-small remainders"""
+        allocation = np.zeros_like(need)
+        remaining = budget
+        for i in WaterAllocator._density_order(need, weight):
+            if need[i] <= remaining:
+                allocation[i] = need[i]
+            elif remaining >= need[i] * MIN_ALLOCATION_FRACTION:
+                allocation[i] = remaining
+            remaining -= allocation[i]
+        return allocation
+
+    def _allocate_knapsack(
+        self, need: np.ndarray, weight: np.ndarray, budget: float
+    ) -> np.ndarray:
+        """Core knapsack: exact DP around the LP break item, LP elsewhere.
+
+        Fields well above the break item in benefit per liter are served in
+        full and fields well below it are left out, as in any near-optimal
+        solution; only the CORE_SIZE fields in between go through the DP.
+        """
+        order = self._density_order(need, weight)
+        break_item = int(np.argmin(np.cumsum(need[order]) <= budget))
+        low = max(break_item - CORE_SIZE // 2, 0)
+        high = min(break_item + CORE_SIZE // 2, len(order))
+
+        allocation = np.zeros_like(need)
+        allocation[order[:low]] = need[order[:low]]
+        core = order[low:high]
+        allocation[core] = self._solve_core(
+            need[core], weight[core], budget - allocation.sum()
+        )
+
+        # Fill what the DP left over with the remaining fields that still fit
+        remaining = budget - allocation.sum()
+        for i in order[high:]:
+            if need[i] <= remaining:
+                allocation[i] = need[i]
+                remaining -= need[i]
+
+        heuristic = self._allocate_lp(need, weight, budget)
+        if self._benefit(heuristic, need, weight) > self._benefit(
+            allocation, need, weight
+        ):
+            return heuristic
+        return allocation
+
+    @staticmethod
+    def _solve_core(need: np.ndarray, weight: np.ndarray, budget: float) -> np.ndarray:
+        """Multiple-choice knapsack over ALLOCATION_LEVELS on a discretized budget"""
+        n = len(need)
+        allocation = np.zeros_like(need)
+        if n == 0 or budget <= 0:
+            return allocation
+
+        unit = budget / BUDGET_BINS
+        levels = np.array(ALLOCATION_LEVELS)
+        # Round costs up so the chosen allocations never exceed the budget
+        costs = np.ceil(np.outer(need, levels) / unit - 1e-9).astype(np.int64)
+        values = np.outer(weight, levels)
+
+        best = np.zeros(BUDGET_BINS + 1)
+        choice = np.zeros((n, BUDGET_BINS + 1), dtype=np.int8)
+        for i in range(n):
+            updated = best.copy()
+            for level in range(len(levels)):
+                cost = costs[i, level]
+                if cost > BUDGET_BINS:
+                    break
+                candidate = np.full(BUDGET_BINS + 1, -np.inf)
+                candidate[cost:] = best[: BUDGET_BINS + 1 - cost] + values[i, level]
+                better = candidate > updated
+                updated[better] = candidate[better]
+                choice[i, better] = level + 1
+            best = updated
+
+        capacity = BUDGET_BINS
+        for i in range(n - 1, -1, -1):
+            level = choice[i, capacity]
+            if level:
+                allocation[i] = need[i] * levels[level - 1]
+                capacity -= costs[i, level - 1]
+        return allocation
+
+    @staticmethod
+    def _density_order(need: np.ndarray, weight: np.ndarray) -> np.ndarray:
+        """Field indices by benefit per liter, highest first"""
+        with np.errstate(divide="ignore"):
+            density = np.where(need > 0, weight / need, np.inf)
+        return np.argsort(-density, kind="stable")
+
+    @staticmethod
+    def _benefit(allocation: np.ndarray, need: np.ndarray, weight: np.ndarray) -> float:
+        served = np.divide(allocation, need, out=np.ones_like(need), where=need > 0)
+        return float((weight * served).sum())
+
+    @staticmethod
+    def _growth_stage(field: Field, today) -> Optional[str]:
+        total_growth_period = (field.expected_harvest_date - field.planting_date).days
+        if total_growth_period <= 0:
+            return None
+
+        growth_percentage = (today - field.planting_date).days / total_growth_period
+        if growth_percentage < 0.25:
+            return "initial"
+        elif growth_percentage < 0.5:
+            return "development"
+        elif growth_percentage < 0.75:
+            return "mid_season"
+        return "late_season"
@@ -0,0 +1,326 @@
+import logging
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from Apps.WeatherIntegration.weather_surface import get_weather_surface
+from .models import Field, FieldMoistureState, CropWaterRequirement
+from .water_allocation import WaterAllocator
+
+logger = logging.getLogger(__name__)
+
+# Volumetric water content at field capacity and wilting point (FAO-56 Table 19)
+SOIL_WATER = {
+    "sandy": (0.12, 0.05),
+    "loam": (0.25, 0.12),
+    "silt": (0.29, 0.15),
+    "clay": (0.36, 0.22),
+    "peat": (0.50, 0.25),
+    "chalk": (0.27, 0.12),
+}
+DEFAULT_SOIL_WATER = SOIL_WATER["loam"]
+
+DEPLETION_FRACTION = 0.5  # p: share of TAW usable before water stress
+IRRIGATION_EFFICIENCY = 0.9
+EFFECTIVE_RAINFALL = 0.8  # Same 80% efficiency as the schedule optimizer
+LITERS_PER_MM_HECTARE = 10000
+
+# Defaults for forecast gaps, matching the optimizer's placeholder weather
+DEFAULT_WEATHER = {
+    "temperature_min": 18.0,
+    "temperature_max": 30.0,
+    "humidity": 60.0,
+    "wind_speed": 2.0,
+    "precipitation_amount": 0.0,
+}
+
+STEFAN_BOLTZMANN = 4.903e-9  # MJ K-4 m-2 day-1
+SOLAR_CONSTANT = 0.0820  # MJ m-2 min-1
+
+
+def penman_monteith_et0(
+    t_min: np.ndarray,
+    t_max: np.ndarray,
+    humidity: np.ndarray,
+    wind_10m: np.ndarray,
+    latitude: np.ndarray,
+    elevation: np.ndarray,
+    day_of_year: np.ndarray,
+    cloud_coverage: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """FAO-56 daily reference evapotranspiration (mm/day), element-wise.
+
+    Solar radiation comes from cloud cover (Angstrom) where available and
+    from the Hargreaves temperature-range estimate otherwise.
+    """
+    t_mean = (t_min + t_max) / 2
+    u2 = wind_10m * 4.87 / np.log(67.8 * 10 - 5.42)
+
+    def saturation(t):
+        return 0.6108 * np.exp(17.27 * t / (t + 237.3))
+
+    es = (saturation(t_max) + saturation(t_min)) / 2
+    ea = np.clip(humidity, 0, 100) / 100 * es
+    delta = 4098 * saturation(t_mean) / (t_mean + 237.3) ** 2
+    pressure = 101.3 * ((293 - 0.0065 * elevation) / 293) ** 5.26
+    gamma = 0.000665 * pressure
+
+    # Extraterrestrial radiation
+    phi = np.radians(latitude)
+    dr = 1 + 0.033 * np.cos(2 * np.pi * day_of_year / 365)
+    declination = 0.409 * np.sin(2 * np.pi * day_of_year / 365 - 1.39)
+    ws = np.arccos(np.clip(-np.tan(phi) * np.tan(declination), -1, 1))
+    ra = (
+        24
+        * 60
+        / np.pi
+        * SOLAR_CONSTANT
+        * dr
+        * (
+            ws * np.sin(phi) * np.sin(declination)
+            + np.cos(phi) * np.cos(declination) * np.sin(ws)
+        )
+    )
+
+    rs = 0.16 * np.sqrt(np.maximum(t_max - t_min, 0)) * ra
+    if cloud_coverage is not None:
+        sunshine = 1 - np.clip(cloud_coverage, 0, 100) / 100
+        rs = np.where(np.isnan(cloud_coverage), rs, (0.25 + 0.5 * sunshine) * ra)
+
+    rso = (0.75 + 2e-5 * elevation) * ra
+    rns = 0.77 * rs
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cloudiness = np.where(rso > 0, np.clip(rs / rso, 0.25, 1.0), 0.5)
+    rnl = (
+        STEFAN_BOLTZMANN
+        * ((t_max + 273.16) ** 4 + (t_min + 273.16) ** 4)
+        / 2
+        * (0.34 - 0.14 * np.sqrt(ea))
+        * (1.35 * cloudiness - 0.35)
+    )
+    rn = rns - rnl
+
+    et0 = (0.408 * delta * rn + gamma * 900 / (t_mean + 273) * u2 * (es - ea)) / (
+        delta + gamma * (1 + 0.34 * u2)
+    )
+    return np.maximum(et0, 0)
+
+
+class WaterBalanceSimulator:
+    """FAO-56 daily root-zone water balance for many fields at once.
+
+    Depletion Dr (mm) advances as Dr = Dr - effective rain + Ks * Kc * ET0.
+    A field is irrigated back to field capacity at the end of a day on
+    which Dr exceeds the readily available water.
+    """
+
+    def __init__(self, irrigation_efficiency: float = IRRIGATION_EFFICIENCY):
+        self.irrigation_efficiency = irrigation_efficiency
+
+    def project(self, field_ids: List[int], days: int = 7) -> Dict[int, Dict]:
+        """Projected irrigation events per field over the next days"""
+        fields = list(
+            Field.objects.filter(id__in=field_ids).select_related("moisture_state")
+        )
+        results = {
+            field_id: {"field_id": field_id, "status": "not_found"}
+            for field_id in field_ids
+        }
+        if not fields:
+            return results
+
+        inputs = self.load_inputs(fields, days)
+        balance = self.simulate(inputs)
+        start = inputs["start_date"]
+
+        for i, field in enumerate(fields):
+            if not inputs["configured"][i]:
+                results[field.id] = {
+                    "field_id": field.id,
+                    "field_name": field.name,
+                    "status": "crop_requirements_missing",
+                }
+                continue
+
+            irrigation_days = np.flatnonzero(balance["irrigation_mm"][i] > 0)
+            events = [
+                {
+                    "date": (start + timedelta(days=int(d))).isoformat(),
+                    "net_depth_mm": round(float(balance["net_irrigation_mm"][i, d]), 1),
+                    "gross_depth_mm": round(float(balance["irrigation_mm"][i, d]), 1),
+                    "water_liters": round(
+                        float(balance["irrigation_mm"][i, d])
+                        * field.area
+                        * LITERS_PER_MM_HECTARE
+                    ),
+                }
+                for d in irrigation_days
+            ]
+            results[field.id] = {
+                "field_id": field.id,
+                "field_name": field.name,
+                "status": "ok",
+                "initial_state": (
+                    "measured" if inputs["measured"][i] else "assumed_half_raw"
+                ),
+                "total_available_water_mm": round(float(inputs["taw"][i]), 1),
+                "readily_available_water_mm": round(float(inputs["raw"][i]), 1),
+                "next_irrigation_date": events[0]["date"] if events else None,
+                "irrigation_events": events,
+                "daily_et0_mm": np.round(inputs["et0"][i], 2).tolist(),
+                "daily_etc_mm": np.round(balance["etc_mm"][i], 2).tolist(),
+                "daily_depletion_mm": np.round(balance["depletion_mm"][i], 1).tolist(),
+            }
+
+        return results
+
+    def load_inputs(self, fields: List[Field], days: int) -> Dict:
+        """Assemble the (fields, days) input arrays for simulate"""
+        n = len(fields)
+        start_date = datetime.now().date()
+        dates = [start_date + timedelta(days=d) for d in range(days)]
+
+        requirements, fallback = {}, {}
+        for crop_req in CropWaterRequirement.objects.filter(
+            crop_name__in={field.crop_type for field in fields}
+        ):
+            requirements[(crop_req.crop_name, crop_req.growth_stage)] = crop_req
+            fallback.setdefault(crop_req.crop_name, crop_req)
+
+        kc = np.ones((n, days))
+        root_depth_m = np.full(n, 0.5)
+        configured = np.zeros(n, dtype=bool)
+        theta_fc = np.empty(n)
+        theta_wp = np.empty(n)
+        moisture = np.full(n, np.nan)
+
+        for i, field in enumerate(fields):
+            theta_fc[i], theta_wp[i] = SOIL_WATER.get(
+                field.soil_type, DEFAULT_SOIL_WATER
+            )
+            try:
+                state = field.moisture_state
+                if state.last_moisture is not None:
+                    moisture[i] = state.last_moisture / 100
+            except FieldMoistureState.DoesNotExist:
+                pass
+
+            for d, day in enumerate(dates):
+                stage = WaterAllocator._growth_stage(field, day)
+                crop_req = requirements.get((field.crop_type, stage)) or fallback.get(
+                    field.crop_type
+                )
+                if crop_req is None:
+                    break
+                configured[i] = True
+                kc[i, d] = crop_req.crop_coefficient
+                if d == 0:
+                    root_depth_m[i] = crop_req.root_depth / 100
+
+        taw = 1000 * (theta_fc - theta_wp) * root_depth_m
+        raw = DEPLETION_FRACTION * taw
+        measured = ~np.isnan(moisture)
+        initial = np.where(
+            measured,
+            np.clip(1000 * (theta_fc - np.nan_to_num(moisture)) * root_depth_m, 0, taw),
+            raw / 2,
+        )
+
+        weather = self._forecast(fields, days)
+        latitude = np.array([field.latitude for field in fields])[:, None]
+        elevation = np.array(
+            [field.elevation or 0.0 for field in fields], dtype=np.float64
+        )[:, None]
+        day_of_year = np.array([day.timetuple().tm_yday for day in dates])[None, :]
+
+        et0 = penman_monteith_et0(
+            weather["temperature_min"],
+            weather["temperature_max"],
+            weather["humidity"],
+            weather["wind_speed"],
+            latitude,
+            elevation,
+            day_of_year,
+            weather["cloud_coverage"],
+        )
+
+        return {
+            "start_date": start_date,
+            "et0": et0,
+            "kc": kc,
+            "rainfall": weather["precipitation_amount"],
+            "taw": taw,
+            "raw": raw,
+            "initial_depletion": initial,
+            "measured": measured,
+            "configured": configured,
+        }
+
+    def simulate(self, inputs: Dict) -> Dict[str, np.ndarray]:
+        """Advance the water balance day by day for all fields together"""
+        et0, kc = inputs["et0"], inputs["kc"]
+        taw, raw = inputs["taw"], inputs["raw"]
+        effective_rain = EFFECTIVE_RAINFALL * inputs["rainfall"]
+        n, days = et0.shape
+
+        depletion = inputs["initial_depletion"].copy()
+        depletion_mm = np.zeros((n, days))
+        etc_mm = np.zeros((n, days))
+        net_irrigation_mm = np.zeros((n, days))
+        percolation_mm = np.zeros((n, days))
+
+        stress_span = np.maximum((1 - DEPLETION_FRACTION) * taw, 1e-9)
+        for d in range(days):
+            ks = np.where(
+                depletion > raw, np.clip((taw - depletion) / stress_span, 0, 1), 1.0
+            )
+            etc_mm[:, d] = ks * kc[:, d] * et0[:, d]
+            depletion = depletion - effective_rain[:, d] + etc_mm[:, d]
+
+            percolation_mm[:, d] = np.maximum(-depletion, 0)
+            depletion = np.clip(depletion, 0, taw)
+
+            irrigate = depletion > raw
+            net_irrigation_mm[irrigate, d] = depletion[irrigate]
+            depletion[irrigate] = 0
+            depletion_mm[:, d] = depletion
+
+        return {
+            "depletion_mm": depletion_mm,
+            "etc_mm": etc_mm,
+            "net_irrigation_mm": net_irrigation_mm,
+            "irrigation_mm": net_irrigation_mm / self.irrigation_efficiency,
+            "percolation_mm": percolation_mm,
+        }
+
+    @staticmethod
+    def _forecast(fields: List[Field], days: int) -> Dict[str, np.ndarray]:
+        """(fields, days) forecast arrays from the interpolated weather surface"""
+        n = len(fields)
+        weather = {
+            name: np.full((n, days), value) for name, value in DEFAULT_WEATHER.items()
+        }
+        weather["cloud_coverage"] = np.full((n, days), np.nan)
+
+        try:
+            surface = get_weather_surface()
+            offset = (datetime.now().date() - surface.forecast_start).days
+            estimate = surface.estimate_many(
+                np.array([[field.latitude, field.longitude] for field in fields]),
+                elevations=np.array(
+                    [
+                        np.nan if field.elevation is None else field.elevation
+                        for field in fields
+                    ]
+                ),
+            )
+        except Exception as e:
+            logger.warning(f"Weather surface unavailable for water balance: {e}")
+            return weather
+
+        for name in list(DEFAULT_WEATHER) + ["cloud_coverage"]:
+            values = estimate[f"forecast_{name}"][:, max(offset, 0) :][:, :days]
+            span = values.shape[1]
+            target = weather[name][:, :span]
+            weather[name][:, :span] = np.where(np.isnan(values), target, values)
+
+        return weather
@@ -7,6 +7,7 @@ from .models import (
     MarketTrend,
     FarmerTransaction,
     MarketAlert,
+    PriceForecastRun,
 )
 
 
@@ -97,3 +98,18 @@ class MarketAlertAdmin(admin.ModelAdmin):
     )
     list_filter = ("alert_type", "is_active")
     search_fields = ("user__username", "commodity__name")
+
+
+@admin.register(PriceForecastRun)
+class PriceForecastRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "started_at",
+        "mode",
+        "days_ahead",
+        "status",
+        "pairs_total",
+        "pairs_failed",
+        "predictions_written",
+    )
+    list_filter = ("status", "mode")
+    readonly_fields = ("started_at", "finished_at")
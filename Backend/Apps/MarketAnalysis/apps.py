@@ -5,3 +5,6 @@ class MarketAnalysisConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "Apps.MarketAnalysis"
     verbose_name = "Market Analysis"
+
+    def ready(self):
+        import Apps.MarketAnalysis.signals
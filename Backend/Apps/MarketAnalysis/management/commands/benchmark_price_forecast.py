@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from Apps.MarketAnalysis.price_predictor import PricePredictor
+
+
+class Command(BaseCommand):
+    help = (
+        "Backtest recursive and direct price forecasting for a commodity at a "
+        "market, reporting prediction latency and accuracy per mode"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--commodity", type=int, required=True)
+        parser.add_argument("--market", type=int, required=True)
+        parser.add_argument(
+            "--days-ahead", type=int, default=7, help="Forecast horizon (days)"
+        )
+        parser.add_argument(
+            "--origins",
+            type=int,
+            default=20,
+            help="Forecast origins over the most recent history",
+        )
+
+    def handle(self, *args, **options):
+        report = PricePredictor().backtest(
+            options["commodity"],
+            options["market"],
+            days_ahead=options["days_ahead"],
+            origins=options["origins"],
+        )
+        if "error" in report:
+            raise CommandError(report["error"])
+
+        window = report["training_window"]
+        self.stdout.write(
+            f"Trained on {window['start']} to {window['end']}, "
+            f"{report['origins']} origins, {report['days_ahead']} days ahead"
+        )
+        for mode, result in report["results"].items():
+            self.stdout.write(
+                f"{mode:>10}: {result['latency_ms_mean']:8.2f} ms mean, "
+                f"{result['latency_ms_p95']:8.2f} ms p95, "
+                f"MAE {result['mae']:.2f}, MAPE {result['mape']:.2f}%, "
+                f"training {result['training_seconds']:.2f}s"
+            )
+            self.stdout.write(f"{'':>10}  MAE by horizon: {result['mae_by_horizon']}")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from Apps.MarketAnalysis.pattern_reference import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Time trend pattern recognition on synthetic daily series, comparing "
+        "the reference loop detectors with the vectorized and batch ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--series", type=int, default=200, help="Number of series to time"
+        )
+        parser.add_argument(
+            "--days", type=int, default=1825, help="Length of each daily series"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["series"] < 1 or options["days"] < 20:
+            raise CommandError("Need at least one series of 20 days")
+
+        report = benchmark(options["series"], options["days"], options["seed"])
+
+        self.stdout.write(
+            f"{report['series']} series of {report['days']} days, "
+            f"{report['mismatches']} differing from the reference"
+        )
+        for name in ("reference", "vectorized", "batch"):
+            self.stdout.write(f"{name:>10}: {report[f'{name}_ms']:8.3f} ms per series")
+        self.stdout.write(
+            f"Speedup: {report['reference_ms'] / report['vectorized_ms']:.1f}x "
+            f"vectorized, {report['reference_ms'] / report['batch_ms']:.1f}x batch"
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from Apps.MarketAnalysis.price_panel import get_panel_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the in-memory market price panel from MarketPrice, replacing "
+        "the shared file when PRICE_PANEL_MMAP is enabled"
+    )
+
+    def handle(self, *args, **options):
+        panel = get_panel_store().rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built price panel: {len(panel.pairs)} pairs, "
+                f"{panel.start} to {panel.end}"
+            )
+        )
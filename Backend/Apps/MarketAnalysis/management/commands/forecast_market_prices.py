@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from Apps.MarketAnalysis.price_batch import BatchPriceForecaster
+from Apps.MarketAnalysis.price_predictor import FORECAST_MODES
+
+
+class Command(BaseCommand):
+    help = "Forecast prices for every active commodity/market pair in one batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days-ahead", type=int, default=7, help="Forecast horizon (days)"
+        )
+        parser.add_argument("--mode", default="direct", choices=FORECAST_MODES)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Worker processes (default: CPU count, 1 runs in-process)",
+        )
+        parser.add_argument(
+            "--retrain",
+            action="store_true",
+            help="Retrain every pair's model instead of reusing stored models",
+        )
+
+    def handle(self, *args, **options):
+        summary = BatchPriceForecaster(
+            days_ahead=options["days_ahead"],
+            mode=options["mode"],
+            workers=options["workers"],
+            retrain=options["retrain"],
+        ).run()
+
+        message = (
+            f"Forecast {summary['succeeded']}/{summary['pairs']} pairs "
+            f"({summary['failed']} failed), {summary['predictions']} predictions "
+            f"written in {summary['seconds']}s (run {summary['run_id']})"
+        )
+        if summary["pairs"] and not summary["succeeded"]:
+            raise CommandError(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from Apps.MarketAnalysis.price_ingest import BATCH_SIZE, MarketPriceIngestor
+
+
+class Command(BaseCommand):
+    help = "Upsert market prices from a CSV feed keyed by market and commodity code"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row")
+        parser.add_argument(
+            "--source",
+            default="csv_import",
+            help="Value stored in MarketPrice.source",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Rows validated and upserted per transaction",
+        )
+
+    def handle(self, *args, **options):
+        ingestor = MarketPriceIngestor(
+            source=options["source"], batch_size=options["batch_size"]
+        )
+        try:
+            with open(options["path"], newline="", encoding="utf-8") as stream:
+                result = ingestor.ingest_stream(stream)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in result["errors"][:20]:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result['received']} rows: {result['created']} created, "
+                f"{result['updated']} updated, {result['error_count']} rejected "
+                f"in {result['elapsed_seconds']}s ({result['rows_per_second']} rows/s)"
+            )
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from Apps.MarketAnalysis.price_indicators import PriceIndicatorTracker
+from Apps.MarketAnalysis.price_panel import get_panel_store
+
+
+class Command(BaseCommand):
+    help = "Recompute rolling price indicators from the full MarketPrice history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--market",
+            type=int,
+            action="append",
+            dest="market_ids",
+            help="Only rebuild these market ids (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        processed = PriceIndicatorTracker().rebuild(options["market_ids"])
+        # The panel carries the stored moving averages
+        get_panel_store().rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt price indicators for {processed} rows")
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from Apps.MarketAnalysis.trend_store import TrendStore
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute stored market trends whose prices changed since they were computed"
+    )
+
+    def handle(self, *args, **options):
+        summary = TrendStore().refresh_stale()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Refreshed {summary['refreshed']}/{summary['checked']} market trends "
+                f"({summary['failed']} failed) in {summary['seconds']}s"
+            )
+        )
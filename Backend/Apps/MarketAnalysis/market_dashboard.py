@@ -0,0 +1,124 @@
+import logging
+from datetime import timedelta
+from typing import Dict
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min, Q
+from django.utils import timezone
+from .models import Commodity, Market, MarketPrice
+from .trend_store import prices_watermark
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_CACHE_KEY = "market_dashboard_snapshot"
+# Bounds staleness after market or commodity changes in processes whose
+# cache this one does not share
+DASHBOARD_TIMEOUT = 600
+RECENT_DAYS = 7
+TOP_COMMODITIES = 10
+RECENT_UPDATES = 50
+
+
+def dashboard_snapshot() -> Dict:
+    """Market-wide dashboard aggregates, from the cache while prices are unchanged.
+
+    The snapshot records the price watermark it was built at, read from
+    PriceWatermark so that writes by any process are seen, and the date; a
+    fresh snapshot costs one cache read and one watermark aggregate.
+    """
+    today = timezone.now().date()
+    # Read before the prices, so a concurrent change leaves the snapshot stale
+    watermark = prices_watermark()
+    snapshot = cache.get(DASHBOARD_CACHE_KEY)
+    if (
+        snapshot is not None
+        and snapshot["watermark"] == watermark
+        and snapshot["date"] == today
+    ):
+        return snapshot
+
+    snapshot = build_snapshot(today)
+    snapshot["watermark"] = watermark
+    cache.set(DASHBOARD_CACHE_KEY, snapshot, DASHBOARD_TIMEOUT)
+    return snapshot
+
+
+def invalidate_dashboard():
+    """Drop the snapshot after a market or commodity change"""
+    cache.delete(DASHBOARD_CACHE_KEY)
+
+
+def build_snapshot(today) -> Dict:
+    """Compute the dashboard aggregates, one conditional pass over the prices"""
+    since = today - timedelta(days=RECENT_DAYS)
+
+    prices = MarketPrice.objects.aggregate(
+        total=Count("id"),
+        latest_date=Max("date"),
+        daily=Count("id", filter=Q(date=today)),
+        weekly=Count("id", filter=Q(date__gte=since)),
+        rising=Count("id", filter=Q(price_trend="up")),
+        falling=Count("id", filter=Q(price_trend="down")),
+        stable=Count("id", filter=Q(price_trend="stable")),
+        avg_modal=Avg("modal_price"),
+        min_modal=Min("modal_price"),
+        max_modal=Max("modal_price"),
+    )
+    markets = Market.objects.aggregate(
+        total=Count("id"), active=Count("id", filter=Q(is_active=True))
+    )
+
+    top_commodities = (
+        MarketPrice.objects.values("commodity__name", "commodity__category")
+        .annotate(
+            price_count=Count("id"),
+            avg_price=Avg("modal_price"),
+            latest_price=Max("modal_price"),
+        )
+        .order_by("-price_count")[:TOP_COMMODITIES]
+    )
+    recent_prices = (
+        MarketPrice.objects.filter(date__gte=since)
+        .select_related("commodity", "market")
+        .order_by("-date")[:RECENT_UPDATES]
+    )
+
+    min_modal = float(prices["min_modal"] or 0)
+    max_modal = float(prices["max_modal"] or 0)
+    logger.info(f"Built market dashboard snapshot over {prices['total']} prices")
+    return {
+        "date": today,
+        "market_summary": {
+            "total_markets": markets["total"],
+            "active_markets": markets["active"],
+            "total_commodities": Commodity.objects.count(),
+            "total_price_records": prices["total"],
+            "latest_price_date": prices["latest_date"],
+        },
+        "top_commodities": list(top_commodities),
+        "recent_price_updates": [
+            {
+                "commodity": price.commodity.name,
+                "market": price.market.name,
+                "modal_price": float(price.modal_price),
+                "trend": price.price_trend,
+                "date": price.date.isoformat(),
+                "location": f"{price.market.district}, {price.market.state}",
+            }
+            for price in recent_prices
+        ],
+        "performance_metrics": {
+            "daily_updates": prices["daily"],
+            "weekly_updates": prices["weekly"],
+            "trend_distribution": {
+                "rising": prices["rising"],
+                "falling": prices["falling"],
+                "stable": prices["stable"],
+            },
+        },
+        "price_volatility": {
+            "average_price": round(float(prices["avg_modal"] or 0), 2),
+            "lowest_price": min_modal,
+            "highest_price": max_modal,
+            "price_range": max_modal - min_modal,
+        },
+    }
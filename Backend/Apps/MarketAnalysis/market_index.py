@@ -0,0 +1,24 @@
+from Utils.spatial_index import HaversineIndex
+from .models import Market
+
+INDEX_VERSION_KEY = "market_index_version"
+
+
+class MarketIndex(HaversineIndex):
+    """In-memory haversine BallTree over active markets"""
+
+    version_key = INDEX_VERSION_KEY
+    label = "market"
+
+    def _rows(self):
+        return Market.objects.filter(is_active=True).values_list(
+            "id", "latitude", "longitude"
+        )
+
+
+_market_index = MarketIndex()
+
+
+def get_market_index() -> MarketIndex:
+    """Return the process-wide market index"""
+    return _market_index
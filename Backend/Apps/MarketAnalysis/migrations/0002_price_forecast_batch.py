@@ -0,0 +1,76 @@
+# Generated by Django 4.2.11 on 2026-10-19 04:04
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_predictions(apps, schema_editor):
+    """Keep the newest prediction per (commodity, market, prediction_date)"""
+    PricePrediction = apps.get_model("MarketAnalysis", "PricePrediction")
+    keep = (
+        PricePrediction.objects.values("commodity_id", "market_id", "prediction_date")
+        .annotate(keep_id=Max("id"))
+        .values_list("keep_id", flat=True)
+    )
+    PricePrediction.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("MarketAnalysis", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PriceForecastRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("mode", models.CharField(default="direct", max_length=20)),
+                ("days_ahead", models.IntegerField(default=7)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="running",
+                        max_length=20,
+                    ),
+                ),
+                ("pairs_total", models.IntegerField(default=0)),
+                ("pairs_succeeded", models.IntegerField(default=0)),
+                ("pairs_failed", models.IntegerField(default=0)),
+                ("predictions_written", models.IntegerField(default=0)),
+                (
+                    "pair_seconds",
+                    models.JSONField(
+                        default=dict,
+                        help_text="Seconds spent per 'commodity:market' pair",
+                    ),
+                ),
+                ("failures", models.JSONField(default=list)),
+                ("error", models.TextField(blank=True)),
+                ("started_at", models.DateTimeField(auto_now_add=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["-started_at"],
+            },
+        ),
+        migrations.RunPython(remove_duplicate_predictions, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="priceprediction",
+            unique_together={("commodity", "market", "prediction_date")},
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.11 on 2026-10-19 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("MarketAnalysis", "0002_price_forecast_batch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="marketprice",
+            name="ema_12",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="marketprice",
+            name="ema_26",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="marketprice",
+            name="ma_14",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="marketprice",
+            name="ma_7",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="marketprice",
+            name="macd_signal",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="marketprice",
+            name="return_mean",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="marketprice",
+            name="return_var",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="marketprice",
+            name="rsi_avg_gain",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="marketprice",
+            name="rsi_avg_loss",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="marketprice",
+            name="std_7",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.11 on 2026-10-19 04:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("MarketAnalysis", "0003_market_price_indicators"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="markettrend",
+            name="analysis",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="markettrend",
+            name="data_watermark",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="PriceWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("changed_at", models.DateTimeField()),
+                (
+                    "commodity",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="watermarks",
+                        to="MarketAnalysis.commodity",
+                    ),
+                ),
+                (
+                    "market",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="watermarks",
+                        to="MarketAnalysis.market",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("commodity", "market")},
+            },
+        ),
+    ]
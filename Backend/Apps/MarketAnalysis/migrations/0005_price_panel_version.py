@@ -0,0 +1,28 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("MarketAnalysis", "0004_market_trend_watermarks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PricePanelVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
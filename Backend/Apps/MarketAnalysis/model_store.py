@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import joblib
+
+    JOBLIB_AVAILABLE = True
+except ImportError:
+    JOBLIB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+STORE_DIRNAME = "price_models"
+DEFAULT_CACHE_MB = 256  # Loaded models kept in memory per process
+
+
+def model_key(
+    commodity_id: int, market_id: Optional[int], mode: str = "recursive"
+) -> str:
+    """Store key of a commodity model, per market or pooled over all markets"""
+    market = "pooled" if market_id is None else f"market_{int(market_id)}"
+    key = f"commodity_{int(commodity_id)}__{market}"
+    # Recursive models keep the original key
+    return key if mode == "recursive" else f"{key}__{mode}"
+
+
+class PriceModelStore:
+    """Price models on disk keyed by (commodity, market or pooled).
+
+    Each model is a joblib bundle (model, scaler, metadata) with a JSON copy
+    of the metadata beside it, both replaced atomically on retraining.
+    Loaded bundles stay in an LRU bounded by their size on disk and are
+    reloaded when another process rewrites the file.
+    """
+
+    def __init__(self, base_dir: Optional[Path] = None, cache_mb: int = None):
+        self.base_dir = Path(base_dir or Path(settings.ML_MODELS_DIR) / STORE_DIRNAME)
+        if cache_mb is None:
+            cache_mb = getattr(settings, "PRICE_MODEL_CACHE_MB", DEFAULT_CACHE_MB)
+        self.cache_bytes = cache_mb * 1024 * 1024
+        self._cache = OrderedDict()  # key -> (mtime, size, bundle)
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def paths(self, key: str):
+        return self.base_dir / f"{key}.joblib", self.base_dir / f"{key}.json"
+
+    def save(
+        self,
+        commodity_id: int,
+        market_id: Optional[int],
+        model,
+        scaler,
+        metadata: Dict,
+        mode: str = "recursive",
+    ) -> Dict:
+        """Atomically write a trained model and its metadata"""
+        key = model_key(commodity_id, market_id, mode)
+        model_path, meta_path = self.paths(key)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+
+        metadata = dict(
+            metadata,
+            key=key,
+            commodity_id=commodity_id,
+            market_id=market_id,
+            trained_at=timezone.now().isoformat(),
+        )
+        bundle = {"model": model, "scaler": scaler, "metadata": metadata}
+
+        self._write_atomic(model_path, lambda f: joblib.dump(bundle, f))
+        metadata["size_bytes"] = os.path.getsize(model_path)
+        self._write_atomic(
+            meta_path, lambda f: f.write(json.dumps(metadata, default=str).encode())
+        )
+
+        with self._lock:
+            self._evict(key)
+        return metadata
+
+    def load(
+        self, commodity_id: int, market_id: Optional[int], mode: str = "recursive"
+    ) -> Optional[Dict]:
+        """Cached bundle for a key, or None when no model was trained"""
+        if not JOBLIB_AVAILABLE:
+            return None
+
+        key = model_key(commodity_id, market_id, mode)
+        model_path, _ = self.paths(key)
+        try:
+            stat = os.stat(model_path)
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] == stat.st_mtime_ns:
+                self._cache.move_to_end(key)
+                return cached[2]
+
+        # Load outside the lock so other keys are not blocked behind disk I/O
+        try:
+            bundle = joblib.load(model_path)
+        except Exception as e:
+            logger.error(f"Failed to load price model {key}: {e}")
+            return None
+
+        with self._lock:
+            self._evict(key)
+            self._cache[key] = (stat.st_mtime_ns, stat.st_size, bundle)
+            self._cached_bytes += stat.st_size
+            # Least recently used first; the model just loaded always stays
+            while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+                oldest = next(iter(self._cache))
+                self._evict(oldest)
+        return bundle
+
+    def metadata(self) -> List[Dict]:
+        """Metadata of every stored model, without loading the models"""
+        entries = []
+        for meta_path in sorted(self.base_dir.glob("*.json")):
+            try:
+                with open(meta_path) as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Unreadable model metadata {meta_path.name}: {e}")
+        return entries
+
+    def cache_info(self) -> Dict:
+        with self._lock:
+            return {
+                "models": len(self._cache),
+                "bytes": self._cached_bytes,
+                "limit_bytes": self.cache_bytes,
+            }
+
+    def _evict(self, key: str):
+        cached = self._cache.pop(key, None)
+        if cached:
+            self._cached_bytes -= cached[1]
+
+    def _write_atomic(self, path: Path, write):
+        fd, tmp = tempfile.mkstemp(dir=self.base_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_model_store() -> PriceModelStore:
+    """Process-wide model store, so its LRU is shared by all predictors"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PriceModelStore()
+        return _store
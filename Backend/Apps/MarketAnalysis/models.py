@@ -120,6 +120,20 @@ class MarketPrice(models.Model):
         default="stable",
     )
     source = models.CharField(max_length=50, default="manual")
+
+    # Rolling indicators of the (market, commodity) series up to this date,
+    # maintained at ingest by PriceIndicatorTracker
+    ma_7 = models.FloatField(null=True, blank=True)
+    ma_14 = models.FloatField(null=True, blank=True)
+    std_7 = models.FloatField(null=True, blank=True)
+    ema_12 = models.FloatField(null=True, blank=True)
+    ema_26 = models.FloatField(null=True, blank=True)
+    macd_signal = models.FloatField(null=True, blank=True)
+    rsi_avg_gain = models.FloatField(null=True, blank=True)
+    rsi_avg_loss = models.FloatField(null=True, blank=True)
+    return_mean = models.FloatField(null=True, blank=True)
+    return_var = models.FloatField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -162,6 +176,7 @@ class PricePrediction(models.Model):
         indexes = [
             models.Index(fields=["commodity", "market", "-prediction_date"]),
         ]
+        unique_together = ["commodity", "market", "prediction_date"]
 
     def __str__(self):
         return f"Prediction: {self.commodity.name} - {self.prediction_date}"
@@ -193,6 +208,11 @@ class MarketTrend(models.Model):
     volatility_index = models.FloatField(help_text="Price volatility index (0-100)")
     key_factors = models.JSONField(default=list)
     analysis_notes = models.TextField(blank=True)
+
+    # Full analysis, served again while prices are unchanged since data_watermark
+    analysis = models.JSONField(default=dict, blank=True)
+    data_watermark = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -205,6 +225,33 @@ class MarketTrend(models.Model):
         return f"{self.commodity.name} - {self.trend_type} ({self.period_start} to {self.period_end})"
 
 
+class PriceWatermark(models.Model):
+    """Last change to the prices of a commodity at a market"""
+
+    commodity = models.ForeignKey(
+        Commodity, on_delete=models.CASCADE, related_name="watermarks"
+    )
+    market = models.ForeignKey(
+        Market, on_delete=models.CASCADE, related_name="watermarks"
+    )
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ["commodity", "market"]
+
+    def __str__(self):
+        return f"{self.commodity_id}:{self.market_id} changed {self.changed_at}"
+
+
+class PricePanelVersion(models.Model):
+    """Price panel version, for processes that do not share a cache"""
+
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Price panel version {self.version}"
+
+
 class FarmerTransaction(models.Model):
     """Track farmer transactions"""
 
@@ -280,3 +327,34 @@ class MarketAlert(models.Model):
         return (
             f"{self.user.username} - {self.alert_type} alert for {self.commodity.name}"
         )
+
+
+class PriceForecastRun(models.Model):
+    """Nightly batch forecast over all active commodity/market pairs"""
+
+    STATUS_CHOICES = [
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+
+    mode = models.CharField(max_length=20, default="direct")
+    days_ahead = models.IntegerField(default=7)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="running")
+    pairs_total = models.IntegerField(default=0)
+    pairs_succeeded = models.IntegerField(default=0)
+    pairs_failed = models.IntegerField(default=0)
+    predictions_written = models.IntegerField(default=0)
+    pair_seconds = models.JSONField(
+        default=dict, help_text="Seconds spent per 'commodity:market' pair"
+    )
+    failures = models.JSONField(default=list)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"Price forecast run {self.started_at:%Y-%m-%d %H:%M} ({self.status})"
@@ -0,0 +1,243 @@
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from scipy.signal import argrelextrema
+from .trend_analyzer import (
+    TrendAnalyzer,
+    _double_patterns,
+    _head_and_shoulders,
+    _triangle_patterns,
+)
+
+# Shapes of the reference dataset, each stressing a different detector
+SERIES_KINDS = ["random_walk", "cycle", "rounded_walk", "converging", "flat"]
+
+
+def reference_support_resistance(prices: np.ndarray) -> Dict:
+    """Support and resistance levels as found before vectorization"""
+    if len(prices) < 10:
+        return {"support": None, "resistance": None}
+
+    support_levels = prices[argrelextrema(prices, np.less, order=5)[0]]
+    resistance_levels = prices[argrelextrema(prices, np.greater, order=5)[0]]
+    current_price = prices[-1]
+
+    return {
+        "current_price": float(current_price),
+        "immediate_support": (
+            float(support_levels[-1])
+            if len(support_levels) > 0 and support_levels[-1] < current_price
+            else None
+        ),
+        "immediate_resistance": (
+            float(resistance_levels[-1])
+            if len(resistance_levels) > 0 and resistance_levels[-1] > current_price
+            else None
+        ),
+        "support_levels": [float(s) for s in support_levels[-3:]],
+        "resistance_levels": [float(r) for r in resistance_levels[-3:]],
+    }
+
+
+def reference_patterns(prices: np.ndarray) -> Dict:
+    """Price patterns as recognized before vectorization"""
+    if len(prices) < 20:
+        return {"patterns": []}
+
+    patterns = []
+    if reference_head_and_shoulders(prices):
+        patterns.append(
+            {"name": "head_and_shoulders", "type": "reversal", "signal": "bearish"}
+        )
+
+    double_pattern = reference_double_pattern(prices)
+    if double_pattern:
+        patterns.append(double_pattern)
+
+    triangle = reference_triangle_pattern(prices)
+    if triangle:
+        patterns.append(triangle)
+
+    return {"patterns": patterns}
+
+
+def reference_head_and_shoulders(prices: np.ndarray) -> bool:
+    """Three peaks with the middle one highest, one index at a time"""
+    if len(prices) < 20:
+        return False
+
+    window = 5
+    peaks = []
+    for i in range(window, len(prices) - window):
+        if all(prices[i] > prices[i - j] for j in range(1, window + 1)) and all(
+            prices[i] > prices[i + j] for j in range(1, window + 1)
+        ):
+            peaks.append(i)
+
+    if len(peaks) >= 3:
+        peak_values = [prices[p] for p in peaks[-3:]]
+        if peak_values[1] > peak_values[0] and peak_values[1] > peak_values[2]:
+            return True
+
+    return False
+
+
+def reference_double_pattern(prices: np.ndarray) -> Optional[Dict]:
+    """Double top or bottom among the last 15 prices"""
+    if len(prices) < 15:
+        return None
+
+    recent = prices[-15:]
+    max_price = np.max(recent)
+    min_price = np.min(recent)
+    tolerance = (max_price - min_price) * 0.02
+
+    tops = np.sum(np.abs(recent - max_price) < tolerance)
+    bottoms = np.sum(np.abs(recent - min_price) < tolerance)
+
+    if tops >= 2:
+        return {"name": "double_top", "type": "reversal", "signal": "bearish"}
+    elif bottoms >= 2:
+        return {"name": "double_bottom", "type": "reversal", "signal": "bullish"}
+
+    return None
+
+
+def reference_triangle_pattern(prices: np.ndarray) -> Optional[Dict]:
+    """Triangle from np.polyfit slopes of pandas rolling highs and lows"""
+    if len(prices) < 20:
+        return None
+
+    window = 5
+    highs = pd.Series(prices).rolling(window).max().dropna().values
+    lows = pd.Series(prices).rolling(window).min().dropna().values
+
+    if len(highs) < 10:
+        return None
+
+    high_slope = np.polyfit(range(len(highs)), highs, 1)[0]
+    low_slope = np.polyfit(range(len(lows)), lows, 1)[0]
+
+    if abs(high_slope) < 0.1 and low_slope > 0.1:
+        return {
+            "name": "ascending_triangle",
+            "type": "continuation",
+            "signal": "bullish",
+        }
+    elif high_slope < -0.1 and abs(low_slope) < 0.1:
+        return {
+            "name": "descending_triangle",
+            "type": "continuation",
+            "signal": "bearish",
+        }
+    elif high_slope < -0.1 and low_slope > 0.1:
+        return {
+            "name": "symmetrical_triangle",
+            "type": "continuation",
+            "signal": "neutral",
+        }
+
+    return None
+
+
+def reference_series(
+    rng: np.random.Generator, length: int, kind: str = "random_walk"
+) -> np.ndarray:
+    """One synthetic daily price series of the given kind.
+
+    Prices pass through float32, as they are held in the price panel.
+    """
+    t = np.arange(length)
+    if kind == "random_walk":
+        prices = 1000 + np.cumsum(rng.normal(0, 10, length))
+    elif kind == "cycle":
+        prices = 1000 + 100 * np.sin(t / rng.uniform(3, 15)) + rng.normal(0, 5, length)
+    elif kind == "rounded_walk":
+        # Whole prices, so neighbouring ties are common
+        prices = np.round(1000 + np.cumsum(rng.normal(0, 10, length)))
+    elif kind == "converging":
+        noise = rng.normal(0, 2, length) * (1 - t / length) * 20
+        prices = 1000 + t * rng.uniform(-1, 1) + noise
+    elif kind == "flat":
+        prices = 1000.0 + rng.integers(0, 3, length)
+    else:
+        raise ValueError(f"Unknown series kind: {kind}")
+
+    return prices.astype(np.float32).astype(np.float64)
+
+
+def reference_dataset(
+    count: int, seed: int = 0, min_length: int = 20, max_length: int = 400
+) -> List[np.ndarray]:
+    """Series of random lengths cycling through every SERIES_KINDS shape"""
+    rng = np.random.default_rng(seed)
+    return [
+        reference_series(
+            rng,
+            int(rng.integers(min_length, max_length)),
+            SERIES_KINDS[i % len(SERIES_KINDS)],
+        )
+        for i in range(count)
+    ]
+
+
+def mismatches(series: List[np.ndarray]) -> List[int]:
+    """Positions of series where the analyzer disagrees with the reference"""
+    analyzer = TrendAnalyzer()
+    found = []
+    for i, prices in enumerate(series):
+        df = pd.DataFrame({"modal_price": prices})
+        patterns = analyzer._recognize_patterns(df)
+        levels = analyzer._identify_support_resistance(df)
+        if patterns != reference_patterns(prices):
+            found.append(i)
+        elif levels != reference_support_resistance(prices):
+            found.append(i)
+    return found
+
+
+def benchmark(series_count: int = 200, days: int = 1825, seed: int = 0) -> Dict:
+    """Time the reference and vectorized detectors over random-walk series.
+
+    Reports per-series milliseconds for the reference loops, the vectorized
+    single-series detectors and one batch pass over a matrix of all series.
+    """
+    rng = np.random.default_rng(seed)
+    series = [reference_series(rng, days) for _ in range(series_count)]
+    analyzer = TrendAnalyzer()
+
+    def per_series_ms(detect) -> float:
+        started = time.perf_counter()
+        for prices in series:
+            detect(prices)
+        return (time.perf_counter() - started) / series_count * 1000
+
+    def vectorized(prices):
+        analyzer._detect_head_and_shoulders(prices)
+        analyzer._detect_double_pattern(prices)
+        analyzer._detect_triangle_pattern(prices)
+
+    def reference(prices):
+        reference_head_and_shoulders(prices)
+        reference_double_pattern(prices)
+        reference_triangle_pattern(prices)
+
+    reference_ms = per_series_ms(reference)
+    vectorized_ms = per_series_ms(vectorized)
+
+    matrix = np.vstack(series)
+    started = time.perf_counter()
+    _head_and_shoulders(matrix)
+    _double_patterns(matrix)
+    _triangle_patterns(matrix)
+    batch_ms = (time.perf_counter() - started) / series_count * 1000
+
+    return {
+        "series": series_count,
+        "days": days,
+        "mismatches": len(mismatches(series)),
+        "reference_ms": reference_ms,
+        "vectorized_ms": vectorized_ms,
+        "batch_ms": batch_ms,
+    }
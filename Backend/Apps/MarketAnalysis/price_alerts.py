@@ -0,0 +1,302 @@
+import logging
+import numpy as np
+from datetime import timedelta
+from typing import Dict, Iterable, List, Tuple
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from Apps.UserManagement.models import Notification
+from Utils.spatial_index import VersionedIndex
+from .models import MarketAlert, MarketPrice
+from .price_panel import FIELD_INDEX, PricePanel, get_price_panel
+
+logger = logging.getLogger(__name__)
+
+ALERT_TYPES = ["price_above", "price_below", "price_change"]
+ANY_MARKET = -1  # market_id of alerts that watch every market of a commodity
+
+# How far back price_change alerts look for the previous price
+PREVIOUS_PRICE_LOOKBACK_DAYS = 30
+
+ALERT_INDEX_VERSION_KEY = "market_alert_index_version"
+
+ALERT_FIELDS = [
+    "id",
+    "user_id",
+    "commodity_id",
+    "market_id",
+    "alert_type",
+    "threshold_value",
+    "commodity__name",
+]
+
+
+class AlertSet:
+    """Alerts as column arrays sorted by commodity, matched to prices vectorized"""
+
+    def __init__(self, rows: List[Tuple]):
+        rows = sorted(rows, key=lambda row: (row[2], row[0]))
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.user_ids = np.array([row[1] for row in rows], dtype=np.int64)
+        self.commodity_ids = np.array([row[2] for row in rows], dtype=np.int64)
+        self.market_ids = np.array(
+            [ANY_MARKET if row[3] is None else row[3] for row in rows], dtype=np.int64
+        )
+        self.types = np.array(
+            [ALERT_TYPES.index(row[4]) for row in rows], dtype=np.int64
+        )
+        self.thresholds = np.array([float(row[5]) for row in rows], dtype=np.float64)
+        self.commodity_names = {row[2]: row[6] for row in rows}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def match(
+        self, commodity_ids: np.ndarray, market_ids: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(price, alert) position pairs where an alert watches a price's series"""
+        low = np.searchsorted(self.commodity_ids, commodity_ids, side="left")
+        counts = np.searchsorted(self.commodity_ids, commodity_ids, side="right") - low
+        prices = np.repeat(np.arange(len(commodity_ids)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        alerts = np.repeat(low, counts) + offsets
+
+        watched = (self.market_ids[alerts] == ANY_MARKET) | (
+            self.market_ids[alerts] == market_ids[prices]
+        )
+        return prices[watched], alerts[watched]
+
+    def evaluate(
+        self,
+        commodity_ids: np.ndarray,
+        market_ids: np.ndarray,
+        current: np.ndarray,
+        previous: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of triggered alerts and the price that triggered each, once per alert"""
+        prices, alerts = self.match(commodity_ids, market_ids)
+        price, threshold = current[prices], self.thresholds[alerts]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.abs(price - previous[prices]) / previous[prices] * 100
+
+        types = self.types[alerts]
+        hit = (
+            ((types == 0) & (price > threshold))
+            | ((types == 1) & (price < threshold))
+            | ((types == 2) & (change > threshold))
+        )
+        alerts, first = np.unique(alerts[hit], return_index=True)
+        return alerts, prices[hit][first]
+
+
+class AlertIndex(VersionedIndex):
+    """In-memory index of active alerts, rebuilt when any alert changes"""
+
+    version_key = ALERT_INDEX_VERSION_KEY
+
+    def __init__(self):
+        super().__init__()
+        self._alerts = AlertSet([])
+
+    def alerts(self) -> AlertSet:
+        return self._ensure_built()
+
+    def _build(self):
+        self._alerts = AlertSet(
+            list(MarketAlert.objects.filter(is_active=True).values_list(*ALERT_FIELDS))
+        )
+        logger.info(f"Built market alert index over {len(self._alerts)} alerts")
+
+    def _current(self):
+        return self._alerts
+
+
+class PriceAlertEngine:
+    """Evaluate price alerts when prices land instead of when users poll.
+
+    Alerts watching the ingested series are found through the alert index
+    and their thresholds evaluated for the whole batch at once. Only the
+    newest price of a series can trigger, so backfills stay silent.
+    Previous prices for price_change alerts come from the price panel.
+    """
+
+    def on_prices(self, prices: Iterable[MarketPrice]) -> int:
+        """Trigger alerts for newly saved prices; returns alerts triggered"""
+        try:
+            alerts = get_alert_index().alerts()
+            if not len(alerts):
+                return 0
+
+            newest = {}
+            for price in prices:
+                series = (price.market_id, price.commodity_id)
+                if series not in newest or price.date > newest[series].date:
+                    newest[series] = price
+            prices = list(newest.values())
+
+            panel = get_price_panel()
+            rows = np.array(
+                [
+                    panel.pair_index.get((p.market_id, p.commodity_id), -1)
+                    for p in prices
+                ],
+                dtype=np.int64,
+            )
+            offsets = np.array(
+                [(p.date - panel.start).days for p in prices], dtype=np.int64
+            )
+            inside = (rows >= 0) & (offsets >= 0) & (offsets < panel.days)
+            if not inside.any():
+                return 0
+
+            latest = inside.copy()
+            latest[inside] = ~_priced_after(panel, rows[inside], offsets[inside])
+            prices = [price for price, keep in zip(prices, latest) if keep]
+            rows, offsets = rows[latest], offsets[latest]
+
+            matched, events = alerts.evaluate(
+                np.array([p.commodity_id for p in prices], dtype=np.int64),
+                np.array([p.market_id for p in prices], dtype=np.int64),
+                np.array([float(p.modal_price) for p in prices]),
+                _previous_prices(panel, rows, offsets),
+            )
+            return self._trigger(alerts, matched, [prices[event] for event in events])
+
+        except Exception as e:
+            logger.error(f"Error evaluating price alerts: {e}")
+            return 0
+
+    def check(self, alerts: AlertSet) -> List[Dict]:
+        """Alerts the latest stored prices currently satisfy, without triggering them"""
+        panel = get_price_panel()
+        rows = np.array(
+            [
+                row
+                for commodity_id in np.unique(alerts.commodity_ids)
+                for row in panel.commodity_rows.get(int(commodity_id), [])
+            ],
+            dtype=np.int64,
+        )
+        if not len(rows):
+            return []
+
+        modal = panel.values[rows, :, FIELD_INDEX["modal_price"]]
+        priced = ~np.isnan(modal)
+        has_price = priced.any(axis=1)
+        rows, modal, priced = rows[has_price], modal[has_price], priced[has_price]
+        offsets = panel.days - 1 - priced[:, ::-1].argmax(axis=1)
+
+        pairs = [panel.pairs[row] for row in rows]
+        matched, events = alerts.evaluate(
+            np.array([commodity_id for _, commodity_id in pairs], dtype=np.int64),
+            np.array([market_id for market_id, _ in pairs], dtype=np.int64),
+            modal[np.arange(len(rows)), offsets].astype(np.float64),
+            _previous_prices(panel, rows, offsets),
+        )
+
+        return [
+            {
+                "alert_id": int(alerts.ids[alert]),
+                "commodity": alerts.commodity_names[int(alerts.commodity_ids[alert])],
+                "alert_type": ALERT_TYPES[alerts.types[alert]],
+                "threshold": float(alerts.thresholds[alert]),
+                "market_id": pairs[event][0],
+                "date": panel.start + timedelta(days=int(offsets[event])),
+                "current_price": round(float(modal[event, offsets[event]]), 2),
+                "message": "Alert triggered for "
+                f"{alerts.commodity_names[int(alerts.commodity_ids[alert])]}",
+            }
+            for alert, event in zip(matched, events)
+        ]
+
+    def _trigger(
+        self, alerts: AlertSet, matched: np.ndarray, prices: List[MarketPrice]
+    ) -> int:
+        """Bump trigger counts in one update and queue a notification per alert"""
+        if not len(matched):
+            return 0
+
+        now = timezone.now()
+        notifications = [
+            Notification(
+                user_id=int(alerts.user_ids[alert]),
+                notification_type="alert",
+                title=f"Price alert: {alerts.commodity_names[price.commodity_id]}",
+                message=self._message(alerts, alert, price),
+                data={
+                    "alert_id": int(alerts.ids[alert]),
+                    "alert_type": ALERT_TYPES[alerts.types[alert]],
+                    "commodity_id": price.commodity_id,
+                    "market_id": price.market_id,
+                    "date": price.date.isoformat(),
+                    "price": float(price.modal_price),
+                },
+            )
+            for alert, price in zip(matched, prices)
+        ]
+
+        with transaction.atomic():
+            MarketAlert.objects.filter(id__in=alerts.ids[matched].tolist()).update(
+                trigger_count=F("trigger_count") + 1, last_triggered=now
+            )
+            # Unsent notifications are picked up by the delivery channels
+            Notification.objects.bulk_create(notifications, batch_size=1000)
+
+        logger.info(f"Triggered {len(matched)} market price alerts")
+        return len(matched)
+
+    @staticmethod
+    def _message(alerts: AlertSet, alert: int, price: MarketPrice) -> str:
+        name = alerts.commodity_names[price.commodity_id]
+        threshold = alerts.thresholds[alert]
+        alert_type = ALERT_TYPES[alerts.types[alert]]
+        if alert_type == "price_above":
+            return f"{name} traded at {float(price.modal_price):.2f}, above {threshold:.2f}"
+        if alert_type == "price_below":
+            return f"{name} traded at {float(price.modal_price):.2f}, below {threshold:.2f}"
+        return (
+            f"{name} moved more than {threshold:.2f}% to {float(price.modal_price):.2f}"
+        )
+
+
+def _priced_after(
+    panel: PricePanel, rows: np.ndarray, offsets: np.ndarray
+) -> np.ndarray:
+    """Whether each series has a price later than its offset"""
+    span = panel.days - 1 - int(offsets.min())
+    if span <= 0:
+        return np.zeros(len(rows), dtype=bool)
+    days = offsets[:, None] + np.arange(1, span + 1)
+    valid = days < panel.days
+    modal = panel.values[
+        rows[:, None], np.minimum(days, panel.days - 1), FIELD_INDEX["modal_price"]
+    ]
+    return (valid & ~np.isnan(modal)).any(axis=1)
+
+
+def _previous_prices(
+    panel: PricePanel, rows: np.ndarray, offsets: np.ndarray
+) -> np.ndarray:
+    """Last modal price before each offset within the lookback, else NaN"""
+    days = offsets[:, None] - np.arange(1, PREVIOUS_PRICE_LOOKBACK_DAYS + 1)
+    modal = panel.values[
+        rows[:, None], np.maximum(days, 0), FIELD_INDEX["modal_price"]
+    ].astype(np.float64)
+    modal[days < 0] = np.nan
+
+    priced = ~np.isnan(modal)
+    nearest = priced.argmax(axis=1)
+    previous = modal[np.arange(len(rows)), nearest]
+    previous[~priced.any(axis=1)] = np.nan
+    # The panel stores float32; prices carry two decimals
+    return np.round(previous, 2)
+
+
+_alert_index = AlertIndex()
+
+
+def get_alert_index() -> AlertIndex:
+    """Return the process-wide alert index"""
+    return _alert_index
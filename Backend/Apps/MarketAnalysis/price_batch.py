@@ -0,0 +1,233 @@
+import logging
+import os
+import time
+import django
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+from django.db import connections
+from django.utils import timezone
+from .models import Market, PriceForecastRun
+from .price_panel import FIELDS, get_price_panel
+from .price_predictor import (
+    PricePredictor,
+    FORECAST_MODES,
+    DIRECT_HORIZON,
+    RECENT_WINDOW,
+    prediction_rows,
+    upsert_predictions,
+)
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_WINDOW_DAYS = 30  # A pair is active when it has a price this recent
+TRAINING_HISTORY_DAYS = 365  # History loaded for pairs that need a model
+PAIRS_PER_TASK = 16
+
+
+def _forecast_pairs(task: Dict) -> List[Dict]:
+    """Forecast a batch of pairs from their price history.
+
+    Runs in a worker process without touching the database: histories are
+    part of the task and models come from the shared model store.
+    """
+    mode, days_ahead = task["mode"], task["days_ahead"]
+    outcomes = []
+
+    for commodity_id, market_id, dates, values in task["pairs"]:
+        started = time.perf_counter()
+        outcome = {"commodity_id": commodity_id, "market_id": market_id}
+        try:
+            df = pd.DataFrame(values, index=pd.DatetimeIndex(dates), columns=FIELDS)
+            predictor = PricePredictor()
+
+            loaded = not task["retrain"] and predictor._load_model(
+                commodity_id, market_id, mode
+            )
+            if mode == "direct" and loaded:
+                loaded = predictor.metadata.get("horizon", 0) >= days_ahead
+            if not loaded:
+                if len(df) < 30:
+                    raise ValueError(
+                        "Insufficient data for training (minimum 30 days required)"
+                    )
+                fit = predictor._fit(df, mode, max(days_ahead, DIRECT_HORIZON))
+                if "error" in fit:
+                    raise ValueError(fit["error"])
+                predictor.model, predictor.scaler = fit["model"], fit["scaler"]
+                predictor.metadata = predictor.store.save(
+                    commodity_id,
+                    market_id,
+                    fit["model"],
+                    fit["scaler"],
+                    fit["metadata"],
+                    mode=mode,
+                )
+
+            # Same inputs as predict_price: the latest rows, missing arrivals as 0
+            recent = df.iloc[-RECENT_WINDOW:].copy()
+            recent["arrivals"] = recent["arrivals"].fillna(0)
+            if mode == "direct":
+                predictions = predictor._forecast_direct(recent, days_ahead)
+            else:
+                predictions = predictor._forecast_recursive(recent, days_ahead)
+
+            outcome["result"] = {
+                "commodity_id": commodity_id,
+                "market_id": market_id,
+                "mode": mode,
+                "base_date": recent.index[-1].strftime("%Y-%m-%d"),
+                "predictions": predictions,
+                "model_confidence": predictor._calculate_model_confidence(),
+            }
+            outcome["trained"] = not loaded
+        except Exception as e:
+            outcome["error"] = str(e)
+        outcome["seconds"] = round(time.perf_counter() - started, 4)
+        outcomes.append(outcome)
+
+    return outcomes
+
+
+class BatchPriceForecaster:
+    """Forecast every active commodity/market pair in one job.
+
+    Price history for all pairs is sliced from the price panel, without a
+    price query. Batches of pairs are then forecast in a process pool, and
+    each batch's predictions are bulk-upserted as it finishes. Timings and failures per pair are recorded
+    on a PriceForecastRun.
+    """
+
+    def __init__(
+        self,
+        days_ahead: int = 7,
+        mode: str = "direct",
+        workers: Optional[int] = None,
+        retrain: bool = False,
+    ):
+        if mode not in FORECAST_MODES:
+            raise ValueError(f"mode must be one of {FORECAST_MODES}")
+        self.days_ahead = days_ahead
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.retrain = retrain
+
+    def run(self) -> Dict:
+        started = time.perf_counter()
+        run = PriceForecastRun.objects.create(
+            mode=self.mode, days_ahead=self.days_ahead
+        )
+
+        try:
+            histories = self._load_histories()
+            run.pairs_total = len(histories)
+            run.save(update_fields=["pairs_total"])
+
+            tasks = [
+                {
+                    "mode": self.mode,
+                    "days_ahead": self.days_ahead,
+                    "retrain": self.retrain,
+                    "pairs": histories[i : i + PAIRS_PER_TASK],
+                }
+                for i in range(0, len(histories), PAIRS_PER_TASK)
+            ]
+            self._execute(run, tasks)
+
+            run.status = "completed"
+        except Exception as e:
+            logger.error(f"Batch price forecast failed: {e}")
+            run.status = "failed"
+            run.error = str(e)
+            raise
+        finally:
+            run.finished_at = timezone.now()
+            run.save()
+
+        return {
+            "run_id": run.id,
+            "status": run.status,
+            "mode": self.mode,
+            "pairs": run.pairs_total,
+            "succeeded": run.pairs_succeeded,
+            "failed": run.pairs_failed,
+            "predictions": run.predictions_written,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+
+    def _load_histories(self) -> List[Tuple]:
+        """(commodity, market, dates, values) per active pair from the price panel"""
+        today = timezone.localdate()
+        active_since = today - timedelta(days=ACTIVE_WINDOW_DAYS)
+        active_markets = set(
+            Market.objects.filter(is_active=True).values_list("id", flat=True)
+        )
+        panel = get_price_panel()
+
+        histories = []
+        for market_id, commodity_id in sorted(panel.pairs, key=lambda p: p[::-1]):
+            if market_id not in active_markets:
+                continue
+            df = panel.series(
+                commodity_id,
+                market_id,
+                start=today - timedelta(days=TRAINING_HISTORY_DAYS),
+            )
+            if df.empty or df.index[-1].date() < active_since:
+                continue
+            histories.append(
+                (
+                    commodity_id,
+                    market_id,
+                    list(df.index.date),
+                    df[FIELDS].to_numpy(),
+                )
+            )
+        return histories
+
+    def _execute(self, run: PriceForecastRun, tasks: List[Dict]):
+        if self.workers <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                self._record(run, _forecast_pairs(task))
+            return
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=min(self.workers, len(tasks)), initializer=django.setup
+        ) as pool:
+            futures = [pool.submit(_forecast_pairs, task) for task in tasks]
+            for future in as_completed(futures):
+                self._record(run, future.result())
+
+    def _record(self, run: PriceForecastRun, outcomes: List[Dict]):
+        """Upsert a finished batch and add its timings and failures to the run"""
+        rows = []
+        for outcome in outcomes:
+            pair = f"{outcome['commodity_id']}:{outcome['market_id']}"
+            run.pair_seconds[pair] = outcome["seconds"]
+            if "error" in outcome:
+                run.pairs_failed += 1
+                run.failures.append(
+                    {
+                        "commodity_id": outcome["commodity_id"],
+                        "market_id": outcome["market_id"],
+                        "error": outcome["error"],
+                    }
+                )
+                continue
+            run.pairs_succeeded += 1
+            rows.extend(prediction_rows(outcome["result"]))
+
+        upsert_predictions(rows)
+        run.predictions_written += len(rows)
+        run.save(
+            update_fields=[
+                "pair_seconds",
+                "failures",
+                "pairs_succeeded",
+                "pairs_failed",
+                "predictions_written",
+            ]
+        )
@@ -0,0 +1,314 @@
+import logging
+import math
+from collections import defaultdict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from .models import MarketPrice
+
+logger = logging.getLogger(__name__)
+
+MA_SHORT = 7
+MA_LONG = 14
+EMA_FAST = 12
+EMA_SLOW = 26
+EMA_SIGNAL = 9
+RSI_PERIOD = 14
+VOLATILITY_SPAN = 30  # Span of the exponentially weighted return variance
+REBUILD_CHUNK_SIZE = 10000
+
+INDICATOR_FIELDS = [
+    "ma_7",
+    "ma_14",
+    "std_7",
+    "ema_12",
+    "ema_26",
+    "macd_signal",
+    "rsi_avg_gain",
+    "rsi_avg_loss",
+    "return_mean",
+    "return_var",
+]
+
+
+def _alpha(span: int) -> float:
+    return 2.0 / (span + 1)
+
+
+def fold(previous: Optional[Dict], window: deque, price: float) -> Dict:
+    """Indicators of a price from the previous row's indicators.
+
+    window holds the prices of the preceding rows, oldest first, and at
+    most MA_LONG of them; it is only read for the price leaving each
+    moving window, so every update is O(1).
+    """
+    if previous is None or not window:
+        return {
+            "ma_7": price,
+            "ma_14": price,
+            "std_7": None,
+            "ema_12": price,
+            "ema_26": price,
+            "macd_signal": 0.0,
+            "rsi_avg_gain": None,
+            "rsi_avg_loss": None,
+            "return_mean": None,
+            "return_var": None,
+        }
+
+    indicators = {
+        "ma_7": _slide_mean(previous["ma_7"], window, price, MA_SHORT),
+        "ma_14": _slide_mean(previous["ma_14"], window, price, MA_LONG),
+        "std_7": _slide_std(previous, window, price),
+    }
+
+    # EMAs seeded with the first price, as pandas ewm(adjust=False)
+    indicators["ema_12"] = previous["ema_12"] + _alpha(EMA_FAST) * (
+        price - previous["ema_12"]
+    )
+    indicators["ema_26"] = previous["ema_26"] + _alpha(EMA_SLOW) * (
+        price - previous["ema_26"]
+    )
+    macd = indicators["ema_12"] - indicators["ema_26"]
+    indicators["macd_signal"] = previous["macd_signal"] + _alpha(EMA_SIGNAL) * (
+        macd - previous["macd_signal"]
+    )
+
+    # Wilder-smoothed average gain and loss
+    delta = price - window[-1]
+    gain, loss = max(delta, 0.0), max(-delta, 0.0)
+    if previous["rsi_avg_gain"] is None:
+        indicators["rsi_avg_gain"], indicators["rsi_avg_loss"] = gain, loss
+    else:
+        indicators["rsi_avg_gain"] = (
+            previous["rsi_avg_gain"] + (gain - previous["rsi_avg_gain"]) / RSI_PERIOD
+        )
+        indicators["rsi_avg_loss"] = (
+            previous["rsi_avg_loss"] + (loss - previous["rsi_avg_loss"]) / RSI_PERIOD
+        )
+
+    # Exponentially weighted mean and variance of daily returns
+    if window[-1] > 0:
+        change = price / window[-1] - 1
+        if previous["return_mean"] is None:
+            indicators["return_mean"], indicators["return_var"] = change, 0.0
+        else:
+            diff = change - previous["return_mean"]
+            increment = _alpha(VOLATILITY_SPAN) * diff
+            indicators["return_mean"] = previous["return_mean"] + increment
+            indicators["return_var"] = (1 - _alpha(VOLATILITY_SPAN)) * (
+                previous["return_var"] + diff * increment
+            )
+    else:
+        indicators["return_mean"] = previous["return_mean"]
+        indicators["return_var"] = previous["return_var"]
+
+    return indicators
+
+
+def _slide_mean(previous_mean: float, window: deque, price: float, size: int) -> float:
+    """Rolling mean over the last size rows, as rolling(size, min_periods=1)"""
+    count = len(window)
+    if count < size:
+        return (previous_mean * count + price) / (count + 1)
+    return previous_mean + (price - window[-size]) / size
+
+
+def _slide_std(previous: Dict, window: deque, price: float) -> float:
+    """Rolling sample deviation over MA_SHORT rows from the previous ma_7 and std_7"""
+    size = MA_SHORT
+    count = min(len(window), size)
+    total = previous["ma_7"] * count
+    squares = (previous["std_7"] or 0.0) ** 2 * (count - 1) + total**2 / count
+    if len(window) >= size:
+        leaving = window[-size]
+        total -= leaving
+        squares -= leaving * leaving
+        count -= 1
+    total += price
+    squares += price * price
+    count += 1
+
+    variance = (squares - total * total / count) / (count - 1)
+    return math.sqrt(max(variance, 0.0))
+
+
+def stored_rsi(price: MarketPrice) -> Optional[float]:
+    """RSI from the average gain and loss stored on a row"""
+    if price.rsi_avg_gain is None:
+        return None
+    if price.rsi_avg_loss == 0:
+        return 100.0
+    return 100 - 100 / (1 + price.rsi_avg_gain / price.rsi_avg_loss)
+
+
+class PriceIndicatorTracker:
+    """Maintain rolling indicators on MarketPrice rows as prices arrive.
+
+    Each row's indicators follow from the previous row of its series and
+    the few prices before it. A row ingested ahead of later rows (a late
+    correction or backfill) is folded in, then the later rows of its series
+    are recomputed from it.
+    """
+
+    def apply(self, prices: Iterable[MarketPrice]) -> List[MarketPrice]:
+        """Compute indicators for new or changed rows; returns every row updated"""
+        since = {}
+        for price in prices:
+            series = (price.market_id, price.commodity_id)
+            if series not in since or price.date < since[series]:
+                since[series] = price.date
+
+        updated = []
+        with transaction.atomic():
+            for (market_id, commodity_id), start in since.items():
+                updated.extend(self._refresh(market_id, commodity_id, start))
+            MarketPrice.objects.bulk_update(updated, INDICATOR_FIELDS, batch_size=1000)
+        return updated
+
+    def prepare(self, prices: List[MarketPrice]) -> Set[Tuple[int, int]]:
+        """Set indicators on unsaved rows from the rows stored before them.
+
+        Context for every series sharing a start date comes from one ranked
+        query. Returns the series that must be refreshed with apply() once
+        saved: those with stored rows after the new ones, and those whose
+        history was stored before indicators existed.
+        """
+        by_series = defaultdict(list)
+        for price in prices:
+            by_series[(price.market_id, price.commodity_id)].append(price)
+        since = {
+            series: min(price.date for price in rows)
+            for series, rows in by_series.items()
+        }
+
+        stale = set()
+        for start in set(since.values()):
+            group = {series for series, day in since.items() if day == start}
+            context, later = self._context(group, start)
+
+            for series in group:
+                rows = sorted(by_series[series], key=lambda price: price.date)
+                dates = {price.date for price in rows}
+                if later.get(series, set()) - dates:
+                    stale.add(series)
+
+                before = context.get(series, [])
+                previous = None
+                if before:
+                    if before[-1][1]["ema_12"] is None:
+                        stale.add(series)
+                    else:
+                        previous = before[-1][1]
+                window = deque(
+                    [modal for modal, _ in before] if previous else [], maxlen=MA_LONG
+                )
+                for price in rows:
+                    previous = fold(previous, window, float(price.modal_price))
+                    for field, value in previous.items():
+                        setattr(price, field, value)
+                    window.append(float(price.modal_price))
+        return stale
+
+    def _context(self, group: Set[Tuple[int, int]], start) -> Tuple[Dict, Dict]:
+        """Last MA_LONG (price, indicators) before start, and later dates, per series"""
+        market_ids = {market_id for market_id, _ in group}
+        commodity_ids = {commodity_id for _, commodity_id in group}
+        stored = MarketPrice.objects.filter(
+            market_id__in=market_ids, commodity_id__in=commodity_ids
+        )
+
+        recent = (
+            stored.filter(date__lt=start)
+            .annotate(
+                recency=Window(
+                    RowNumber(),
+                    partition_by=[F("market_id"), F("commodity_id")],
+                    order_by=F("date").desc(),
+                )
+            )
+            .filter(recency__lte=MA_LONG)
+            .values_list(
+                "market_id", "commodity_id", "date", "modal_price", *INDICATOR_FIELDS
+            )
+        )
+        context = defaultdict(list)
+        for market_id, commodity_id, day, modal_price, *values in recent:
+            if (market_id, commodity_id) in group:
+                context[(market_id, commodity_id)].append(
+                    (day, float(modal_price), dict(zip(INDICATOR_FIELDS, values)))
+                )
+        context = {
+            series: [(price, values) for _, price, values in sorted(rows)]
+            for series, rows in context.items()
+        }
+
+        later = defaultdict(set)
+        for market_id, commodity_id, day in stored.filter(date__gt=start).values_list(
+            "market_id", "commodity_id", "date"
+        ):
+            if (market_id, commodity_id) in group:
+                later[(market_id, commodity_id)].add(day)
+        return context, later
+
+    def rebuild(self, market_ids: Optional[List[int]] = None) -> int:
+        """Recompute indicators over the full history; returns rows processed"""
+        prices = MarketPrice.objects.order_by("market_id", "commodity_id", "date")
+        if market_ids is not None:
+            prices = prices.filter(market_id__in=market_ids)
+
+        processed = 0
+        batch = []
+        series, previous, window = None, None, deque(maxlen=MA_LONG)
+        for price in prices.only(
+            "market_id", "commodity_id", "date", "modal_price"
+        ).iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            if (price.market_id, price.commodity_id) != series:
+                series = (price.market_id, price.commodity_id)
+                previous, window = None, deque(maxlen=MA_LONG)
+
+            previous = fold(previous, window, float(price.modal_price))
+            for field, value in previous.items():
+                setattr(price, field, value)
+            window.append(float(price.modal_price))
+
+            batch.append(price)
+            if len(batch) >= REBUILD_CHUNK_SIZE:
+                MarketPrice.objects.bulk_update(batch, INDICATOR_FIELDS)
+                processed += len(batch)
+                batch = []
+        if batch:
+            MarketPrice.objects.bulk_update(batch, INDICATOR_FIELDS)
+            processed += len(batch)
+
+        logger.info(f"Rebuilt price indicators for {processed} rows")
+        return processed
+
+    def _refresh(self, market_id: int, commodity_id: int, start) -> List[MarketPrice]:
+        """Fold the rows of a series from start onwards"""
+        series = MarketPrice.objects.filter(
+            market_id=market_id, commodity_id=commodity_id
+        )
+        before = list(
+            series.filter(date__lt=start)
+            .order_by("-date")
+            .only("date", "modal_price", *INDICATOR_FIELDS)[:MA_LONG]
+        )[::-1]
+        if before and before[-1].ema_12 is None:
+            # Rows stored before indicators existed: fold the whole series
+            before, rows = [], list(series.order_by("date"))
+        else:
+            rows = list(series.filter(date__gte=start).order_by("date"))
+
+        previous = None
+        if before:
+            previous = {field: getattr(before[-1], field) for field in INDICATOR_FIELDS}
+        window = deque((float(p.modal_price) for p in before), maxlen=MA_LONG)
+
+        for price in rows:
+            previous = fold(previous, window, float(price.modal_price))
+            for field, value in previous.items():
+                setattr(price, field, value)
+            window.append(float(price.modal_price))
+        return rows
@@ -0,0 +1,341 @@
+import csv
+import logging
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List, Tuple
+from django.db import transaction
+from django.db.models import Q
+from .models import Commodity, Market, MarketPrice
+from .price_alerts import PriceAlertEngine
+from .price_indicators import INDICATOR_FIELDS, PriceIndicatorTracker
+from .price_panel import FIELD_INDEX, get_panel_store, get_price_panel, price_row
+from .trend_store import bump_watermarks
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ["min_price", "max_price", "modal_price"]
+RECORD_COLUMNS = [
+    "market_code",
+    "market_id",
+    "commodity_code",
+    "commodity_id",
+    "date",
+    *PRICE_COLUMNS,
+    "arrivals",
+    "price_trend",
+]
+MIN_PRICE = 0.01  # Mirrors the MarketPrice price validators
+TREND_CHOICES = ["up", "down", "stable"]
+TREND_THRESHOLD = 0.02  # Day-on-day modal change that counts as up or down
+
+UPSERT_FIELDS = [
+    *PRICE_COLUMNS,
+    "arrivals",
+    "price_trend",
+    "source",
+    "updated_at",
+    *INDICATOR_FIELDS,
+]
+
+BATCH_SIZE = 5000
+INSERT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+class MarketPriceIngestor:
+    """Set-based validation and upsert of market price feeds.
+
+    Markets and commodities are resolved by code (or id) with one query each
+    for the codes a batch introduces. Each batch is upserted on (market,
+    commodity, date) with a single bulk statement in its own transaction,
+    so a large feed never holds one long transaction open.
+    """
+
+    def __init__(self, source: str = "bulk_upload", batch_size: int = BATCH_SIZE):
+        self.source = source
+        self.batch_size = batch_size
+        self.tracker = PriceIndicatorTracker()
+        self.alerts = PriceAlertEngine()
+        # code -> id and known ids, per model, shared by the batches of a feed
+        self._codes = {Market: {}, Commodity: {}}
+        self._ids = {Market: set(), Commodity: set()}
+
+    def ingest_stream(self, stream) -> Dict:
+        """Ingest a CSV byte or text stream with a header row"""
+        return self.ingest_records(self._iter_csv(stream))
+
+    def ingest_records(self, records: Iterable[Tuple[int, Dict]]) -> Dict:
+        """Ingest (row_number, price) pairs; returns counts, per-row errors and rate"""
+        started = time.perf_counter()
+        result = {
+            "received": 0,
+            "created": 0,
+            "updated": 0,
+            "error_count": 0,
+            "errors": [],
+        }
+
+        for batch in self._batched(records):
+            created, updated, errors = self._ingest_batch(batch)
+            result["received"] += len(batch)
+            result["created"] += created
+            result["updated"] += updated
+            result["error_count"] += len(errors)
+            room = MAX_REPORTED_ERRORS - len(result["errors"])
+            if room > 0:
+                result["errors"].extend(errors[:room])
+
+        elapsed = time.perf_counter() - started
+        result["elapsed_seconds"] = round(elapsed, 3)
+        result["rows_per_second"] = (
+            round(result["received"] / elapsed) if elapsed > 0 else result["received"]
+        )
+        result["errors_truncated"] = result["error_count"] > len(result["errors"])
+
+        logger.info(
+            f"Ingested {result['created'] + result['updated']}/{result['received']} "
+            f"market prices in {elapsed:.2f}s"
+        )
+        return result
+
+    def _ingest_batch(
+        self, batch: List[Tuple[int, Dict]]
+    ) -> Tuple[int, int, List[Dict]]:
+        row_numbers = np.array([row for row, _ in batch])
+        frame = pd.DataFrame.from_records(
+            [record or {} for _, record in batch], columns=RECORD_COLUMNS
+        )
+        errors = {}
+
+        def reject(mask: np.ndarray, column: str, message: str):
+            for row in row_numbers[mask]:
+                errors.setdefault(int(row), {}).setdefault(column, []).append(message)
+
+        malformed = np.array([record is None for _, record in batch])
+        reject(malformed, "non_field_errors", "Row could not be parsed.")
+
+        market_ids = self._resolve(frame, "market", Market, reject)
+        commodity_ids = self._resolve(frame, "commodity", Commodity, reject)
+
+        dates = pd.to_datetime(frame["date"], errors="coerce", format="ISO8601")
+        reject(
+            dates.isna().to_numpy(), "date", "A valid date (YYYY-MM-DD) is required."
+        )
+
+        numeric = {}
+        for column in PRICE_COLUMNS + ["arrivals"]:
+            raw = frame[column]
+            values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64)
+            provided = raw.notna().to_numpy() & (raw.astype(str) != "").to_numpy()
+            reject(provided & np.isnan(values), column, "A valid number is required.")
+            if column in PRICE_COLUMNS:
+                reject(~provided, column, "This field is required.")
+                reject(
+                    values < MIN_PRICE,
+                    column,
+                    f"Ensure this value is greater than or equal to {MIN_PRICE}.",
+                )
+            numeric[column] = values
+
+        trends = frame["price_trend"].where(frame["price_trend"].astype(str) != "")
+        reject(
+            (trends.notna() & ~trends.isin(TREND_CHOICES)).to_numpy(),
+            "price_trend",
+            f"Must be one of {TREND_CHOICES}.",
+        )
+
+        valid = ~np.isin(row_numbers, list(errors.keys()))
+        clean = pd.DataFrame(
+            {
+                "market_id": market_ids,
+                "commodity_id": commodity_ids,
+                "date": dates,
+                **numeric,
+                "price_trend": trends,
+            }
+        )[valid]
+        # The last row wins when a feed repeats a (market, commodity, date)
+        clean = clean.drop_duplicates(
+            ["market_id", "commodity_id", "date"], keep="last"
+        ).astype({"market_id": np.int64, "commodity_id": np.int64})
+        clean["price_trend"] = clean["price_trend"].fillna(
+            pd.Series(self._price_trends(clean), index=clean.index)
+        )
+
+        days = clean["date"].dt.date.tolist()
+        # Stored modal price of each (market, commodity, date) the batch repeats
+        existing = {
+            (market_id, commodity_id, day): float(modal_price)
+            for market_id, commodity_id, day, modal_price in MarketPrice.objects.filter(
+                market_id__in=clean["market_id"].unique().tolist(),
+                commodity_id__in=clean["commodity_id"].unique().tolist(),
+                date__in=set(days),
+            ).values_list("market_id", "commodity_id", "date", "modal_price")
+        }
+
+        # Convert the surviving rows to Python scalars column by column
+        columns = zip(
+            clean["market_id"].tolist(),
+            clean["commodity_id"].tolist(),
+            days,
+            *[
+                np.round(clean[column].to_numpy(), 2).tolist()
+                for column in PRICE_COLUMNS
+            ],
+            [None if value != value else value for value in clean["arrivals"].tolist()],
+            clean["price_trend"].tolist(),
+        )
+        prices = [
+            MarketPrice(
+                market_id=market_id,
+                commodity_id=commodity_id,
+                date=day,
+                min_price=min_price,
+                max_price=max_price,
+                modal_price=modal_price,
+                arrivals=arrivals,
+                price_trend=price_trend,
+                source=self.source,
+            )
+            for (
+                market_id,
+                commodity_id,
+                day,
+                min_price,
+                max_price,
+                modal_price,
+                arrivals,
+                price_trend,
+            ) in columns
+        ]
+        created = sum(
+            (price.market_id, price.commodity_id, price.date) not in existing
+            for price in prices
+        )
+
+        with transaction.atomic():
+            # bulk_create skips post_save, so indicators are folded in here
+            stale = self.tracker.prepare(prices)
+            MarketPrice.objects.bulk_create(
+                prices,
+                batch_size=INSERT_CHUNK_SIZE,
+                update_conflicts=True,
+                unique_fields=["market", "commodity", "date"],
+                update_fields=UPSERT_FIELDS,
+            )
+            refolded = self.tracker.apply(
+                price
+                for price in prices
+                if (price.market_id, price.commodity_id) in stale
+            )
+
+        get_panel_store().update(
+            [price_row(price) for price in prices]
+            + [price_row(price) for price in refolded]
+        )
+        bump_watermarks((price.market_id, price.commodity_id) for price in prices)
+        # Re-posted prices must not fire their alerts again
+        self.alerts.on_prices(
+            price
+            for price in prices
+            if existing.get((price.market_id, price.commodity_id, price.date))
+            != price.modal_price
+        )
+
+        error_list = [
+            {"row": row, "errors": row_errors}
+            for row, row_errors in sorted(errors.items())
+        ]
+        return created, len(prices) - created, error_list
+
+    def _resolve(self, frame: pd.DataFrame, prefix: str, model, reject) -> pd.Series:
+        """Ids from the {prefix}_code column, else {prefix}_id, in one query"""
+        codes = frame[f"{prefix}_code"].astype("string").str.strip()
+        has_code = (codes.notna() & (codes != "")).fillna(False).to_numpy(dtype=bool)
+        ids = pd.to_numeric(frame[f"{prefix}_id"], errors="coerce")
+
+        known_codes, known_ids = self._codes[model], self._ids[model]
+        new_codes = set(codes[has_code]) - set(known_codes)
+        new_ids = {int(i) for i in ids[~has_code].dropna()} - known_ids
+        if new_codes or new_ids:
+            for model_id, code in model.objects.filter(
+                Q(code__in=new_codes) | Q(id__in=new_ids)
+            ).values_list("id", "code"):
+                known_codes[code] = model_id
+                known_ids.add(model_id)
+
+        resolved = pd.Series(np.nan, index=frame.index)
+        resolved[has_code] = codes[has_code].map(known_codes).astype(float)
+        by_id = ~has_code & ids.isin(known_ids).to_numpy()
+        resolved[by_id] = ids[by_id]
+
+        name = model._meta.verbose_name.capitalize()
+        reject(
+            ~has_code & ids.isna().to_numpy(),
+            f"{prefix}_code",
+            f"A {prefix} code or id is required.",
+        )
+        reject(
+            resolved.isna().to_numpy() & (has_code | ids.notna().to_numpy()),
+            f"{prefix}_code",
+            f"{name} does not exist.",
+        )
+        return resolved
+
+    def _price_trends(self, clean: pd.DataFrame) -> np.ndarray:
+        """up/down/stable against each series' modal price on the previous day"""
+        # Previous days within the feed first
+        shifted = clean[["market_id", "commodity_id", "date", "modal_price"]].copy()
+        shifted["date"] += pd.Timedelta(days=1)
+        previous = (
+            clean[["market_id", "commodity_id", "date"]]
+            .merge(shifted, on=["market_id", "commodity_id", "date"], how="left")[
+                "modal_price"
+            ]
+            .to_numpy()
+        )
+
+        # Then stored prices, read from the price panel
+        panel = get_price_panel()
+        rows = np.array(
+            [
+                panel.pair_index.get(pair, -1)
+                for pair in zip(clean["market_id"], clean["commodity_id"])
+            ],
+            dtype=np.int64,
+        )
+        offsets = (clean["date"] - pd.Timestamp(panel.start)).dt.days.to_numpy() - 1
+        inside = (rows >= 0) & (offsets >= 0) & (offsets < panel.days)
+        stored = np.full(len(clean), np.nan)
+        stored[inside] = panel.values[
+            rows[inside], offsets[inside], FIELD_INDEX["modal_price"]
+        ]
+        previous = np.where(np.isnan(previous), stored, previous)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            change = clean["modal_price"].to_numpy() / previous - 1
+        return np.select(
+            [change > TREND_THRESHOLD, change < -TREND_THRESHOLD],
+            ["up", "down"],
+            "stable",
+        )
+
+    def _batched(self, records: Iterable[Tuple[int, Dict]]) -> Iterator[List]:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _iter_csv(stream) -> Iterator[Tuple[int, Dict]]:
+        lines = (
+            line.decode("utf-8") if isinstance(line, bytes) else line for line in stream
+        )
+        reader = csv.DictReader(lines)
+        for row, record in enumerate(reader, start=1):
+            yield row, {key: (value or None) for key, value in record.items()}
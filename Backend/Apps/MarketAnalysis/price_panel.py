@@ -0,0 +1,543 @@
+import json
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from .models import MarketPrice, PricePanelVersion
+
+try:
+    import fcntl
+
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Prices, then the stored rolling features PricePredictor reads
+FIELDS = [
+    "modal_price",
+    "min_price",
+    "max_price",
+    "arrivals",
+    "ma_7",
+    "ma_14",
+    "std_7",
+]
+FIELD_INDEX = {name: i for i, name in enumerate(FIELDS)}
+
+DEFAULT_PANEL_DAYS = 3 * 365  # History kept before today
+DATE_HEADROOM_DAYS = 60  # Future days allocated so daily ingest rarely regrows
+PAIR_HEADROOM = 64  # Spare rows for pairs first seen after the build
+WRITE_CHUNK = 10000
+
+PANEL_VERSION_KEY = "market_price_panel_version"
+# Rows written at each version, for other processes to apply
+PANEL_DELTA_KEY = "market_price_panel_delta"
+PANEL_DELTA_TIMEOUT = 3600
+REBUILT = "rebuilt"  # Delta of a version that replaced the whole panel
+MAX_DELTA_CATCHUP = 1000  # Versions behind beyond which a process rebuilds
+PANEL_DIRNAME = "price_panel"
+
+# Cache backends private to one process
+LOCAL_CACHE_BACKENDS = ("LocMemCache", "DummyCache")
+
+
+def mmap_enabled() -> bool:
+    """Whether the panel lives in a file shared by all worker processes"""
+    return getattr(settings, "PRICE_PANEL_MMAP", False)
+
+
+def cache_shared() -> bool:
+    """Whether every process reads the same default cache"""
+    backend = settings.CACHES["default"]["BACKEND"]
+    return not backend.endswith(LOCAL_CACHE_BACKENDS)
+
+
+def panel_days() -> int:
+    return getattr(settings, "PRICE_PANEL_DAYS", DEFAULT_PANEL_DAYS)
+
+
+def price_row(price: MarketPrice) -> Tuple:
+    """(market, commodity, date, *FIELDS) of a saved price"""
+    return (
+        price.market_id,
+        price.commodity_id,
+        price.date,
+        *[getattr(price, field) for field in FIELDS],
+    )
+
+
+class PricePanel:
+    """Dense float32 price history indexed by (market, commodity, date).
+
+    Each (market, commodity) pair is a row of the values array, which is
+    shaped (pairs, days, FIELDS) and holds NaN on days without a price.
+    Only pairs that have traded are stored, so the panel stays small when
+    most markets deal in a few commodities.
+    """
+
+    def __init__(self, values: np.ndarray, pairs: List[Tuple[int, int]], start: date):
+        self.values = values
+        self.pairs = [tuple(pair) for pair in pairs]
+        self.start = start
+        self.pair_index = {pair: row for row, pair in enumerate(self.pairs)}
+        self.commodity_rows = {}
+        for row, (market_id, commodity_id) in enumerate(self.pairs):
+            self.commodity_rows.setdefault(commodity_id, []).append(row)
+
+    @property
+    def days(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def end(self) -> date:
+        return self.start + timedelta(days=self.days - 1)
+
+    def dates(self, first: int = 0, last: Optional[int] = None) -> pd.DatetimeIndex:
+        last = self.days if last is None else last
+        return pd.date_range(
+            self.start + timedelta(days=first), periods=last - first, freq="D"
+        )
+
+    def series(
+        self,
+        commodity_id: int,
+        market_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        last: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """Priced days of one pair, oldest first, optionally only the last rows"""
+        row = self.pair_index.get((market_id, commodity_id))
+        if row is None:
+            return pd.DataFrame(columns=FIELDS, dtype=float)
+
+        first, stop = self._span(start, end)
+        block = np.asarray(self.values[row, first:stop], dtype=np.float64)
+        priced = np.flatnonzero(~np.isnan(block[:, FIELD_INDEX["modal_price"]]))
+        if last is not None:
+            priced = priced[-last:]
+
+        frame = pd.DataFrame(
+            block[priced], index=self.dates(first, stop)[priced], columns=FIELDS
+        )
+        frame.index.name = "date"
+        return frame
+
+    def commodity_frame(
+        self,
+        commodity_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> pd.DataFrame:
+        """Priced days of a commodity in every market, ordered by date then market"""
+        rows = self.commodity_rows.get(commodity_id, [])
+        first, stop = self._span(start, end)
+        if not rows or stop <= first:
+            return pd.DataFrame(columns=["market_id"] + FIELDS, dtype=float)
+
+        rows = sorted(rows, key=lambda row: self.pairs[row][0])
+        # (days, markets, fields) so flattening orders by date first
+        block = np.asarray(self.values[rows, first:stop], dtype=np.float64)
+        block = block.transpose(1, 0, 2)
+        priced = ~np.isnan(block[:, :, FIELD_INDEX["modal_price"]])
+        day_idx, market_idx = np.nonzero(priced)
+
+        frame = pd.DataFrame(block[priced], columns=FIELDS)
+        frame.insert(
+            0, "market_id", np.array([self.pairs[row][0] for row in rows])[market_idx]
+        )
+        frame.index = self.dates(first, stop)[day_idx]
+        frame.index.name = "date"
+        return frame
+
+    def latest_date(self, commodity_id: int, market_id: int) -> Optional[date]:
+        row = self.pair_index.get((market_id, commodity_id))
+        if row is None:
+            return None
+        priced = np.flatnonzero(
+            ~np.isnan(self.values[row, :, FIELD_INDEX["modal_price"]])
+        )
+        if len(priced) == 0:
+            return None
+        return self.start + timedelta(days=int(priced[-1]))
+
+    def modal_price(
+        self, commodity_id: int, market_id: int, day: date
+    ) -> Optional[float]:
+        """Stored modal price of one day, None when the day has no price"""
+        row = self.pair_index.get((market_id, commodity_id))
+        offset = (day - self.start).days
+        if row is None or not 0 <= offset < self.days:
+            return None
+        price = float(self.values[row, offset, FIELD_INDEX["modal_price"]])
+        # float32 storage; prices carry two decimals
+        return None if np.isnan(price) else round(price, 2)
+
+    def _span(self, start: Optional[date], end: Optional[date]) -> Tuple[int, int]:
+        first = 0 if start is None else (start - self.start).days
+        stop = self.days if end is None else (end - self.start).days + 1
+        return max(first, 0), min(max(stop, 0), self.days)
+
+
+def _allocate(pairs: int, days: int) -> np.ndarray:
+    return np.full((pairs, days, len(FIELDS)), np.nan, dtype=np.float32)
+
+
+def _window(latest: date) -> Tuple[date, int]:
+    """Start and length of a panel covering history up to latest plus headroom"""
+    end = max(latest, timezone.localdate()) + timedelta(days=DATE_HEADROOM_DAYS)
+    start = timezone.localdate() - timedelta(days=panel_days())
+    return start, (end - start).days + 1
+
+
+class PricePanelStore:
+    """Process-wide owner of the price panel.
+
+    The panel is built from MarketPrice on first use and then kept current
+    by update() as prices are ingested. In memory, each process holds its
+    own copy: update() publishes its rows in the cache under a new version,
+    and other processes apply the rows of the versions they missed on their
+    next read. They rebuild only when a delta has expired, is too far
+    behind, or marks a full rebuild. When the cache is local to each process,
+    the version is kept in PricePanelVersion instead and a process that
+    missed a version rebuilds. With PRICE_PANEL_MMAP, the panel is a
+    .npy file mapped by every process: updates are written into the shared
+    mapping and readers only remap when the file is regrown.
+    """
+
+    def __init__(self, base_dir: Optional[Path] = None):
+        self.base_dir = Path(base_dir or Path(settings.ML_MODELS_DIR) / PANEL_DIRNAME)
+        self._lock = threading.Lock()
+        self._panel = None
+        self._version = None  # Cache version the in-memory panel reflects
+        self._meta_mtime = None  # Metadata file the mapped panel reflects
+        self._writable = None  # (array name, r+ memmap) for in-place updates
+        self._flock = None
+
+    @property
+    def meta_path(self) -> Path:
+        return self.base_dir / "panel.json"
+
+    def panel(self) -> PricePanel:
+        """Current panel, built or remapped as needed"""
+        with self._lock:
+            if mmap_enabled():
+                return self._mapped_panel()
+
+            version = self._read_version()
+            if self._panel is None or (
+                self._version != version and not self._catch_up(version)
+            ):
+                self._panel = self._build()
+                self._version = version
+            return self._panel
+
+    def rebuild(self) -> PricePanel:
+        """Rebuild the panel from MarketPrice, replacing any shared file"""
+        with self._lock:
+            panel = self._build()
+            if mmap_enabled():
+                with self._file_lock():
+                    self._write(panel)
+                return self._mapped_panel()
+            self._panel = panel
+            self._version = self._publish(REBUILT)
+            return panel
+
+    def update(self, rows: Iterable[Tuple]):
+        """Write ingested (market, commodity, date, *FIELDS) rows.
+
+        A NaN modal price clears the day, which is how deletions are applied.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+
+        with self._lock:
+            if mmap_enabled():
+                if not self.meta_path.exists():
+                    return  # The first reader builds it with these rows
+                with self._file_lock():
+                    panel = self._mapped_panel()
+                    grown = self._apply(panel, rows)
+                    if grown is not None:
+                        self._write(grown)
+                    else:
+                        self._write_values(panel, rows, self._writable[1])
+                    self._mapped_panel()
+                return
+
+            if self._panel is not None:
+                self._apply_rows(rows)
+            version = self._publish(rows)
+            # With other versions in between, the next read applies them in
+            # order, this one again included
+            if self._panel is not None and version == self._version + 1:
+                self._version = version
+
+    def _catch_up(self, version: int) -> bool:
+        """Apply the rows of the versions published since this panel's.
+
+        Returns False when the panel must be rebuilt instead. A version
+        whose rows are not in the cache yet is retried on the next read.
+        """
+        behind = version - self._version
+        if not 0 < behind <= MAX_DELTA_CATCHUP or not cache_shared():
+            return False
+
+        keys = [_delta_key(v) for v in range(self._version + 1, version + 1)]
+        deltas = cache.get_many(keys)
+        for i, key in enumerate(keys):
+            if key not in deltas:
+                # Expired if a later version is there, else still being written
+                return not any(later in deltas for later in keys[i + 1 :])
+            if deltas[key] == REBUILT:
+                return False
+            self._apply_rows(deltas[key])
+            self._version += 1
+        return True
+
+    def _apply_rows(self, rows: List[Tuple]):
+        if not rows:
+            return
+        grown = self._apply(self._panel, rows)
+        if grown is not None:
+            self._panel = grown
+        else:
+            self._write_values(self._panel, rows)
+
+    def _build(self) -> PricePanel:
+        start, _ = _window(timezone.localdate())
+        queryset = MarketPrice.objects.filter(date__gte=start)
+        pairs = sorted(
+            queryset.order_by().values_list("market_id", "commodity_id").distinct()
+        )
+        latest = queryset.order_by("-date").values_list("date", flat=True).first()
+        start, days = _window(latest or timezone.localdate())
+
+        panel = PricePanel(_allocate(len(pairs) + PAIR_HEADROOM, days), pairs, start)
+        rows = queryset.order_by().values_list(
+            "market_id", "commodity_id", "date", *FIELDS
+        )
+        self._write_values(panel, rows.iterator(chunk_size=WRITE_CHUNK))
+        logger.info(f"Built market price panel: {len(pairs)} pairs x {days} days")
+        return panel
+
+    def _apply(self, panel: PricePanel, rows: List[Tuple]) -> Optional[PricePanel]:
+        """Register new pairs; return a regrown panel when they or the dates do not fit"""
+        priced = {(row[0], row[1]) for row in rows if row[3] is not None}
+        new_pairs = sorted(priced - set(panel.pair_index))
+        latest = max(row[2] for row in rows)
+        pairs = panel.pairs + new_pairs
+
+        if len(pairs) <= len(panel.values) and latest <= panel.end:
+            for pair in new_pairs:
+                panel.pair_index[pair] = len(panel.pairs)
+                panel.commodity_rows.setdefault(pair[1], []).append(len(panel.pairs))
+                panel.pairs.append(pair)
+            if new_pairs and mmap_enabled():
+                self._write_meta(panel, self._writable[0])
+            return None
+
+        start, days = _window(latest)
+        capacity = max(len(pairs) + PAIR_HEADROOM, len(panel.values))
+        grown = PricePanel(_allocate(capacity, days), pairs, start)
+        # Copy the overlapping dates of the existing pairs
+        src, dst = (start - panel.start).days, 0
+        if src < 0:
+            src, dst = 0, -src
+        span = min(panel.days - src, days - dst)
+        if span > 0:
+            grown.values[: len(panel.pairs), dst : dst + span] = panel.values[
+                : len(panel.pairs), src : src + span
+            ]
+        self._write_values(grown, rows)
+        return grown
+
+    def _write_values(
+        self, panel: PricePanel, rows: Iterable[Tuple], values: np.ndarray = None
+    ):
+        """Scatter rows into the panel's values (or a writable mapping of them)"""
+        values = panel.values if values is None else values
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, WRITE_CHUNK))
+            if not chunk:
+                break
+            pair_rows = np.array(
+                [panel.pair_index.get((row[0], row[1]), -1) for row in chunk],
+                dtype=np.int64,
+            )
+            offsets = np.array(
+                [(row[2] - panel.start).days for row in chunk], dtype=np.int64
+            )
+            prices = np.array(
+                [[np.nan if p is None else float(p) for p in row[3:]] for row in chunk],
+                dtype=np.float32,
+            )
+            # Clearing a pair the panel never held is a no-op
+            inside = (pair_rows >= 0) & (offsets >= 0) & (offsets < panel.days)
+            values[pair_rows[inside], offsets[inside]] = prices[inside]
+        if isinstance(values, np.memmap):
+            values.flush()
+
+    def _mapped_panel(self) -> PricePanel:
+        """Mapped panel, remapped when another process rewrote the metadata"""
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except OSError:
+            with self._file_lock():
+                if not self.meta_path.exists():
+                    self._write(self._build())
+            mtime = os.stat(self.meta_path).st_mtime_ns
+
+        if self._panel is None or self._meta_mtime != mtime:
+            with open(self.meta_path) as f:
+                metadata = json.load(f)
+            if metadata.get("fields") != FIELDS:
+                # Written by a version with other fields
+                with self._file_lock():
+                    self._write(self._build())
+                return self._mapped_panel()
+            array_path = self.base_dir / metadata["array"]
+            self._panel = PricePanel(
+                np.load(array_path, mmap_mode="r"),
+                metadata["pairs"],
+                date.fromisoformat(metadata["start"]),
+            )
+            if self._writable is None or self._writable[0] != metadata["array"]:
+                self._writable = (
+                    metadata["array"],
+                    np.load(array_path, mmap_mode="r+"),
+                )
+            self._meta_mtime = mtime
+        return self._panel
+
+    def _write(self, panel: PricePanel):
+        """Write a panel as a new array file and point the metadata at it"""
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        array_name = f"panel_{timezone.now().strftime('%Y%m%d%H%M%S%f')}.npy"
+        tmp_array = self.base_dir / f"{array_name}.tmp"
+        with open(tmp_array, "wb") as f:
+            np.save(f, np.ascontiguousarray(panel.values, dtype=np.float32))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_array, self.base_dir / array_name)
+        self._write_meta(panel, array_name)
+
+        # Processes still mapping an old array keep it until they remap
+        for old in self.base_dir.glob("panel_*.npy"):
+            if old.name != array_name:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+    def _write_meta(self, panel: PricePanel, array_name: str):
+        metadata = {
+            "array": array_name,
+            "start": panel.start.isoformat(),
+            "pairs": [list(pair) for pair in panel.pairs],
+            "fields": FIELDS,
+            "updated_at": timezone.now().isoformat(),
+        }
+        tmp_meta = self.meta_path.with_suffix(".json.tmp")
+        with open(tmp_meta, "w") as f:
+            json.dump(metadata, f)
+        os.replace(tmp_meta, self.meta_path)
+
+    def _file_lock(self):
+        if self._flock is None:
+            self._flock = _PanelFileLock(self.base_dir / "panel.lock")
+        return self._flock
+
+    @staticmethod
+    def _read_version() -> int:
+        if cache_shared():
+            return cache.get(PANEL_VERSION_KEY, 0)
+        return (
+            PricePanelVersion.objects.filter(pk=1)
+            .values_list("version", flat=True)
+            .first()
+            or 0
+        )
+
+    @staticmethod
+    def _publish(delta) -> int:
+        """Bump the panel version and store the rows written at it"""
+        if not cache_shared():
+            # Other processes cannot read the rows, so they rebuild
+            if not PricePanelVersion.objects.filter(pk=1).update(
+                version=F("version") + 1
+            ):
+                PricePanelVersion.objects.get_or_create(pk=1)
+                PricePanelVersion.objects.filter(pk=1).update(version=F("version") + 1)
+            return PricePanelVersion.objects.get(pk=1).version
+
+        try:
+            version = cache.incr(PANEL_VERSION_KEY)
+        except ValueError:
+            cache.set(PANEL_VERSION_KEY, 1, None)
+            version = 1
+        cache.set(_delta_key(version), delta, PANEL_DELTA_TIMEOUT)
+        return version
+
+
+def _delta_key(version: int) -> str:
+    return f"{PANEL_DELTA_KEY}_{version}"
+
+
+class _PanelFileLock:
+    """Exclusive lock serializing panel writes across processes.
+
+    Re-entrant within the owning store, whose thread lock is already held.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+        self._depth = 0
+
+    def __enter__(self):
+        self._depth += 1
+        if FCNTL_AVAILABLE and self._depth == 1:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "w")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._file is not None and self._depth == 0:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_panel_store() -> PricePanelStore:
+    """Process-wide panel store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PricePanelStore()
+        return _store
+
+
+def get_price_panel() -> PricePanel:
+    """Current price panel of this process"""
+    return get_panel_store().panel()
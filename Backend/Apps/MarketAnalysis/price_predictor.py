@@ -1,7 +1,10 @@
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import logging
-from .models import MarketPrice, Commodity, PricePrediction
+from .models import PricePrediction
+from .model_store import get_model_store
+from .price_panel import get_price_panel
 
 # Safe imports for ML dependencies
 try:
@@ -9,7 +12,6 @@ try:
     import pandas as pd
     from sklearn.ensemble import RandomForestRegressor
     from sklearn.preprocessing import StandardScaler
-    import joblib
     ML_AVAILABLE = True
 except ImportError as e:
     ML_AVAILABLE = False
@@ -18,16 +20,35 @@ except ImportError as e:
 logger = logging.getLogger(__name__)
 
 
+FORECAST_MODES = ["recursive", "direct"]
+DIRECT_HORIZON = 14  # Days a direct model predicts from one feature row
+RECENT_WINDOW = 30  # Price rows the forecast features are built from
+MODEL_VERSION = "1.0"
+MIN_TRAINING_ROWS = 20
+
+
 class PricePredictor:
-    """ML-based price prediction for agricultural commodities"""
+    """ML-based price prediction for agricultural commodities.
+
+    Two forecasting modes are available. "recursive" predicts one day ahead
+    and feeds each prediction back as the next day's price. "direct" uses a
+    single multi-output model that predicts every horizon up to its trained
+    horizon from the latest feature row.
+    """
 
     def __init__(self):
         self.model = None
         self.scaler = StandardScaler() if ML_AVAILABLE else None
-        self.model_path = "Scripts/Models/price_predictor.pkl"
-        self.scaler_path = "Scripts/Models/price_scaler.pkl"
-
-    def train_model(self, commodity_id: int, market_id: int = None) -> Dict:
+        self.metadata = {}
+        self.store = get_model_store()
+
+    def train_model(
+        self,
+        commodity_id: int,
+        market_id: int = None,
+        mode: str = "recursive",
+        horizon: int = DIRECT_HORIZON,
+    ) -> Dict:
         """Train price prediction model for a commodity"""
         if not ML_AVAILABLE:
             return {
@@ -36,69 +57,46 @@ class PricePredictor:
             }
         
         try:
-            # Get historical price data
-            queryset = MarketPrice.objects.filter(commodity_id=commodity_id)
+            # Get historical price data from the shared panel
+            panel = get_price_panel()
             if market_id:
-                queryset = queryset.filter(market_id=market_id)
-
-            prices = queryset.order_by("date").values(
-                "date", "modal_price", "arrivals", "min_price", "max_price"
-            )
+                df = panel.series(commodity_id, market_id)
+            else:
+                df = panel.commodity_frame(commodity_id).drop(columns="market_id")
 
-            if len(prices) < 30:
+            if len(df) < 30:
                 return {
                     "error": "Insufficient data for training (minimum 30 days required)"
                 }
 
-            # Prepare features
-            df = pd.DataFrame(prices)
-            df["date"] = pd.to_datetime(df["date"])
-            df = df.set_index("date")
-
-            # Create features
-            features = self._create_features(df)
-
-            # Prepare training data
-            X = features[:-1]  # All but last row
-            y = df["modal_price"].shift(-1)[:-1]  # Next day's price
-
-            # Remove NaN values
-            valid_indices = ~(X.isna().any(axis=1) | y.isna())
-            X = X[valid_indices]
-            y = y[valid_indices]
-
-            # Split data
-            split_index = int(len(X) * 0.8)
-            X_train, X_test = X[:split_index], X[split_index:]
-            y_train, y_test = y[:split_index], y[split_index:]
-
-            # Scale features
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
-
-            # Train model
-            self.model = RandomForestRegressor(
-                n_estimators=100, max_depth=10, random_state=42
+            fit = self._fit(df, mode, horizon)
+            if "error" in fit:
+                return fit
+            self.model, self.scaler = fit["model"], fit["scaler"]
+
+            # Save model under its own (commodity, market, mode) key
+            self.metadata = self.store.save(
+                commodity_id,
+                market_id,
+                self.model,
+                self.scaler,
+                fit["metadata"],
+                mode=mode,
             )
-            self.model.fit(X_train_scaled, y_train)
-
-            # Evaluate
-            train_score = self.model.score(X_train_scaled, y_train)
-            test_score = self.model.score(X_test_scaled, y_test)
-
-            # Save model
-            joblib.dump(self.model, self.model_path)
-            joblib.dump(self.scaler, self.scaler_path)
 
             return {
                 "status": "success",
                 "commodity_id": commodity_id,
                 "market_id": market_id,
-                "training_samples": len(X_train),
-                "test_samples": len(X_test),
-                "train_score": round(train_score, 4),
-                "test_score": round(test_score, 4),
-                "feature_importance": self._get_feature_importance(X.columns),
+                "mode": mode,
+                "model_key": self.metadata["key"],
+                "training_samples": fit["metadata"]["training_samples"],
+                "test_samples": fit["metadata"]["test_samples"],
+                "train_score": fit["metadata"]["train_score"],
+                "test_score": fit["metadata"]["test_score"],
+                "feature_importance": self._get_feature_importance(
+                    fit["metadata"]["features"]
+                ),
             }
 
         except Exception as e:
@@ -106,125 +104,273 @@ class PricePredictor:
             return {"error": str(e)}
 
     def predict_price(
-        self, commodity_id: int, market_id: int, days_ahead: int = 7
+        self,
+        commodity_id: int,
+        market_id: int,
+        days_ahead: int = 7,
+        mode: str = "recursive",
     ) -> Dict:
         """Predict future prices"""
+        if mode not in FORECAST_MODES:
+            return {"error": f"mode must be one of {FORECAST_MODES}"}
+
         try:
-            # Load model if exists
-            try:
-                self.model = joblib.load(self.model_path)
-                self.scaler = joblib.load(self.scaler_path)
-            except:
-                # Train new model if not exists
-                training_result = self.train_model(commodity_id, market_id)
+            # Market model, else the commodity's pooled model, else train one
+            loaded = self._load_model(commodity_id, market_id, mode)
+            if mode == "direct" and loaded:
+                loaded = self.metadata.get("horizon", 0) >= days_ahead
+            if not loaded:
+                training_result = self.train_model(
+                    commodity_id,
+                    market_id,
+                    mode,
+                    horizon=max(days_ahead, DIRECT_HORIZON),
+                )
                 if "error" in training_result:
                     return training_result
 
             # Get recent data
-            recent_prices = MarketPrice.objects.filter(
-                commodity_id=commodity_id, market_id=market_id
-            ).order_by("-date")[:30]
+            df = get_price_panel().series(commodity_id, market_id, last=RECENT_WINDOW)
 
-            if not recent_prices:
+            if df.empty:
                 return {"error": "No recent price data available"}
 
-            # Prepare data
-            prices_data = [
-                {
-                    "date": p.date,
-                    "modal_price": float(p.modal_price),
-                    "min_price": float(p.min_price),
-                    "max_price": float(p.max_price),
-                    "arrivals": p.arrivals or 0,
-                }
-                for p in reversed(recent_prices)
-            ]
-
-            df = pd.DataFrame(prices_data)
-            df["date"] = pd.to_datetime(df["date"])
-            df = df.set_index("date")
-
-            # Generate predictions
-            predictions = []
-            current_df = df.copy()
-
-            for day in range(1, days_ahead + 1):
-                # Create features for prediction
-                features = self._create_features(current_df)
-                last_features = features.iloc[-1:].values
-
-                # Scale and predict
-                last_features_scaled = self.scaler.transform(last_features)
-                predicted_price = self.model.predict(last_features_scaled)[0]
-
-                # Calculate confidence interval
-                confidence = self._calculate_confidence(current_df, predicted_price)
-
-                prediction_date = current_df.index[-1] + timedelta(days=1)
-
-                predictions.append(
-                    {
-                        "date": prediction_date.strftime("%Y-%m-%d"),
-                        "predicted_price": round(predicted_price, 2),
-                        "confidence_score": confidence["score"],
-                        "price_range_min": round(confidence["min"], 2),
-                        "price_range_max": round(confidence["max"], 2),
-                        "trend": self._determine_trend(
-                            current_df["modal_price"].values, predicted_price
-                        ),
-                    }
-                )
-
-                # Add prediction to dataframe for next iteration
-                new_row = pd.DataFrame(
-                    {
-                        "modal_price": [predicted_price],
-                        "min_price": [confidence["min"]],
-                        "max_price": [confidence["max"]],
-                        "arrivals": [current_df["arrivals"].mean()],
-                    },
-                    index=[prediction_date],
-                )
-
-                current_df = pd.concat([current_df, new_row])
+            df["arrivals"] = df["arrivals"].fillna(0)
 
-            # Save predictions to database
-            self._save_predictions(commodity_id, market_id, predictions)
+            if mode == "direct":
+                predictions = self._forecast_direct(df, days_ahead)
+            else:
+                predictions = self._forecast_recursive(df, days_ahead)
 
-            return {
+            result = {
                 "commodity_id": commodity_id,
                 "market_id": market_id,
+                "mode": mode,
                 "base_date": df.index[-1].strftime("%Y-%m-%d"),
                 "predictions": predictions,
                 "model_confidence": self._calculate_model_confidence(),
             }
 
+            # Save predictions to database
+            self._save_predictions(result)
+
+            return result
+
         except Exception as e:
             logger.error(f"Error predicting prices: {e}")
             return {"error": str(e)}
 
+    def backtest(
+        self,
+        commodity_id: int,
+        market_id: int,
+        days_ahead: int = 7,
+        origins: int = 20,
+    ) -> Dict:
+        """Compare forecasting modes on the most recent price history.
+
+        Both modes are trained on the history before the first origin, then
+        forecast days_ahead from each of the last origins days. Models are
+        not written to the model store.
+        """
+        df = get_price_panel().series(commodity_id, market_id)
+        if len(df) < 30 + origins + days_ahead:
+            return {"error": "Insufficient data for backtesting"}
+
+        df["arrivals"] = df["arrivals"].fillna(0)
+        cutoff = len(df) - origins - days_ahead + 1
+
+        results = {}
+        for mode in FORECAST_MODES:
+            predictor = PricePredictor()
+            started = time.perf_counter()
+            fit = predictor._fit(df.iloc[:cutoff], mode, days_ahead)
+            if "error" in fit:
+                return fit
+            predictor.model, predictor.scaler = fit["model"], fit["scaler"]
+            predictor.metadata = fit["metadata"]
+            training_seconds = time.perf_counter() - started
+
+            latencies, errors = [], []
+            for origin in range(cutoff, cutoff + origins):
+                history = df.iloc[max(origin - RECENT_WINDOW, 0) : origin]
+                actual = df["modal_price"].values[origin : origin + days_ahead]
+
+                started = time.perf_counter()
+                if mode == "direct":
+                    forecast = predictor._forecast_direct(history, days_ahead)
+                else:
+                    forecast = predictor._forecast_recursive(history, days_ahead)
+                latencies.append(time.perf_counter() - started)
+
+                predicted = np.array([p["predicted_price"] for p in forecast], float)
+                errors.append(predicted - actual)
+
+            errors = np.array(errors)
+            actual_prices = np.array(
+                [
+                    df["modal_price"].values[o : o + days_ahead]
+                    for o in range(cutoff, cutoff + origins)
+                ]
+            )
+            latencies = np.array(latencies) * 1000
+            results[mode] = {
+                "training_seconds": round(training_seconds, 3),
+                "latency_ms_mean": round(float(latencies.mean()), 2),
+                "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2),
+                "mae": round(float(np.abs(errors).mean()), 2),
+                "mape": round(float(np.mean(np.abs(errors) / actual_prices)) * 100, 2),
+                "mae_by_horizon": np.round(np.abs(errors).mean(axis=0), 2).tolist(),
+            }
+
+        return {
+            "commodity_id": commodity_id,
+            "market_id": market_id,
+            "days_ahead": days_ahead,
+            "origins": origins,
+            "training_window": {
+                "start": df.index[0].strftime("%Y-%m-%d"),
+                "end": df.index[cutoff - 1].strftime("%Y-%m-%d"),
+            },
+            "results": results,
+        }
+
+    def _fit(self, df: pd.DataFrame, mode: str, horizon: int) -> Dict:
+        """Fit a scaler and model on a price history without saving them"""
+        features = self._create_features(df)
+
+        if mode == "direct":
+            # One target column per horizon, all predicted from the same row
+            X = features
+            y = pd.concat(
+                {f"h{h}": df["modal_price"].shift(-h) for h in range(1, horizon + 1)},
+                axis=1,
+            )
+            valid_indices = ~(X.isna().any(axis=1) | y.isna().any(axis=1))
+        else:
+            X = features[:-1]  # All but last row
+            y = df["modal_price"].shift(-1)[:-1]  # Next day's price
+            valid_indices = ~(X.isna().any(axis=1) | y.isna())
+
+        # Remove NaN values
+        X = X[valid_indices]
+        y = y[valid_indices]
+        if len(X) < MIN_TRAINING_ROWS:
+            return {"error": "Insufficient data for the requested horizon"}
+
+        # Split data
+        split_index = int(len(X) * 0.8)
+        X_train, X_test = X[:split_index], X[split_index:]
+        y_train, y_test = y[:split_index], y[split_index:]
+
+        # Scale features
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
+
+        # Train model
+        model = RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42)
+        model.fit(X_train_scaled, y_train)
+
+        return {
+            "model": model,
+            "scaler": scaler,
+            "metadata": {
+                "mode": mode,
+                "horizon": horizon if mode == "direct" else 1,
+                "training_window": {
+                    "start": X.index[0].strftime("%Y-%m-%d"),
+                    "end": X.index[-1].strftime("%Y-%m-%d"),
+                },
+                "training_samples": len(X_train),
+                "test_samples": len(X_test),
+                "train_score": round(model.score(X_train_scaled, y_train), 4),
+                "test_score": round(model.score(X_test_scaled, y_test), 4),
+                "features": list(X.columns),
+            },
+        }
+
+    def _forecast_recursive(self, df: pd.DataFrame, days_ahead: int) -> List[Dict]:
+        """Predict one day at a time, appending each prediction to the history"""
+        predictions = []
+        current_df = df.copy()
+
+        for day in range(1, days_ahead + 1):
+            # Create features for prediction
+            features = self._create_features(current_df)
+            if self.metadata.get("features"):
+                features = features[self.metadata["features"]]
+            last_features = features.iloc[-1:].values
+
+            # Scale and predict
+            last_features_scaled = self.scaler.transform(last_features)
+            predicted_price = self.model.predict(last_features_scaled)[0]
+
+            prediction_date = current_df.index[-1] + timedelta(days=1)
+            entry = self._prediction_entry(current_df, prediction_date, predicted_price)
+            predictions.append(entry)
+
+            # Add prediction to dataframe for next iteration
+            new_row = pd.DataFrame(
+                {
+                    "modal_price": [predicted_price],
+                    "min_price": [entry["price_range_min"]],
+                    "max_price": [entry["price_range_max"]],
+                    "arrivals": [current_df["arrivals"].mean()],
+                },
+                index=[prediction_date],
+            )
+
+            current_df = pd.concat([current_df, new_row])
+
+        return predictions
+
+    def _forecast_direct(self, df: pd.DataFrame, days_ahead: int) -> List[Dict]:
+        """Predict every horizon at once from the latest feature row"""
+        features = self._create_features(df)
+        if self.metadata.get("features"):
+            features = features[self.metadata["features"]]
+
+        last_features_scaled = self.scaler.transform(features.iloc[-1:].values)
+        predicted = np.atleast_1d(self.model.predict(last_features_scaled)[0])
+
+        return [
+            self._prediction_entry(
+                df, df.index[-1] + timedelta(days=day), predicted[day - 1]
+            )
+            for day in range(1, days_ahead + 1)
+        ]
+
+    def _prediction_entry(
+        self, df: pd.DataFrame, prediction_date, predicted_price: float
+    ) -> Dict:
+        confidence = self._calculate_confidence(df, predicted_price)
+        return {
+            "date": prediction_date.strftime("%Y-%m-%d"),
+            "predicted_price": round(float(predicted_price), 2),
+            "confidence_score": confidence["score"],
+            "price_range_min": round(float(confidence["min"]), 2),
+            "price_range_max": round(float(confidence["max"]), 2),
+            "trend": self._determine_trend(df["modal_price"].values, predicted_price),
+        }
+
     def analyze_price_factors(self, commodity_id: int, market_id: int) -> Dict:
         """Analyze factors affecting price"""
         try:
-            # Get historical data
-            prices = MarketPrice.objects.filter(
-                commodity_id=commodity_id, market_id=market_id
-            ).order_by("-date")[:90]
+            # Get historical data, newest first
+            recent = get_price_panel().series(commodity_id, market_id, last=90)[::-1]
 
-            if not prices:
+            if recent.empty:
                 return {"error": "No price data available"}
 
             # Convert to DataFrame
             df = pd.DataFrame(
-                [
-                    {
-                        "date": p.date,
-                        "price": float(p.modal_price),
-                        "arrivals": p.arrivals or 0,
-                        "spread": float(p.max_price - p.min_price),
-                    }
-                    for p in prices
-                ]
+                {
+                    "date": recent.index.date,
+                    "price": recent["modal_price"].values,
+                    "arrivals": recent["arrivals"].fillna(0).values,
+                    "spread": (recent["max_price"] - recent["min_price"]).values,
+                }
             )
 
             # Analyze factors
@@ -252,16 +398,17 @@ class PricePredictor:
         """Create features for price prediction"""
         features = pd.DataFrame(index=df.index)
 
-        # Price features
+        # Price features, read from the indicators stored at ingest when
+        # every row has them (forecast rows appended by recursion do not)
         features["price"] = df["modal_price"]
-        features["price_ma_7"] = (
-            df["modal_price"].rolling(window=7, min_periods=1).mean()
+        features["price_ma_7"] = self._stored_or_rolling(
+            df, "ma_7", lambda prices: prices.rolling(window=7, min_periods=1).mean()
         )
-        features["price_ma_14"] = (
-            df["modal_price"].rolling(window=14, min_periods=1).mean()
+        features["price_ma_14"] = self._stored_or_rolling(
+            df, "ma_14", lambda prices: prices.rolling(window=14, min_periods=1).mean()
         )
-        features["price_std_7"] = (
-            df["modal_price"].rolling(window=7, min_periods=1).std()
+        features["price_std_7"] = self._stored_or_rolling(
+            df, "std_7", lambda prices: prices.rolling(window=7, min_periods=1).std()
         )
 
         # Price momentum
@@ -287,10 +434,19 @@ class PricePredictor:
         features["month"] = df.index.month
 
         # Fill NaN values
-        features = features.fillna(method="ffill").fillna(method="bfill")
+        features = features.ffill().bfill()
 
         return features
 
+    def _stored_or_rolling(self, df: pd.DataFrame, column: str, rolling) -> pd.Series:
+        """Stored indicator column, computed from modal prices where it is missing"""
+        if column in df.columns and df[column].iloc[1:].notna().all():
+            return df[column]
+        computed = rolling(df["modal_price"])
+        if column in df.columns:
+            return df[column].fillna(computed)
+        return computed
+
     def _calculate_confidence(self, df: pd.DataFrame, predicted_price: float) -> Dict:
         """Calculate confidence interval for prediction"""
         recent_volatility = df["modal_price"].tail(7).std()
@@ -331,37 +487,83 @@ class PricePredictor:
         else:
             return "stable"
 
+    def _load_model(
+        self, commodity_id: int, market_id: Optional[int], mode: str = "recursive"
+    ) -> bool:
+        """Use the stored model for the market, falling back to the pooled one"""
+        bundle = self.store.load(commodity_id, market_id, mode)
+        if bundle is None and market_id is not None:
+            bundle = self.store.load(commodity_id, None, mode)
+        if bundle is None:
+            return False
+
+        self.model = bundle["model"]
+        self.scaler = bundle["scaler"]
+        self.metadata = bundle["metadata"]
+        return True
+
     def _calculate_model_confidence(self) -> float:
         """Calculate overall model confidence"""
-        # Simplified confidence calculation
-        # In production, would use cross-validation scores
+        # Held-out R² of the model in use, when it was recorded at training
+        test_score = self.metadata.get("test_score")
+        if test_score is not None:
+            return round(min(max(test_score, 0.0), 1.0), 4)
         return 0.75
 
-    def _save_predictions(
-        self, commodity_id: int, market_id: int, predictions: List[Dict]
-    ):
+    def _save_predictions(self, result: Dict):
         """Save predictions to database"""
         try:
-            commodity = Commodity.objects.get(id=commodity_id)
-            market = Market.objects.get(id=market_id)
-
-            for pred in predictions:
-                PricePrediction.objects.update_or_create(
-                    commodity=commodity,
-                    market=market,
-                    prediction_date=pred["date"],
-                    defaults={
-                        "predicted_price": pred["predicted_price"],
-                        "confidence_score": pred["confidence_score"],
-                        "price_range_min": pred["price_range_min"],
-                        "price_range_max": pred["price_range_max"],
-                        "model_version": "1.0",
-                        "factors": {"trend": pred["trend"]},
-                    },
-                )
+            upsert_predictions(prediction_rows(result))
         except Exception as e:
             logger.error(f"Error saving predictions: {e}")
 
+    def precomputed(
+        self,
+        commodity_id: int,
+        market_id: int,
+        days_ahead: int = 7,
+        mode: str = "recursive",
+    ) -> Optional[Dict]:
+        """Stored forecast from the latest price, or None when it must be computed"""
+        latest = get_price_panel().latest_date(commodity_id, market_id)
+        if latest is None:
+            return None
+
+        base_date = latest.isoformat()
+        rows = [
+            row
+            for row in PricePrediction.objects.filter(
+                commodity_id=commodity_id,
+                market_id=market_id,
+                prediction_date__gt=latest,
+                prediction_date__lte=latest + timedelta(days=days_ahead),
+            ).order_by("prediction_date")
+            if row.factors.get("base_date") == base_date
+            and row.factors.get("mode") == mode
+        ]
+        if len(rows) < days_ahead:
+            return None
+
+        return {
+            "commodity_id": commodity_id,
+            "market_id": market_id,
+            "mode": mode,
+            "base_date": base_date,
+            "predictions": [
+                {
+                    "date": row.prediction_date.isoformat(),
+                    "predicted_price": float(row.predicted_price),
+                    "confidence_score": row.confidence_score,
+                    "price_range_min": float(row.price_range_min),
+                    "price_range_max": float(row.price_range_max),
+                    "trend": row.factors.get("trend"),
+                }
+                for row in rows
+            ],
+            "model_confidence": rows[0].factors.get("model_confidence"),
+            "precomputed": True,
+        }
+
     def _get_feature_importance(self, feature_names) -> Dict:
         """Get feature importance from trained model"""
         if self.model is None:
@@ -496,3 +698,44 @@ class PricePredictor:
             )
 
         return recommendations
+
+
+def prediction_rows(result: Dict) -> List[PricePrediction]:
+    """Unsaved PricePrediction rows for a predict_price style result"""
+    return [
+        PricePrediction(
+            commodity_id=result["commodity_id"],
+            market_id=result["market_id"],
+            prediction_date=pred["date"],
+            predicted_price=pred["predicted_price"],
+            confidence_score=pred["confidence_score"],
+            price_range_min=pred["price_range_min"],
+            price_range_max=pred["price_range_max"],
+            model_version=MODEL_VERSION,
+            factors={
+                "trend": pred["trend"],
+                "mode": result["mode"],
+                "base_date": result["base_date"],
+                "model_confidence": result["model_confidence"],
+            },
+        )
+        for pred in result["predictions"]
+    ]
+
+
+def upsert_predictions(rows: List[PricePrediction], batch_size: int = 1000):
+    """Insert or replace predictions per (commodity, market, prediction_date)"""
+    PricePrediction.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["commodity", "market", "prediction_date"],
+        update_fields=[
+            "predicted_price",
+            "confidence_score",
+            "price_range_min",
+            "price_range_max",
+            "model_version",
+            "factors",
+        ],
+    )
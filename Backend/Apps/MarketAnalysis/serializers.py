@@ -116,3 +116,20 @@ class MarketComparisonSerializer(serializers.Serializer):
     commodity_id = serializers.IntegerField()
     market_ids = serializers.ListField(child=serializers.IntegerField(), min_length=2)
     date = serializers.DateField(required=False)
+
+
+class MarketMatrixSerializer(serializers.Serializer):
+    """Serializer for commodity x market comparison over a date range"""
+
+    commodity_ids = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1
+    )
+    market_ids = serializers.ListField(child=serializers.IntegerField(), min_length=2)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        start, end = data.get("start_date"), data.get("end_date")
+        if start and end and start > end:
+            raise serializers.ValidationError("start_date must be before end_date")
+        return data
@@ -0,0 +1,98 @@
+import weakref
+from typing import List
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .market_dashboard import invalidate_dashboard
+from .market_index import get_market_index
+from .models import Commodity, Market, MarketAlert, MarketPrice
+from .price_alerts import PriceAlertEngine, get_alert_index
+from .price_indicators import PriceIndicatorTracker
+from .price_panel import FIELDS, get_panel_store, get_price_panel, price_row
+from .trend_store import bump_watermarks
+
+# Rows of each queryset delete, and the market or commodity deletes that
+# drop prices, keyed by the delete's origin until it commits
+_deleted_prices = weakref.WeakKeyDictionary()
+_panel_rebuilds = weakref.WeakSet()
+
+
+@receiver(post_save, sender=MarketPrice)
+def update_price_panel(sender, instance, created, raw=False, **kwargs):
+    """Fold each saved price into its series indicators and the price panel"""
+    if raw:
+        return
+
+    # Alerts fire for a new or repriced day, not for edits of other fields
+    repriced = created or get_price_panel().modal_price(
+        instance.commodity_id, instance.market_id, instance.date
+    ) != float(instance.modal_price)
+
+    updated = PriceIndicatorTracker().apply([instance])
+    get_panel_store().update([price_row(price) for price in updated])
+    bump_watermarks([(instance.market_id, instance.commodity_id)])
+    if repriced:
+        PriceAlertEngine().on_prices([instance])
+
+
+@receiver(post_delete, sender=MarketPrice)
+def clear_price_panel(sender, instance, origin=None, **kwargs):
+    """Clear a deleted price from the panel and refold the rows after it.
+
+    A queryset delete is applied once for all its rows after it commits.
+    Cascades from a market or commodity are left to rebuild_price_panel.
+    """
+    if origin is instance:
+        _clear_prices([instance])
+    elif isinstance(origin, QuerySet) and origin.model is MarketPrice:
+        if origin not in _deleted_prices:
+            rows = _deleted_prices[origin] = []
+            transaction.on_commit(lambda: _clear_prices(rows))
+        _deleted_prices[origin].append(instance)
+
+
+@receiver(pre_delete, sender=Market)
+@receiver(pre_delete, sender=Commodity)
+def rebuild_price_panel(sender, instance, origin=None, **kwargs):
+    """Rebuild the panel once after a market or commodity delete drops prices"""
+    if origin not in _panel_rebuilds and instance.prices.exists():
+        _panel_rebuilds.add(origin)
+        transaction.on_commit(get_panel_store().rebuild)
+
+
+def _clear_prices(prices: List[MarketPrice]):
+    """One indicator refold, panel update and watermark move for deleted prices"""
+    updated = PriceIndicatorTracker().apply(prices)
+    get_panel_store().update(
+        [
+            (price.market_id, price.commodity_id, price.date, *[None] * len(FIELDS))
+            for price in prices
+        ]
+        + [price_row(price) for price in updated]
+    )
+    bump_watermarks(
+        [(price.market_id, price.commodity_id) for price in prices], create=False
+    )
+
+
+@receiver(post_save, sender=Market)
+@receiver(post_delete, sender=Market)
+def invalidate_market_index(sender, **kwargs):
+    """Rebuild the market search index and dashboard after any market change"""
+    get_market_index().invalidate()
+    invalidate_dashboard()
+
+
+@receiver(post_save, sender=Commodity)
+@receiver(post_delete, sender=Commodity)
+def invalidate_commodity_dashboard(sender, **kwargs):
+    """Rebuild the dashboard after any commodity change"""
+    invalidate_dashboard()
+
+
+@receiver(post_save, sender=MarketAlert)
+@receiver(post_delete, sender=MarketAlert)
+def invalidate_alert_index(sender, **kwargs):
+    """Rebuild the alert index after any alert change"""
+    get_alert_index().invalidate()
@@ -1,3 +1,383 @@
-from django.test import TestCase
+import numpy as np
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from Apps.UserManagement.models import Notification
+from .market_dashboard import dashboard_snapshot
+from .models import (
+    Commodity,
+    Market,
+    MarketAlert,
+    MarketPrice,
+    PricePanelVersion,
+    PriceWatermark,
+)
+from .pattern_reference import (
+    SERIES_KINDS,
+    mismatches,
+    reference_dataset,
+    reference_patterns,
+)
+from .price_indicators import INDICATOR_FIELDS, PriceIndicatorTracker
+from .price_ingest import MarketPriceIngestor
+from .price_panel import PricePanelStore, get_price_panel, price_row
+from .trend_analyzer import (
+    _double_patterns,
+    _head_and_shoulders,
+    _pattern,
+    _right_aligned,
+    _triangle_patterns,
+)
 
-# Create your tests here.
+LOCAL_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def make_market(code: str) -> Market:
+    return Market.objects.create(
+        name=code,
+        code=code,
+        location="Test",
+        district="Test",
+        state="Test",
+        latitude=18.5,
+        longitude=73.8,
+        market_type="apmc",
+    )
+
+
+def make_commodity(code: str) -> Commodity:
+    return Commodity.objects.create(name=code, code=code, category="cereals")
+
+
+def price_fields(modal_price) -> dict:
+    return {
+        "min_price": modal_price - 10,
+        "max_price": modal_price + 10,
+        "modal_price": modal_price,
+    }
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class MarketTestCase(TestCase):
+    """Starts each test from an empty cache, which outlives database rollbacks"""
+
+    def setUp(self):
+        cache.clear()
+
+
+class PatternRecognitionTests(SimpleTestCase):
+    """The vectorized detectors against the loop detectors they replaced"""
+
+    def test_matches_reference_detectors(self):
+        series = reference_dataset(1000, seed=0)
+        self.assertEqual(mismatches(series), [])
+
+    def test_matches_reference_on_five_year_series(self):
+        series = reference_dataset(
+            2 * len(SERIES_KINDS), seed=1, min_length=1825, max_length=1826
+        )
+        self.assertEqual(mismatches(series), [])
+
+    def test_batch_matches_reference_per_series(self):
+        series = reference_dataset(200, seed=2)
+        width = max(len(prices) for prices in series)
+        matrix = np.full((len(series), width), np.nan)
+        for row, prices in enumerate(series):
+            matrix[row, : len(prices)] = prices
+        matrix = _right_aligned(matrix)
+
+        detected = [
+            np.where(_head_and_shoulders(matrix), "head_and_shoulders", None),
+            _double_patterns(matrix),
+            _triangle_patterns(matrix),
+        ]
+        for row, prices in enumerate(series):
+            patterns = [_pattern(names[row]) for names in detected if names[row]]
+            self.assertEqual(
+                patterns, reference_patterns(prices)["patterns"], f"series {row}"
+            )
+
+
+class PricePanelVersionTests(MarketTestCase):
+    """Panels of processes that share no cache, versioned through the database"""
+
+    def setUp(self):
+        super().setUp()
+        self.market = make_market("PUNE")
+        self.commodity = make_commodity("WHEAT")
+        self.today = timezone.localdate()
+        MarketPrice.objects.bulk_create(
+            [
+                MarketPrice(
+                    market=self.market,
+                    commodity=self.commodity,
+                    date=self.today - timedelta(days=day),
+                    **price_fields(2000 + day),
+                )
+                for day in range(1, 10)
+            ]
+        )
+
+    def modal_price(self, store: PricePanelStore) -> float:
+        series = store.panel().series(
+            self.commodity.id, self.market.id, self.today, self.today
+        )
+        return float(series["modal_price"].iloc[0])
+
+    def test_other_process_sees_update(self):
+        writer, reader = PricePanelStore(), PricePanelStore()
+        written_panel = writer.panel()
+        reader.panel()
+
+        [price] = MarketPrice.objects.bulk_create(
+            [
+                MarketPrice(
+                    market=self.market,
+                    commodity=self.commodity,
+                    date=self.today,
+                    **price_fields(2500),
+                )
+            ]
+        )
+        writer.update([price_row(price)])
+        # The reader's own cache never holds the writer's versions
+        cache.clear()
+
+        self.assertEqual(self.modal_price(reader), 2500)
+        # The writer applied its own rows and keeps its panel
+        self.assertIs(writer.panel(), written_panel)
+        self.assertEqual(self.modal_price(writer), 2500)
+
+
+class PriceAlertTriggerTests(MarketTestCase):
+    """Alerts fire once per new or repriced day"""
+
+    def setUp(self):
+        super().setUp()
+        self.market = make_market("NASIK")
+        self.commodity = make_commodity("ONION")
+        self.today = timezone.localdate()
+        self.alert = MarketAlert.objects.create(
+            user=User.objects.create_user("farmer"),
+            commodity=self.commodity,
+            market=self.market,
+            alert_type="price_above",
+            threshold_value=2000,
+        )
+
+    def ingest(self, modal_price: float) -> dict:
+        record = {
+            "market_code": self.market.code,
+            "commodity_code": self.commodity.code,
+            "date": self.today.isoformat(),
+            **price_fields(modal_price),
+        }
+        return MarketPriceIngestor().ingest_records([(1, record)])
+
+    def assertTriggered(self, times: int):
+        self.alert.refresh_from_db()
+        self.assertEqual(self.alert.trigger_count, times)
+        self.assertEqual(Notification.objects.count(), times)
+
+    def test_reingesting_same_batch_triggers_nothing(self):
+        self.ingest(2500)
+        self.assertTriggered(1)
+
+        result = self.ingest(2500)
+        self.assertEqual(result["updated"], 1)
+        self.assertTriggered(1)
+
+        self.ingest(2600)
+        self.assertTriggered(2)
+
+    def test_saving_other_fields_triggers_nothing(self):
+        price = MarketPrice.objects.create(
+            market=self.market,
+            commodity=self.commodity,
+            date=self.today,
+            **price_fields(2500),
+        )
+        self.assertTriggered(1)
+
+        price.source = "admin"
+        price.save()
+        self.assertTriggered(1)
+
+        price.modal_price = 2600
+        price.save()
+        self.assertTriggered(2)
+
+
+class MarketDashboardTests(MarketTestCase):
+    """The cached snapshot follows price watermarks kept in the database"""
+
+    def test_snapshot_sees_prices_written_elsewhere(self):
+        market, commodity = make_market("INDORE"), make_commodity("SOY")
+        self.assertEqual(
+            dashboard_snapshot()["market_summary"]["total_price_records"], 0
+        )
+
+        # As another process would, whose cache this one does not share
+        MarketPrice.objects.bulk_create(
+            [
+                MarketPrice(
+                    market=market,
+                    commodity=commodity,
+                    date=timezone.localdate(),
+                    **price_fields(4000),
+                )
+            ]
+        )
+        PriceWatermark.objects.create(
+            market=market, commodity=commodity, changed_at=timezone.now()
+        )
+
+        self.assertEqual(
+            dashboard_snapshot()["market_summary"]["total_price_records"], 1
+        )
+
+
+class PriceDeleteTests(MarketTestCase):
+    """Deletes of many prices publish one panel version"""
+
+    def setUp(self):
+        super().setUp()
+        self.market = make_market("AGRA")
+        self.commodity = make_commodity("POTATO")
+        self.today = timezone.localdate()
+        MarketPrice.objects.bulk_create(
+            [
+                MarketPrice(
+                    market=self.market,
+                    commodity=self.commodity,
+                    date=self.today - timedelta(days=day),
+                    **price_fields(1000 + day),
+                )
+                for day in range(20)
+            ]
+        )
+        get_price_panel()
+
+    def panel_version(self) -> int:
+        version = PricePanelVersion.objects.values_list("version", flat=True).first()
+        return version or 0
+
+    def test_queryset_delete_publishes_once(self):
+        version = self.panel_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            MarketPrice.objects.filter(date__lt=self.today - timedelta(days=9)).delete()
+
+        self.assertEqual(self.panel_version(), version + 1)
+        series = get_price_panel().series(self.commodity.id, self.market.id)
+        self.assertEqual(len(series), 10)
+        # The first remaining row starts its series again
+        oldest = MarketPrice.objects.order_by("date").first()
+        self.assertEqual(oldest.ma_7, float(oldest.modal_price))
+
+    def test_market_delete_rebuilds_once(self):
+        version, market_id = self.panel_version(), self.market.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.market.delete()
+
+        self.assertEqual(self.panel_version(), version + 1)
+        self.assertEqual(len(get_price_panel().series(self.commodity.id, market_id)), 0)
+
+
+class PriceIndicatorTests(MarketTestCase):
+    """Indicators maintained at ingest equal those of a full rebuild"""
+
+    def setUp(self):
+        super().setUp()
+        self.markets = [make_market("KOTA"), make_market("BUNDI")]
+        self.commodity = make_commodity("MUSTARD")
+        self.start = timezone.localdate() - timedelta(days=60)
+        rng = np.random.default_rng(7)
+        self.prices = np.round(5000 + np.cumsum(rng.normal(0, 40, 60)), 2)
+
+    def records(self, days, shift: float = 0) -> list:
+        return [
+            (
+                i,
+                {
+                    "market_code": market.code,
+                    "commodity_code": self.commodity.code,
+                    "date": (self.start + timedelta(days=day)).isoformat(),
+                    **price_fields(float(self.prices[day]) + shift),
+                },
+            )
+            for i, (market, day) in enumerate(
+                (market, day) for market in self.markets for day in days
+            )
+        ]
+
+    def assertMatchesRebuild(self):
+        fields = ["market_id", "date", *INDICATOR_FIELDS]
+        stored = list(MarketPrice.objects.order_by(*fields[:2]).values_list(*fields))
+        PriceIndicatorTracker().rebuild()
+        rebuilt = list(MarketPrice.objects.order_by(*fields[:2]).values_list(*fields))
+
+        self.assertEqual(len(stored), len(rebuilt))
+        for row, expected in zip(stored, rebuilt):
+            self.assertEqual(row[:2], expected[:2])
+            for field, value, wanted in zip(INDICATOR_FIELDS, row[2:], expected[2:]):
+                if wanted is None:
+                    self.assertIsNone(value, f"{field} on {row[1]}")
+                else:
+                    self.assertAlmostEqual(value, wanted, 6, f"{field} on {row[1]}")
+
+    def test_ingested_batches_match_rebuild(self):
+        ingestor = MarketPriceIngestor()
+        ingestor.ingest_records(self.records(range(30, 50)))
+        # A backfill ahead of the stored rows, then corrections across them
+        ingestor.ingest_records(self.records(range(0, 10)))
+        ingestor.ingest_records(self.records(range(25, 35), shift=75))
+        ingestor.ingest_records(self.records(range(50, 60)))
+        self.assertMatchesRebuild()
+
+    def test_saves_out_of_order_match_rebuild(self):
+        days = np.random.default_rng(3).permutation(40)
+        for day in days:
+            MarketPrice.objects.create(
+                market=self.markets[0],
+                commodity=self.commodity,
+                date=self.start + timedelta(days=int(day)),
+                **price_fields(float(self.prices[day])),
+            )
+        self.assertMatchesRebuild()
+
+    def test_rows_stored_without_indicators_are_refolded(self):
+        # As stored before indicators existed: no signals, ema_12 NULL
+        MarketPrice.objects.bulk_create(
+            [
+                MarketPrice(
+                    market=market,
+                    commodity=self.commodity,
+                    date=self.start + timedelta(days=day),
+                    **price_fields(float(self.prices[day])),
+                )
+                for market in self.markets
+                for day in range(30)
+            ]
+        )
+        MarketPriceIngestor().ingest_records(self.records(range(30, 40)))
+        MarketPrice.objects.create(
+            market=self.markets[0],
+            commodity=self.commodity,
+            date=self.start + timedelta(days=45),
+            **price_fields(float(self.prices[45])),
+        )
+        self.assertFalse(MarketPrice.objects.filter(ema_12__isnull=True).exists())
+        self.assertMatchesRebuild()
+
+    def test_deletes_refold_later_rows(self):
+        MarketPriceIngestor().ingest_records(self.records(range(40)))
+        MarketPrice.objects.get(
+            market=self.markets[0], date=self.start + timedelta(days=20)
+        ).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            MarketPrice.objects.filter(
+                market=self.markets[1], date__lt=self.start + timedelta(days=5)
+            ).delete()
+        self.assertMatchesRebuild()
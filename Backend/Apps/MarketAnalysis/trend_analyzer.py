@@ -1,42 +1,219 @@
+import json
+import math
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from numpy.lib.stride_tricks import sliding_window_view
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from django.db.models import Avg, Max, Min, Count, Sum, Q
-from .models import MarketPrice, MarketTrend, Commodity, Market
+from .market_index import get_market_index
+from .models import MarketPrice, MarketTrend
+from .price_indicators import INDICATOR_FIELDS, stored_rsi
+from .price_panel import FIELD_INDEX, get_price_panel
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Markets compared for opportunities: the nearest ones within about 1 degree
+OPPORTUNITY_MARKETS = 10
+OPPORTUNITY_RADIUS_KM = 111.0
+
+MATRIX_DEFAULT_DAYS = 7  # Date range of a market matrix when none is given
+ARBITRAGE_THRESHOLD = 0.1  # Spread over the cheapest price worth trading
+
+EXTREMA_ORDER = 5  # Prices on each side a peak or trough must beat
+PATTERN_MIN_PRICES = 20
+DOUBLE_PATTERN_WINDOW = 15
+TRIANGLE_WINDOW = 5
+TRIANGLE_SLOPE = 0.1
+
+PATTERNS = {
+    "head_and_shoulders": {"type": "reversal", "signal": "bearish"},
+    "double_top": {"type": "reversal", "signal": "bearish"},
+    "double_bottom": {"type": "reversal", "signal": "bullish"},
+    "ascending_triangle": {"type": "continuation", "signal": "bullish"},
+    "descending_triangle": {"type": "continuation", "signal": "bearish"},
+    "symmetrical_triangle": {"type": "continuation", "signal": "neutral"},
+}
+
+
+def _jsonable(analysis: Dict) -> Dict:
+    """Plain JSON types, as the analysis is stored and served again"""
+
+    def convert(value):
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+    def finite(value):
+        # NaN and infinity, e.g. correlations of flat series, are not valid JSON
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        if isinstance(value, dict):
+            return {key: finite(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [finite(item) for item in value]
+        return value
+
+    return finite(json.loads(json.dumps(analysis, default=convert)))
+
+
+def _pattern(name: str) -> Dict:
+    return {"name": name, **PATTERNS[name]}
+
+
+def _local_extrema(
+    prices: np.ndarray, order: int, greater: bool = True, clip: bool = False
+) -> np.ndarray:
+    """Indices of prices strictly above (or below) the order prices on each side.
+
+    With clip the ends are padded with their edge price, as scipy's
+    argrelextrema(mode="clip"); otherwise only interior prices qualify.
+    """
+    values = prices if greater else -prices
+    if clip:
+        values = np.pad(values, order, mode="edge")
+    if len(values) < 2 * order + 1:
+        return np.empty(0, dtype=np.int64)
+
+    windows = sliding_window_view(values, 2 * order + 1)
+    neighbours = np.maximum(
+        windows[:, :order].max(axis=1), windows[:, order + 1 :].max(axis=1)
+    )
+    found = np.flatnonzero(windows[:, order] > neighbours)
+    return found if clip else found + order
+
+
+def _right_aligned(prices: np.ndarray) -> np.ndarray:
+    """Move each row's prices to its right end, NaN-padding the left"""
+    order = np.argsort(~np.isnan(prices), axis=1, kind="stable")
+    return np.take_along_axis(prices, order, axis=1)
+
+
+def _head_and_shoulders(prices: np.ndarray) -> np.ndarray:
+    """Rows whose last three peaks have the middle one highest.
+
+    prices holds one series per row, right aligned; NaN padding is never
+    part of a peak window, as in the single-series scan.
+    """
+    window = EXTREMA_ORDER
+    if prices.shape[1] < 2 * window + 1:
+        return np.zeros(len(prices), dtype=bool)
+
+    windows = sliding_window_view(prices, 2 * window + 1, axis=1)
+    with np.errstate(invalid="ignore"):
+        neighbours = np.maximum(
+            windows[:, :, :window].max(axis=2), windows[:, :, window + 1 :].max(axis=2)
+        )
+        peaks = windows[:, :, window] > neighbours
+
+    positions = np.where(peaks, np.arange(peaks.shape[1]), -1)
+    last = np.sort(positions, axis=1)[:, -3:]
+    if last.shape[1] < 3:
+        return np.zeros(len(prices), dtype=bool)
+
+    values = np.take_along_axis(prices, np.maximum(last, 0) + window, axis=1)
+    return (
+        (last >= 0).all(axis=1)
+        & (values[:, 1] > values[:, 0])
+        & (values[:, 1] > values[:, 2])
+    )
+
+
+def _double_patterns(prices: np.ndarray) -> np.ndarray:
+    """double_top, double_bottom or None per row from its last prices"""
+    recent = prices[:, -DOUBLE_PATTERN_WINDOW:]
+    high = recent.max(axis=1, keepdims=True)
+    low = recent.min(axis=1, keepdims=True)
+    tolerance = (high - low) * 0.02
+
+    tops = (np.abs(recent - high) < tolerance).sum(axis=1)
+    bottoms = (np.abs(recent - low) < tolerance).sum(axis=1)
+    return np.select([tops >= 2, bottoms >= 2], ["double_top", "double_bottom"], None)
+
+
+def _triangle_patterns(prices: np.ndarray) -> np.ndarray:
+    """Triangle name or None per row from the slopes of rolling highs and lows"""
+    if prices.shape[1] < TRIANGLE_WINDOW:
+        return np.full(len(prices), None, dtype=object)
+
+    windows = sliding_window_view(prices, TRIANGLE_WINDOW, axis=1)
+    # Windows reaching into the NaN padding drop out, as rolling().dropna()
+    high_slope = _slopes(windows.max(axis=2))
+    low_slope = _slopes(windows.min(axis=2))
+
+    return np.select(
+        [
+            (np.abs(high_slope) < TRIANGLE_SLOPE) & (low_slope > TRIANGLE_SLOPE),
+            (high_slope < -TRIANGLE_SLOPE) & (np.abs(low_slope) < TRIANGLE_SLOPE),
+            (high_slope < -TRIANGLE_SLOPE) & (low_slope > TRIANGLE_SLOPE),
+        ],
+        ["ascending_triangle", "descending_triangle", "symmetrical_triangle"],
+        None,
+    )
+
+
+def _slopes(values: np.ndarray) -> np.ndarray:
+    """Least-squares slope of each row's non-NaN values against their position"""
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=1, keepdims=True)
+    x = np.broadcast_to(np.arange(values.shape[1], dtype=np.float64), values.shape)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dx = np.where(valid, x - np.where(valid, x, 0).sum(1, keepdims=True) / count, 0)
+        dy = np.where(
+            valid, values - np.where(valid, values, 0).sum(1, keepdims=True) / count, 0
+        )
+        return (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+
 
 class TrendAnalyzer:
     """Analyze market trends and patterns"""
 
     def analyze_commodity_trend(
-        self, commodity_id: int, days: int = 30, market_id: int = None
+        self,
+        commodity_id: int,
+        days: int = 30,
+        market_id: int = None,
+        watermark: Optional[datetime] = None,
     ) -> Dict:
-        """Analyze price trends for a commodity"""
+        """Analyze price trends for a commodity.
+
+        The analysis is stored on MarketTrend; watermark is the price change
+        watermark it was computed from, letting TrendStore serve it again.
+        """
         try:
             end_date = datetime.now().date()
             start_date = end_date - timedelta(days=days)
 
-            # Get price data
-            query = MarketPrice.objects.filter(
-                commodity_id=commodity_id, date__range=[start_date, end_date]
-            )
-
+            # Get price data from the shared panel
+            panel = get_price_panel()
             if market_id:
-                query = query.filter(market_id=market_id)
-
-            prices = query.order_by("date").values("date", "modal_price", "arrivals")
+                df = panel.series(commodity_id, market_id, start_date, end_date)
+            else:
+                df = panel.commodity_frame(commodity_id, start_date, end_date)
+            df = df[["modal_price", "arrivals"]]
 
-            if not prices:
+            if df.empty:
                 return {"error": "No price data available for analysis"}
 
-            # Convert to DataFrame
-            df = pd.DataFrame(prices)
-            df["date"] = pd.to_datetime(df["date"])
-            df = df.set_index("date")
+            # Indicators stored at ingest on the series' latest row
+            latest = None
+            if market_id:
+                latest = (
+                    MarketPrice.objects.filter(
+                        commodity_id=commodity_id,
+                        market_id=market_id,
+                        date=df.index[-1].date(),
+                    )
+                    .only(*INDICATOR_FIELDS)
+                    .first()
+                )
+                if latest is not None and latest.return_var is None:
+                    latest = None
 
             # Calculate trend metrics
             trend_analysis = {
@@ -47,8 +224,12 @@ class TrendAnalyzer:
                 },
                 "price_statistics": self._calculate_price_statistics(df),
                 "trend_direction": self._determine_trend_direction(df),
-                "volatility_analysis": self._analyze_volatility(df),
-                "momentum_indicators": self._calculate_momentum_indicators(df),
+                "volatility_analysis": self._analyze_volatility(df, latest),
+                "momentum_indicators": (
+                    self._stored_momentum_indicators(latest)
+                    if latest
+                    else self._calculate_momentum_indicators(df)
+                ),
                 "support_resistance": self._identify_support_resistance(df),
                 "pattern_recognition": self._recognize_patterns(df),
                 "volume_analysis": (
@@ -58,8 +239,9 @@ class TrendAnalyzer:
             }
 
             # Save trend to database
+            trend_analysis = _jsonable(trend_analysis)
             self._save_trend_analysis(
-                commodity_id, market_id, start_date, end_date, trend_analysis
+                commodity_id, market_id, start_date, end_date, trend_analysis, watermark
             )
 
             return trend_analysis
@@ -76,21 +258,23 @@ class TrendAnalyzer:
             if date is None:
                 date = datetime.now().date()
 
-            # Get prices from all markets
-            market_data = []
+            # Prices and their markets from one query, in the requested order
+            prices = {
+                price.market_id: price
+                for price in MarketPrice.objects.filter(
+                    commodity_id=commodity_id, market_id__in=market_ids, date=date
+                ).select_related("market")
+            }
 
+            market_data = []
             for market_id in market_ids:
-                price = MarketPrice.objects.filter(
-                    commodity_id=commodity_id, market_id=market_id, date=date
-                ).first()
-
+                price = prices.get(market_id)
                 if price:
-                    market = Market.objects.get(id=market_id)
                     market_data.append(
                         {
                             "market_id": market_id,
-                            "market_name": market.name,
-                            "location": f"{market.district}, {market.state}",
+                            "market_name": price.market.name,
+                            "location": f"{price.market.district}, {price.market.state}",
                             "modal_price": float(price.modal_price),
                             "min_price": float(price.min_price),
                             "max_price": float(price.max_price),
@@ -133,23 +317,204 @@ class TrendAnalyzer:
             logger.error(f"Error comparing markets: {e}")
             return {"error": str(e)}
 
+    def compare_markets_matrix(
+        self,
+        commodity_ids: List[int],
+        market_ids: List[int],
+        start_date: datetime.date = None,
+        end_date: datetime.date = None,
+    ) -> Dict:
+        """Compare many commodities across many markets over a date range.
+
+        Average modal prices come from one grouped query and form a
+        commodity x market matrix (None where a market has no price).
+        Statistics and arbitrage are computed per commodity row.
+        """
+        try:
+            if end_date is None:
+                end_date = datetime.now().date()
+            if start_date is None:
+                start_date = end_date - timedelta(days=MATRIX_DEFAULT_DAYS)
+
+            rows = list(
+                MarketPrice.objects.filter(
+                    commodity_id__in=commodity_ids,
+                    market_id__in=market_ids,
+                    date__range=[start_date, end_date],
+                )
+                .values("commodity_id", "commodity__name", "market_id", "market__name")
+                .annotate(average=Avg("modal_price"), observations=Count("id"))
+                .order_by()
+            )
+
+            if not rows:
+                return {"error": "No price data available for comparison"}
+
+            # Keep the requested order of both axes, dropping empty ones
+            names = {}
+            for row in rows:
+                names[("commodity", row["commodity_id"])] = row["commodity__name"]
+                names[("market", row["market_id"])] = row["market__name"]
+            commodities = [
+                c for c in dict.fromkeys(commodity_ids) if ("commodity", c) in names
+            ]
+            markets = [m for m in dict.fromkeys(market_ids) if ("market", m) in names]
+            commodity_pos = {c: i for i, c in enumerate(commodities)}
+            market_pos = {m: j for j, m in enumerate(markets)}
+
+            prices = np.full((len(commodities), len(markets)), np.nan)
+            observations = np.zeros(prices.shape, dtype=np.int64)
+            i = [commodity_pos[row["commodity_id"]] for row in rows]
+            j = [market_pos[row["market_id"]] for row in rows]
+            prices[i, j] = [float(row["average"]) for row in rows]
+            observations[i, j] = [row["observations"] for row in rows]
+
+            quoted = ~np.isnan(prices)
+            market_count = quoted.sum(axis=1)
+            filled_low = np.where(quoted, prices, np.inf)
+            filled_high = np.where(quoted, prices, -np.inf)
+            cheapest, dearest = filled_low.argmin(axis=1), filled_high.argmax(axis=1)
+            low, high = filled_low.min(axis=1), filled_high.max(axis=1)
+            mean = np.nanmean(prices, axis=1)
+            std = np.nanstd(prices, axis=1)
+            spread = high - low
+            with np.errstate(divide="ignore", invalid="ignore"):
+                spread_percent = np.where(low > 0, spread / low * 100, 0.0)
+                cv = np.where(mean > 0, std / mean * 100, 0.0)
+                # Each market's price relative to the commodity's average
+                relative = prices / mean[:, None] * 100
+            arbitrage = (market_count > 1) & (spread > low * ARBITRAGE_THRESHOLD)
+
+            def column(values: np.ndarray, digits: int = 2) -> List:
+                return [round(float(v), digits) for v in values]
+
+            return {
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "commodities": [
+                    {"id": c, "name": names[("commodity", c)]} for c in commodities
+                ],
+                "markets": [{"id": m, "name": names[("market", m)]} for m in markets],
+                "prices": [
+                    [round(float(v), 2) if ok else None for v, ok in zip(row, has)]
+                    for row, has in zip(prices, quoted)
+                ],
+                "observations": observations.tolist(),
+                "statistics": {
+                    "average_price": column(mean),
+                    "min_price": column(low),
+                    "max_price": column(high),
+                    "price_range": column(spread),
+                    "spread_percent": column(spread_percent),
+                    "std_deviation": column(std),
+                    "coefficient_variation": column(cv),
+                    "market_count": market_count.tolist(),
+                },
+                "market_price_index": column(np.nanmean(relative, axis=0)),
+                "arbitrage": [
+                    (
+                        {
+                            "exists": True,
+                            "buy_from": markets[buy],
+                            "buy_price": round(float(low[k]), 2),
+                            "sell_to": markets[sell],
+                            "sell_price": round(float(high[k]), 2),
+                            "potential_profit": round(float(spread[k]), 2),
+                            "profit_percentage": round(float(spread_percent[k]), 2),
+                        }
+                        if arbitrage[k]
+                        else {"exists": False}
+                    )
+                    for k, (buy, sell) in enumerate(zip(cheapest, dearest))
+                ],
+            }
+
+        except Exception as e:
+            logger.error(f"Error comparing market matrix: {e}")
+            return {"error": str(e)}
+
+    def recognize_patterns_batch(
+        self,
+        commodity_id: Optional[int] = None,
+        days: int = 90,
+        market_ids: Optional[List[int]] = None,
+    ) -> Dict:
+        """Recognize price patterns for many series of the price panel at once.
+
+        Each (market, commodity) series is one row of a right-aligned price
+        matrix, so every detector runs once over all series. Results match
+        pattern_recognition of analyze_commodity_trend for each series.
+        """
+        try:
+            end_date = datetime.now().date()
+            start_date = end_date - timedelta(days=days)
+            panel = get_price_panel()
+
+            markets = None if market_ids is None else set(market_ids)
+            pairs = [
+                (row, market_id, pair_commodity)
+                for row, (market_id, pair_commodity) in enumerate(panel.pairs)
+                if (commodity_id is None or pair_commodity == commodity_id)
+                and (markets is None or market_id in markets)
+            ]
+            first = min(max((start_date - panel.start).days, 0), panel.days)
+            stop = min(max((end_date - panel.start).days + 1, first), panel.days)
+
+            rows = np.array([row for row, _, _ in pairs], dtype=np.int64)
+            prices = _right_aligned(
+                np.asarray(
+                    panel.values[rows, first:stop, FIELD_INDEX["modal_price"]],
+                    dtype=np.float64,
+                ).reshape(len(rows), stop - first)
+            )
+            counts = (~np.isnan(prices)).sum(axis=1)
+            enough = counts >= PATTERN_MIN_PRICES
+            pairs = [pair for pair, keep in zip(pairs, enough) if keep]
+            prices = prices[enough][:, -int(counts.max(initial=0)) :]
+
+            detected = [
+                np.where(_head_and_shoulders(prices), "head_and_shoulders", None),
+                _double_patterns(prices),
+                _triangle_patterns(prices),
+            ]
+
+            return {
+                "period": {
+                    "start": start_date.isoformat(),
+                    "end": end_date.isoformat(),
+                    "days": days,
+                },
+                "series_analyzed": len(pairs),
+                "series_skipped": int((~enough).sum()),
+                "series": [
+                    {
+                        "commodity_id": pair_commodity,
+                        "market_id": market_id,
+                        "patterns": [
+                            _pattern(names[i]) for names in detected if names[i]
+                        ],
+                    }
+                    for i, (_, market_id, pair_commodity) in enumerate(pairs)
+                ],
+            }
+
+        except Exception as e:
+            logger.error(f"Error recognizing price patterns: {e}")
+            return {"error": str(e)}
+
     def analyze_seasonal_trends(self, commodity_id: int, years: int = 2) -> Dict:
         """Analyze seasonal price trends"""
         try:
             end_date = datetime.now().date()
             start_date = end_date - timedelta(days=years * 365)
 
-            # Get historical prices
-            prices = MarketPrice.objects.filter(
-                commodity_id=commodity_id, date__range=[start_date, end_date]
-            ).values("date", "modal_price")
+            # Get historical prices from the shared panel
+            df = get_price_panel().commodity_frame(commodity_id, start_date, end_date)
 
-            if not prices:
+            if df.empty:
                 return {"error": "Insufficient historical data for seasonal analysis"}
 
-            # Convert to DataFrame
-            df = pd.DataFrame(prices)
-            df["date"] = pd.to_datetime(df["date"])
+            df = df[["modal_price"]].reset_index()
             df["month"] = df["date"].dt.month
             df["year"] = df["date"].dt.year
             df["quarter"] = df["date"].dt.quarter
@@ -196,12 +561,15 @@ class TrendAnalyzer:
         try:
             lat, lon = user_location
 
-            # Find nearby markets (simplified - would use proper geospatial query)
-            nearby_markets = Market.objects.filter(
-                latitude__range=[lat - 1, lat + 1],
-                longitude__range=[lon - 1, lon + 1],
-                is_active=True,
-            )[:10]
+            # Nearest active markets, with their distances, from the market index
+            nearby_markets = dict(
+                get_market_index().nearest(
+                    lat,
+                    lon,
+                    k=OPPORTUNITY_MARKETS,
+                    max_distance_km=OPPORTUNITY_RADIUS_KM,
+                )
+            )
 
             if not nearby_markets:
                 return {"error": "No markets found in your area"}
@@ -210,7 +578,9 @@ class TrendAnalyzer:
             today = datetime.now().date()
             opportunities = []
 
-            query = MarketPrice.objects.filter(market__in=nearby_markets, date=today)
+            query = MarketPrice.objects.filter(
+                market_id__in=list(nearby_markets), date=today
+            )
 
             if commodity_ids:
                 query = query.filter(commodity_id__in=commodity_ids)
@@ -231,9 +601,7 @@ class TrendAnalyzer:
                         "market": price.market.name,
                         "price": float(price.modal_price),
                         "trend": price.price_trend,
-                        "distance": self._calculate_distance(
-                            lat, lon, price.market.latitude, price.market.longitude
-                        ),
+                        "distance": nearby_markets[price.market_id],
                     }
                 )
 
@@ -336,17 +704,22 @@ class TrendAnalyzer:
             "ma_crossover": "bullish" if ma_short[-1] > ma_long[-1] else "bearish",
         }
 
-    def _analyze_volatility(self, df: pd.DataFrame) -> Dict:
+    def _analyze_volatility(
+        self, df: pd.DataFrame, latest: Optional[MarketPrice] = None
+    ) -> Dict:
         """Analyze price volatility"""
         prices = df["modal_price"].values
         returns = pd.Series(prices).pct_change().dropna()
 
+        # Exponentially weighted deviation stored at ingest, when available
+        volatility = np.sqrt(latest.return_var) if latest else returns.std()
+
         return {
-            "daily_volatility": float(returns.std()),
-            "annualized_volatility": float(returns.std() * np.sqrt(252)),
+            "daily_volatility": float(volatility),
+            "annualized_volatility": float(volatility * np.sqrt(252)),
             "max_daily_change": float(returns.max()),
             "min_daily_change": float(returns.min()),
-            "volatility_classification": self._classify_volatility(returns.std()),
+            "volatility_classification": self._classify_volatility(volatility),
         }
 
     def _classify_volatility(self, volatility: float) -> str:
@@ -393,6 +766,21 @@ class TrendAnalyzer:
             ),
         }
 
+    def _stored_momentum_indicators(self, latest: MarketPrice) -> Dict:
+        """Momentum indicators from the EMAs and RSI averages stored at ingest"""
+        rsi = stored_rsi(latest)
+        macd = latest.ema_12 - latest.ema_26
+
+        return {
+            "rsi": rsi,
+            "rsi_signal": (
+                "overbought" if rsi > 70 else "oversold" if rsi < 30 else "neutral"
+            ),
+            "macd": float(macd),
+            "macd_signal": float(latest.macd_signal),
+            "macd_crossover": "bullish" if macd > latest.macd_signal else "bearish",
+        }
+
     def _identify_support_resistance(self, df: pd.DataFrame) -> Dict:
         """Identify support and resistance levels"""
         prices = df["modal_price"].values
@@ -400,18 +788,11 @@ class TrendAnalyzer:
         if len(prices) < 10:
             return {"support": None, "resistance": None}
 
-        # Find local minima and maxima
-        from scipy.signal import argrelextrema
-
-        # Support levels (local minima)
-        support_indices = argrelextrema(prices, np.less, order=5)[0]
-        support_levels = prices[support_indices] if len(support_indices) > 0 else []
-
-        # Resistance levels (local maxima)
-        resistance_indices = argrelextrema(prices, np.greater, order=5)[0]
-        resistance_levels = (
-            prices[resistance_indices] if len(resistance_indices) > 0 else []
-        )
+        # Support levels (local minima) and resistance levels (local maxima)
+        support_levels = prices[
+            _local_extrema(prices, EXTREMA_ORDER, greater=False, clip=True)
+        ]
+        resistance_levels = prices[_local_extrema(prices, EXTREMA_ORDER, clip=True)]
 
         current_price = prices[-1]
 
@@ -435,16 +816,14 @@ class TrendAnalyzer:
         """Recognize common price patterns"""
         prices = df["modal_price"].values
 
-        if len(prices) < 20:
+        if len(prices) < PATTERN_MIN_PRICES:
             return {"patterns": []}
 
         patterns = []
 
         # Head and Shoulders
         if self._detect_head_and_shoulders(prices):
-            patterns.append(
-                {"name": "head_and_shoulders", "type": "reversal", "signal": "bearish"}
-            )
+            patterns.append(_pattern("head_and_shoulders"))
 
         # Double Top/Bottom
         double_pattern = self._detect_double_pattern(prices)
@@ -460,87 +839,28 @@ class TrendAnalyzer:
 
     def _detect_head_and_shoulders(self, prices: np.ndarray) -> bool:
         """Detect head and shoulders pattern"""
-        if len(prices) < 20:
+        if len(prices) < PATTERN_MIN_PRICES:
             return False
 
-        # Simplified detection - look for three peaks with middle one highest
-        window = 5
-        peaks = []
-
-        for i in range(window, len(prices) - window):
-            if all(prices[i] > prices[i - j] for j in range(1, window + 1)) and all(
-                prices[i] > prices[i + j] for j in range(1, window + 1)
-            ):
-                peaks.append(i)
-
-        if len(peaks) >= 3:
-            # Check if middle peak is highest
-            peak_values = [prices[p] for p in peaks[-3:]]
-            if peak_values[1] > peak_values[0] and peak_values[1] > peak_values[2]:
-                return True
-
-        return False
+        # Three peaks with the middle one highest
+        return bool(_head_and_shoulders(np.asarray(prices, dtype=np.float64)[None])[0])
 
     def _detect_double_pattern(self, prices: np.ndarray) -> Optional[Dict]:
         """Detect double top or double bottom pattern"""
-        if len(prices) < 15:
+        if len(prices) < DOUBLE_PATTERN_WINDOW:
             return None
 
-        # Find recent peaks and troughs
-        recent = prices[-15:]
-        max_price = np.max(recent)
-        min_price = np.min(recent)
-
-        # Count occurrences near max/min
-        tolerance = (max_price - min_price) * 0.02
-
-        tops = np.sum(np.abs(recent - max_price) < tolerance)
-        bottoms = np.sum(np.abs(recent - min_price) < tolerance)
-
-        if tops >= 2:
-            return {"name": "double_top", "type": "reversal", "signal": "bearish"}
-        elif bottoms >= 2:
-            return {"name": "double_bottom", "type": "reversal", "signal": "bullish"}
-
-        return None
+        name = _double_patterns(np.asarray(prices, dtype=np.float64)[None])[0]
+        return _pattern(name) if name else None
 
     def _detect_triangle_pattern(self, prices: np.ndarray) -> Optional[Dict]:
         """Detect triangle patterns"""
-        if len(prices) < 20:
-            return None
-
-        # Calculate highs and lows over rolling window
-        window = 5
-        highs = pd.Series(prices).rolling(window).max().dropna().values
-        lows = pd.Series(prices).rolling(window).min().dropna().values
-
-        if len(highs) < 10:
+        if len(prices) < PATTERN_MIN_PRICES:
             return None
 
-        # Check for converging highs and lows
-        high_slope = np.polyfit(range(len(highs)), highs, 1)[0]
-        low_slope = np.polyfit(range(len(lows)), lows, 1)[0]
-
-        if abs(high_slope) < 0.1 and low_slope > 0.1:
-            return {
-                "name": "ascending_triangle",
-                "type": "continuation",
-                "signal": "bullish",
-            }
-        elif high_slope < -0.1 and abs(low_slope) < 0.1:
-            return {
-                "name": "descending_triangle",
-                "type": "continuation",
-                "signal": "bearish",
-            }
-        elif high_slope < -0.1 and low_slope > 0.1:
-            return {
-                "name": "symmetrical_triangle",
-                "type": "continuation",
-                "signal": "neutral",
-            }
-
-        return None
+        # Converging highs and lows over a rolling window
+        name = _triangle_patterns(np.asarray(prices, dtype=np.float64)[None])[0]
+        return _pattern(name) if name else None
 
     def _analyze_volume(self, df: pd.DataFrame) -> Dict:
         """Analyze trading volume (arrivals)"""
@@ -621,12 +941,10 @@ class TrendAnalyzer:
         start_date: datetime.date,
         end_date: datetime.date,
         analysis: Dict,
+        watermark: Optional[datetime] = None,
     ):
         """Save trend analysis to database"""
         try:
-            commodity = Commodity.objects.get(id=commodity_id)
-            market = Market.objects.get(id=market_id) if market_id else None
-
             trend_direction = analysis["trend_direction"]["direction"]
             if trend_direction == "bullish":
                 trend_type = "bullish"
@@ -638,8 +956,8 @@ class TrendAnalyzer:
                 trend_type = "volatile"
 
             MarketTrend.objects.update_or_create(
-                commodity=commodity,
-                market=market,
+                commodity_id=commodity_id,
+                market_id=market_id or None,
                 period_start=start_date,
                 period_end=end_date,
                 defaults={
@@ -656,6 +974,8 @@ class TrendAnalyzer:
                         analysis["trend_direction"],
                         analysis["momentum_indicators"],
                     ],
+                    "analysis": analysis,
+                    "data_watermark": watermark,
                 },
             )
         except Exception as e:
@@ -695,7 +1015,7 @@ class TrendAnalyzer:
         price_diff = max_price - min_price
 
         # Simple arbitrage check (would need transport costs in real scenario)
-        if price_diff > (min_price * 0.1):  # 10% difference
+        if price_diff > (min_price * ARBITRAGE_THRESHOLD):
             buy_market = min(market_data, key=lambda x: x["modal_price"])
             sell_market = max(market_data, key=lambda x: x["modal_price"])
 
@@ -760,26 +1080,6 @@ class TrendAnalyzer:
 
         return recommendations
 
-    def _calculate_distance(
-        self, lat1: float, lon1: float, lat2: float, lon2: float
-    ) -> float:
-        """Calculate distance between two points (simplified)"""
-        # Haversine formula (simplified)
-        R = 6371  # Earth's radius in km
-
-        dlat = np.radians(lat2 - lat1)
-        dlon = np.radians(lon2 - lon1)
-
-        a = (
-            np.sin(dlat / 2) ** 2
-            + np.cos(np.radians(lat1))
-            * np.cos(np.radians(lat2))
-            * np.sin(dlon / 2) ** 2
-        )
-        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-
-        return R * c
-
     def _calculate_opportunity_score(self, opportunity: Dict) -> float:
         """Calculate opportunity score"""
         score = 0
@@ -0,0 +1,173 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, Optional, Tuple
+from django.db.models import Count, Max
+from django.utils import timezone
+from .models import MarketTrend, PriceWatermark
+from .trend_analyzer import TrendAnalyzer
+
+logger = logging.getLogger(__name__)
+
+# Watermark of a series whose prices have not changed since watermarks existed
+WATERMARK_ORIGIN = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+REFRESH_LOOKBACK_DAYS = 7  # Trends requested this recently are kept fresh
+
+
+def bump_watermarks(pairs: Iterable[Tuple[int, int]], create: bool = True):
+    """Record a price change for (market_id, commodity_id) pairs.
+
+    Upserts all pairs in one statement. With create=False only existing
+    watermarks move, for deletes that may be part of a cascade removing the
+    market or commodity itself.
+    """
+    now = timezone.now()
+    pairs = set(pairs)
+    if not pairs:
+        return
+
+    if create:
+        PriceWatermark.objects.bulk_create(
+            [
+                PriceWatermark(
+                    market_id=market_id, commodity_id=commodity_id, changed_at=now
+                )
+                for market_id, commodity_id in pairs
+            ],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["commodity", "market"],
+            update_fields=["changed_at"],
+        )
+    else:
+        for market_id, commodity_id in pairs:
+            PriceWatermark.objects.filter(
+                market_id=market_id, commodity_id=commodity_id
+            ).update(changed_at=now)
+
+
+def current_watermark(commodity_id: int, market_id: Optional[int] = None) -> datetime:
+    """Latest price change of a series, or of every market of a commodity"""
+    watermarks = PriceWatermark.objects.filter(commodity_id=commodity_id)
+    if market_id:
+        watermarks = watermarks.filter(market_id=market_id)
+    latest = watermarks.aggregate(latest=Max("changed_at"))["latest"]
+    return latest or WATERMARK_ORIGIN
+
+
+def prices_watermark() -> Tuple[datetime, int]:
+    """Latest price change of any series, with the number of watermarked series.
+
+    The count moves when a market or commodity delete cascades to its
+    watermarks, which leaves the latest change as it was.
+    """
+    latest = PriceWatermark.objects.aggregate(
+        latest=Max("changed_at"), series=Count("id")
+    )
+    return latest["latest"] or WATERMARK_ORIGIN, latest["series"]
+
+
+class TrendStore:
+    """Materialized MarketTrend analyses, recomputed only when prices change.
+
+    A stored analysis is fresh while its data_watermark is at least the
+    watermark of its prices, which ingest bumps per (commodity, market).
+    Windows end today, so a new day also calls for a new analysis.
+    """
+
+    def __init__(self, analyzer: Optional[TrendAnalyzer] = None):
+        self.analyzer = analyzer or TrendAnalyzer()
+
+    def get(
+        self, commodity_id: int, days: int = 30, market_id: Optional[int] = None
+    ) -> Dict:
+        """Stored analysis when fresh, else a newly computed and stored one"""
+        end_date = datetime.now().date()
+        # Read before the prices, so a concurrent change leaves the result stale
+        watermark = current_watermark(commodity_id, market_id)
+
+        trend = (
+            MarketTrend.objects.filter(
+                commodity_id=commodity_id,
+                market_id=market_id or None,
+                period_start=end_date - timedelta(days=days),
+                period_end=end_date,
+            )
+            .only("analysis", "data_watermark")
+            .first()
+        )
+        if (
+            trend is not None
+            and trend.analysis
+            and trend.data_watermark is not None
+            and trend.data_watermark >= watermark
+        ):
+            return trend.analysis
+
+        return self.analyzer.analyze_commodity_trend(
+            commodity_id, days, market_id, watermark=watermark
+        )
+
+    def refresh_stale(self) -> Dict:
+        """Recompute recently requested trends whose prices or window changed"""
+        started = time.perf_counter()
+        today = datetime.now().date()
+
+        watermarks, commodity_watermarks = {}, {}
+        for commodity_id, market_id, changed_at in PriceWatermark.objects.values_list(
+            "commodity_id", "market_id", "changed_at"
+        ):
+            watermarks[(commodity_id, market_id)] = changed_at
+            if changed_at > commodity_watermarks.get(commodity_id, WATERMARK_ORIGIN):
+                commodity_watermarks[commodity_id] = changed_at
+
+        # Latest state of each (commodity, market, days) requested recently
+        requested = {}
+        for commodity_id, market_id, start, end, data_watermark in (
+            MarketTrend.objects.filter(
+                period_end__gte=today - timedelta(days=REFRESH_LOOKBACK_DAYS)
+            )
+            .order_by("period_end")
+            .values_list(
+                "commodity_id",
+                "market_id",
+                "period_start",
+                "period_end",
+                "data_watermark",
+            )
+        ):
+            requested[(commodity_id, market_id, (end - start).days)] = (
+                end,
+                data_watermark,
+            )
+
+        refreshed, failed = 0, 0
+        for (commodity_id, market_id, days), (end, data_watermark) in requested.items():
+            if market_id is None:
+                watermark = commodity_watermarks.get(commodity_id, WATERMARK_ORIGIN)
+            else:
+                watermark = watermarks.get((commodity_id, market_id), WATERMARK_ORIGIN)
+            if (
+                end == today
+                and data_watermark is not None
+                and data_watermark >= watermark
+            ):
+                continue
+
+            result = self.analyzer.analyze_commodity_trend(
+                commodity_id, days, market_id, watermark=watermark
+            )
+            if "error" in result:
+                failed += 1
+            else:
+                refreshed += 1
+
+        summary = {
+            "checked": len(requested),
+            "refreshed": refreshed,
+            "failed": failed,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+        logger.info(f"Refreshed {refreshed}/{len(requested)} market trends")
+        return summary
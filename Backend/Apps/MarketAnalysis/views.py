@@ -24,9 +24,16 @@ from .serializers import (
     MarketAlertSerializer,
     PriceAnalysisSerializer,
     MarketComparisonSerializer,
+    MarketMatrixSerializer,
 )
-from .price_predictor import PricePredictor
+from .price_alerts import ALERT_FIELDS, AlertSet, PriceAlertEngine
+from .market_dashboard import dashboard_snapshot
+from .price_ingest import MarketPriceIngestor
+from .price_predictor import PricePredictor, FORECAST_MODES, DIRECT_HORIZON
+from .market_index import get_market_index
+from .model_store import get_model_store
 from .trend_analyzer import TrendAnalyzer
+from .trend_store import TrendStore
 import logging
 
 logger = logging.getLogger(__name__)
@@ -96,23 +103,34 @@ class MarketViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Simplified distance calculation
-        # In production, use proper geospatial queries
-        nearby_markets = []
-        for market in Market.objects.filter(is_active=True):
-            distance = (
-                (market.latitude - lat) ** 2 + (market.longitude - lon) ** 2
-            ) ** 0.5 * 111  # Rough km conversion
-            if distance <= radius:
-                nearby_markets.append(
-                    {
-                        "market": MarketSerializer(market).data,
-                        "distance": round(distance, 2),
-                    }
+        limit = request.query_params.get("limit") or None
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 0
+            if limit < 1:
+                return Response(
+                    {"error": "limit must be a positive integer"},
+                    status=status.HTTP_400_BAD_REQUEST,
                 )
 
-        # Sort by distance
-        nearby_markets.sort(key=lambda x: x["distance"])
+        # k nearest within the radius when a limit is given, else all of them
+        index = get_market_index()
+        if limit is not None:
+            matches = index.nearest(lat, lon, k=limit, max_distance_km=radius)
+        else:
+            matches = index.within_radius(lat, lon, radius)
+
+        markets = Market.objects.in_bulk([market_id for market_id, _ in matches])
+        nearby_markets = [
+            {
+                "market": MarketSerializer(markets[market_id]).data,
+                "distance": round(distance, 2),
+            }
+            for market_id, distance in matches
+            if market_id in markets
+        ]
 
         return Response(
             {
@@ -272,37 +290,41 @@ class MarketPriceViewSet(viewsets.ModelViewSet):
     def bulk_upload(self, request):
         """Bulk upload price data"""
         price_data = request.data.get("prices", [])
-        created_count = 0
-        updated_count = 0
-        errors = []
 
-        for data in price_data:
-            try:
-                market_price, created = MarketPrice.objects.update_or_create(
-                    market_id=data["market_id"],
-                    commodity_id=data["commodity_id"],
-                    date=data["date"],
-                    defaults={
-                        "min_price": data["min_price"],
-                        "max_price": data["max_price"],
-                        "modal_price": data["modal_price"],
-                        "arrivals": data.get("arrivals"),
-                        "price_trend": data.get("price_trend", "stable"),
-                    },
-                )
-
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
+        ingestor = MarketPriceIngestor(source="bulk_upload")
+        result = ingestor.ingest_records(
+            (row, data if isinstance(data, dict) else None)
+            for row, data in enumerate(price_data, start=1)
+        )
 
-            except Exception as e:
-                errors.append({"data": data, "error": str(e)})
+        errors = [
+            {"data": price_data[error["row"] - 1], "errors": error["errors"]}
+            for error in result["errors"]
+        ]
 
         return Response(
-            {"created": created_count, "updated": updated_count, "errors": errors}
+            {
+                "created": result["created"],
+                "updated": result["updated"],
+                "errors": errors,
+                "rows_per_second": result["rows_per_second"],
+            }
         )
 
+    @action(detail=False, methods=["post"])
+    def ingest(self, request):
+        """Stream CSV price data in batches"""
+        if "csv" not in (request.content_type or ""):
+            return Response(
+                {"error": "Content-Type must be text/csv"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+
+        ingestor = MarketPriceIngestor(source=request.query_params.get("source", "csv"))
+        result = ingestor.ingest_stream(request.stream or [])
+
+        return Response(result)
+
 
 class PricePredictionViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for price predictions"""
@@ -336,6 +358,7 @@ class PricePredictionViewSet(viewsets.ReadOnlyModelViewSet):
         commodity_id = request.data.get("commodity_id")
         market_id = request.data.get("market_id")
         days_ahead = request.data.get("days_ahead", 7)
+        mode = request.data.get("mode", "recursive")
 
         if not commodity_id or not market_id:
             return Response(
@@ -343,8 +366,23 @@ class PricePredictionViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if mode not in FORECAST_MODES:
+            return Response(
+                {"error": f"mode must be one of {FORECAST_MODES}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Serve the nightly batch forecast, computing on demand only on a miss
         predictor = PricePredictor()
-        prediction_result = predictor.predict_price(commodity_id, market_id, days_ahead)
+        prediction_result = None
+        if request.data.get("refresh") not in (True, "true"):
+            prediction_result = predictor.precomputed(
+                commodity_id, market_id, days_ahead, mode
+            )
+        if prediction_result is None:
+            prediction_result = predictor.predict_price(
+                commodity_id, market_id, days_ahead, mode
+            )
 
         return Response(prediction_result)
 
@@ -353,6 +391,8 @@ class PricePredictionViewSet(viewsets.ReadOnlyModelViewSet):
         """Train prediction model"""
         commodity_id = request.data.get("commodity_id")
         market_id = request.data.get("market_id")
+        mode = request.data.get("mode", "recursive")
+        horizon = int(request.data.get("horizon", DIRECT_HORIZON))
 
         if not commodity_id:
             return Response(
@@ -360,11 +400,29 @@ class PricePredictionViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if mode not in FORECAST_MODES:
+            return Response(
+                {"error": f"mode must be one of {FORECAST_MODES}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         predictor = PricePredictor()
-        training_result = predictor.train_model(commodity_id, market_id)
+        training_result = predictor.train_model(commodity_id, market_id, mode, horizon)
 
         return Response(training_result)
 
+    @action(detail=False, methods=["get"])
+    def models(self, request):
+        """List trained price models with their training metadata"""
+        store = get_model_store()
+        entries = store.metadata()
+
+        commodity_id = request.query_params.get("commodity")
+        if commodity_id:
+            entries = [e for e in entries if str(e["commodity_id"]) == commodity_id]
+
+        return Response({"models": entries, "cache": store.cache_info()})
+
 
 class MarketTrendViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for market trends"""
@@ -383,10 +441,8 @@ class MarketTrendViewSet(viewsets.ReadOnlyModelViewSet):
             market_id = serializer.validated_data.get("market_id")
             days = serializer.validated_data["days"]
 
-            analyzer = TrendAnalyzer()
-            trend_analysis = analyzer.analyze_commodity_trend(
-                commodity_id, days, market_id
-            )
+            # Stored analysis unless prices changed since it was computed
+            trend_analysis = TrendStore().get(commodity_id, days, market_id)
 
             return Response(trend_analysis)
 
@@ -394,7 +450,21 @@ class MarketTrendViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=["post"])
     def compare_markets(self, request):
-        """Compare markets for a commodity"""
+        """Compare markets for a commodity, or for many commodities as a matrix"""
+        if "commodity_ids" in request.data:
+            serializer = MarketMatrixSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            analyzer = TrendAnalyzer()
+            matrix = analyzer.compare_markets_matrix(
+                serializer.validated_data["commodity_ids"],
+                serializer.validated_data["market_ids"],
+                serializer.validated_data.get("start_date"),
+                serializer.validated_data.get("end_date"),
+            )
+            return Response(matrix)
+
         serializer = MarketComparisonSerializer(data=request.data)
 
         if serializer.is_valid():
@@ -409,6 +479,19 @@ class MarketTrendViewSet(viewsets.ReadOnlyModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=["get"])
+    def patterns(self, request):
+        """Recognize price patterns for every series of a commodity, or all"""
+        commodity_id = request.query_params.get("commodity")
+        days = int(request.query_params.get("days", 90))
+
+        analyzer = TrendAnalyzer()
+        patterns = analyzer.recognize_patterns_batch(
+            int(commodity_id) if commodity_id else None, days
+        )
+
+        return Response(patterns)
+
     @action(detail=False, methods=["get"])
     def seasonal_analysis(self, request):
         """Analyze seasonal trends"""
@@ -535,67 +618,18 @@ class MarketAlertViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["get"])
     def check_triggers(self, request):
-        """Check if any alerts should be triggered"""
-        active_alerts = self.get_queryset().filter(is_active=True)
-        triggered_alerts = []
-
-        for alert in active_alerts:
-            # Get latest price
-            latest_price = (
-                MarketPrice.objects.filter(
-                    commodity=alert.commodity,
-                    market=alert.market if alert.market else None,
-                )
-                .order_by("-date")
-                .first()
-            )
-
-            if latest_price:
-                should_trigger = False
-
-                if alert.alert_type == "price_above":
-                    should_trigger = latest_price.modal_price > alert.threshold_value
-                elif alert.alert_type == "price_below":
-                    should_trigger = latest_price.modal_price < alert.threshold_value
-                elif alert.alert_type == "price_change":
-                    # Check percentage change from previous day
-                    prev_price = (
-                        MarketPrice.objects.filter(
-                            commodity=alert.commodity,
-                            market=alert.market if alert.market else None,
-                            date__lt=latest_price.date,
-                        )
-                        .order_by("-date")
-                        .first()
-                    )
-
-                    if prev_price:
-                        change_percent = abs(
-                            (latest_price.modal_price - prev_price.modal_price)
-                            / prev_price.modal_price
-                            * 100
-                        )
-                        should_trigger = change_percent > float(alert.threshold_value)
-
-                if should_trigger:
-                    alert.last_triggered = timezone.now()
-                    alert.trigger_count += 1
-                    alert.save()
+        """Check which alerts the latest prices satisfy.
 
-                    triggered_alerts.append(
-                        {
-                            "alert_id": alert.id,
-                            "commodity": alert.commodity.name,
-                            "alert_type": alert.alert_type,
-                            "threshold": alert.threshold_value,
-                            "current_price": latest_price.modal_price,
-                            "message": f"Alert triggered for {alert.commodity.name}",
-                        }
-                    )
+        Alerts are triggered and notified by PriceAlertEngine as prices are
+        ingested; this only reports their current state.
+        """
+        active_alerts = self.get_queryset().filter(is_active=True)
+        alerts = AlertSet(list(active_alerts.values_list(*ALERT_FIELDS)))
+        triggered_alerts = PriceAlertEngine().check(alerts) if len(alerts) else []
 
         return Response(
             {
-                "alerts_checked": active_alerts.count(),
+                "alerts_checked": len(alerts),
                 "alerts_triggered": len(triggered_alerts),
                 "triggered": triggered_alerts,
             }
@@ -610,6 +644,7 @@ class MarketAnalysisViewSet(viewsets.ViewSet):
     def list(self, request):
         """Main market analysis endpoint - provides overview of available analysis endpoints"""
         base_url = request.build_absolute_uri().rstrip('/')
+        market_summary = dashboard_snapshot()["market_summary"]
         
         analysis_data = {
             "market_analysis": "SmartCropAdvisory Market Analysis System",
@@ -645,10 +680,10 @@ class MarketAnalysisViewSet(viewsets.ViewSet):
                 "alerts": "/api/v1/market/alerts/"
             },
             "market_summary": {
-                "total_markets": Market.objects.count(),
-                "total_commodities": Commodity.objects.count(),
-                "active_markets": Market.objects.filter(is_active=True).count(),
-                "latest_price_updates": MarketPrice.objects.count()
+                "total_markets": market_summary["total_markets"],
+                "total_commodities": market_summary["total_commodities"],
+                "active_markets": market_summary["active_markets"],
+                "latest_price_updates": market_summary["total_price_records"]
             }
         }
         
@@ -702,77 +737,17 @@ class MarketAnalysisViewSet(viewsets.ViewSet):
             "version": "2.0.0"
         }
         
-        # Market Summary Statistics
-        dashboard_data["market_summary"] = {
-            "total_markets": Market.objects.count(),
-            "active_markets": Market.objects.filter(is_active=True).count(),
-            "total_commodities": Commodity.objects.count(),
-            "total_price_records": MarketPrice.objects.count(),
-            "latest_price_date": MarketPrice.objects.order_by("-date").values_list("date", flat=True).first()
-        }
-        
-        # Top Commodities by Activity
-        top_commodities = (
-            MarketPrice.objects.values("commodity__name", "commodity__category")
-            .annotate(
-                price_count=Count("id"),
-                avg_price=Avg("modal_price"),
-                latest_price=Max("modal_price")
-            )
-            .order_by("-price_count")[:10]
-        )
-        
-        dashboard_data["top_commodities"] = list(top_commodities)
-        
-        # Recent Price Trends (last 7 days)
-        seven_days_ago = timezone.now().date() - timedelta(days=7)
-        recent_prices = (
-            MarketPrice.objects.filter(date__gte=seven_days_ago)
-            .select_related("commodity", "market")
-            .order_by("-date")[:50]
-        )
-        
-        dashboard_data["recent_price_updates"] = [
-            {
-                "commodity": price.commodity.name,
-                "market": price.market.name,
-                "modal_price": float(price.modal_price),
-                "trend": price.price_trend,
-                "date": price.date.isoformat(),
-                "location": f"{price.market.district}, {price.market.state}"
-            }
-            for price in recent_prices
-        ]
-        
-        # Market Performance Metrics
-        dashboard_data["performance_metrics"] = {
-            "daily_updates": MarketPrice.objects.filter(
-                date=timezone.now().date()
-            ).count(),
-            "weekly_updates": MarketPrice.objects.filter(
-                date__gte=seven_days_ago
-            ).count(),
-            "trend_distribution": {
-                "rising": MarketPrice.objects.filter(price_trend="up").count(),
-                "falling": MarketPrice.objects.filter(price_trend="down").count(),
-                "stable": MarketPrice.objects.filter(price_trend="stable").count()
-            }
-        }
-        
-        # Price Volatility Analysis
-        price_stats = MarketPrice.objects.aggregate(
-            avg_modal=Avg("modal_price"),
-            min_modal=Min("modal_price"),
-            max_modal=Max("modal_price")
-        )
-        
-        dashboard_data["price_volatility"] = {
-            "average_price": round(float(price_stats["avg_modal"] or 0), 2),
-            "lowest_price": float(price_stats["min_modal"] or 0),
-            "highest_price": float(price_stats["max_modal"] or 0),
-            "price_range": float((price_stats["max_modal"] or 0) - (price_stats["min_modal"] or 0))
-        }
-        
+        # Market-wide aggregates, cached until prices change
+        snapshot = dashboard_snapshot()
+        for section in [
+            "market_summary",
+            "top_commodities",
+            "recent_price_updates",
+            "performance_metrics",
+            "price_volatility",
+        ]:
+            dashboard_data[section] = snapshot[section]
+
         # User-specific data (if authenticated)
         if hasattr(request, 'user') and request.user.is_authenticated:
             # Get user's recent commodities
@@ -5,3 +5,6 @@ class WeatherIntegrationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "Apps.WeatherIntegration"
     verbose_name = "Weather Integration"
+
+    def ready(self):
+        import Apps.WeatherIntegration.signals
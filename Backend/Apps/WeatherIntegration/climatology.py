@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+from django.conf import settings
+from django.utils import timezone
+from sklearn.neighbors import BallTree
+from Utils.spatial_index import EARTH_RADIUS_KM
+from .models import WeatherStation, WeatherData
+
+logger = logging.getLogger(__name__)
+
+# Period axis: 12 calendar months followed by 52 ISO weeks (week 53 folds into 52)
+MONTH_PERIODS = 12
+WEEK_PERIODS = 52
+PERIODS = MONTH_PERIODS + WEEK_PERIODS
+
+STATISTICS = [
+    "temperature_mean",
+    "temperature_std",
+    "temperature_p10",
+    "temperature_p50",
+    "temperature_p90",
+    "rainfall_daily_mean",
+    "rainfall_daily_p90",
+    "humidity_p10",
+    "humidity_p50",
+    "humidity_p90",
+]
+STAT_INDEX = {name: i for i, name in enumerate(STATISTICS)}
+
+DEFAULT_RESOLUTION_DEG = 0.5
+# Empty cells borrow normals from the nearest populated cell within this distance
+FILL_RADIUS_KM = 100.0
+
+
+def _normals_paths():
+    base = Path(settings.ML_MODELS_DIR)
+    return base / "climatology_normals.npy", base / "climatology_normals.json"
+
+
+def week_period(day: date) -> int:
+    """Period index of the ISO week containing day"""
+    return MONTH_PERIODS + min(day.isocalendar()[1], WEEK_PERIODS) - 1
+
+
+class ClimatologyBuilder:
+    """Build gridded monthly and weekly climate normals from WeatherData"""
+
+    def __init__(self, resolution: float = DEFAULT_RESOLUTION_DEG):
+        self.resolution = resolution
+
+    def build(self, years: int = 10) -> Dict:
+        """Aggregate observations into per-cell normals and write them to disk"""
+        stations = pd.DataFrame.from_records(
+            WeatherStation.objects.values_list("id", "latitude", "longitude"),
+            columns=["station_id", "latitude", "longitude"],
+        )
+        if stations.empty:
+            return {"error": "No weather stations available"}
+
+        since = timezone.now() - timedelta(days=365 * years)
+        observations = pd.DataFrame.from_records(
+            WeatherData.objects.filter(timestamp__gte=since)
+            .values_list(
+                "station_id", "timestamp", "temperature", "rainfall", "humidity"
+            )
+            .iterator(chunk_size=10000),
+            columns=["station_id", "timestamp", "temperature", "rainfall", "humidity"],
+        )
+        if observations.empty:
+            return {"error": "No weather observations available"}
+
+        # Observations -> one record per station and day
+        observations["day"] = pd.to_datetime(
+            observations["timestamp"], utc=True
+        ).dt.date
+        daily = (
+            observations.groupby(["station_id", "day"])
+            .agg(
+                temperature=("temperature", "mean"),
+                rainfall=("rainfall", "sum"),
+                humidity=("humidity", "mean"),
+            )
+            .reset_index()
+            .merge(stations, on="station_id")
+        )
+
+        # Grid covering every station
+        lat_min = (
+            np.floor(stations["latitude"].min() / self.resolution) * self.resolution
+        )
+        lon_min = (
+            np.floor(stations["longitude"].min() / self.resolution) * self.resolution
+        )
+        n_lat = int((stations["latitude"].max() - lat_min) // self.resolution) + 1
+        n_lon = int((stations["longitude"].max() - lon_min) // self.resolution) + 1
+
+        daily["row"] = ((daily["latitude"] - lat_min) // self.resolution).astype(int)
+        daily["col"] = ((daily["longitude"] - lon_min) // self.resolution).astype(int)
+        days = pd.to_datetime(daily["day"])
+        daily["month_period"] = days.dt.month - 1
+        daily["week_period"] = (
+            MONTH_PERIODS
+            + days.dt.isocalendar().week.clip(upper=WEEK_PERIODS).astype(int)
+            - 1
+        )
+
+        normals = np.full((n_lat, n_lon, PERIODS, len(STATISTICS)), np.nan, np.float32)
+        for period_column in ("month_period", "week_period"):
+            grouped = daily.groupby(["row", "col", period_column])
+            stats = grouped.agg(
+                temperature_mean=("temperature", "mean"),
+                temperature_std=("temperature", "std"),
+                temperature_p10=("temperature", lambda x: x.quantile(0.1)),
+                temperature_p50=("temperature", "median"),
+                temperature_p90=("temperature", lambda x: x.quantile(0.9)),
+                rainfall_daily_mean=("rainfall", "mean"),
+                rainfall_daily_p90=("rainfall", lambda x: x.quantile(0.9)),
+                humidity_p10=("humidity", lambda x: x.quantile(0.1)),
+                humidity_p50=("humidity", "median"),
+                humidity_p90=("humidity", lambda x: x.quantile(0.9)),
+            ).reset_index()
+
+            normals[
+                stats["row"].to_numpy(),
+                stats["col"].to_numpy(),
+                stats[period_column].to_numpy(),
+            ] = stats[STATISTICS].to_numpy(dtype=np.float32)
+
+        populated = self._fill_empty_cells(normals, lat_min, lon_min)
+
+        metadata = {
+            "lat_min": float(lat_min),
+            "lon_min": float(lon_min),
+            "resolution": self.resolution,
+            "shape": list(normals.shape),
+            "statistics": STATISTICS,
+            "stations": int(daily["station_id"].nunique()),
+            "days": int(len(daily)),
+            "populated_cells": populated,
+            "built_at": timezone.now().isoformat(),
+        }
+        self._write(normals, metadata)
+
+        logger.info(
+            f"Built climatology normals for {populated} cells from "
+            f"{metadata['days']} station-days"
+        )
+        return metadata
+
+    def _fill_empty_cells(self, normals, lat_min, lon_min) -> int:
+        """Copy normals of the nearest populated cell into empty cells nearby"""
+        has_data = ~np.all(np.isnan(normals), axis=(2, 3))
+        populated = np.argwhere(has_data)
+        empty = np.argwhere(~has_data)
+        if len(populated) and len(empty):
+
+            def centres(cells):
+                return np.radians(
+                    np.column_stack(
+                        [
+                            lat_min + (cells[:, 0] + 0.5) * self.resolution,
+                            lon_min + (cells[:, 1] + 0.5) * self.resolution,
+                        ]
+                    )
+                )
+
+            tree = BallTree(centres(populated), metric="haversine")
+            distances, nearest = tree.query(centres(empty), k=1)
+            close = distances[:, 0] * EARTH_RADIUS_KM <= FILL_RADIUS_KM
+            source = populated[nearest[close, 0]]
+            target = empty[close]
+            normals[target[:, 0], target[:, 1]] = normals[source[:, 0], source[:, 1]]
+
+        return int(len(populated))
+
+    def _write(self, normals: np.ndarray, metadata: Dict):
+        """Atomically replace the normals array and its metadata"""
+        array_path, meta_path = _normals_paths()
+        tmp_array = array_path.with_suffix(".tmp.npy")
+        tmp_meta = meta_path.with_suffix(".tmp.json")
+
+        np.save(tmp_array, normals)
+        with open(tmp_meta, "w") as f:
+            json.dump(metadata, f)
+
+        os.replace(tmp_array, array_path)
+        os.replace(tmp_meta, meta_path)
+
+
+class ClimatologyNormals:
+    """Read-only, memory-mapped view of the precomputed normals"""
+
+    _lock = threading.Lock()
+    _loaded = None  # (mtime, ClimatologyNormals)
+
+    @classmethod
+    def load(cls) -> Optional["ClimatologyNormals"]:
+        """Return the current normals, remapping the file when it was rebuilt"""
+        array_path, meta_path = _normals_paths()
+        try:
+            mtime = os.path.getmtime(array_path)
+        except OSError:
+            return None
+
+        with cls._lock:
+            if cls._loaded is None or cls._loaded[0] != mtime:
+                with open(meta_path) as f:
+                    metadata = json.load(f)
+                normals = np.load(array_path, mmap_mode="r")
+                cls._loaded = (mtime, cls(normals, metadata))
+            return cls._loaded[1]
+
+    def __init__(self, normals: np.ndarray, metadata: Dict):
+        self.normals = normals
+        self.metadata = metadata
+        self.lat_min = metadata["lat_min"]
+        self.lon_min = metadata["lon_min"]
+        self.resolution = metadata["resolution"]
+
+    def cell(self, lat: float, lon: float) -> Optional[np.ndarray]:
+        """O(1) lookup of the (periods, statistics) normals for a coordinate"""
+        row = int((lat - self.lat_min) // self.resolution)
+        col = int((lon - self.lon_min) // self.resolution)
+        if not (0 <= row < self.normals.shape[0] and 0 <= col < self.normals.shape[1]):
+            return None
+
+        values = np.asarray(self.normals[row, col])
+        if np.all(np.isnan(values)):
+            return None
+        return values
+
+    def window_patterns(
+        self, cell: np.ndarray, start_date: date, end_date: date
+    ) -> Optional[Dict]:
+        """Historical-pattern summary for a date window from weekly normals.
+
+        Matches the shape returned by ForecastAnalyzer._get_historical_patterns,
+        with total_rainfall expressed per 90 days.
+        """
+        total_days = max((end_date - start_date).days, 1)
+        periods = np.array(
+            [
+                week_period(start_date + timedelta(days=d))
+                for d in range(0, total_days, 7)
+            ]
+        )
+        weekly = cell[periods]
+
+        temp_mean = weekly[:, STAT_INDEX["temperature_mean"]]
+        if np.all(np.isnan(temp_mean)):
+            # Fall back to monthly normals when weekly coverage is missing
+            months = np.array(
+                [
+                    (start_date + timedelta(days=d)).month - 1
+                    for d in range(0, total_days, 7)
+                ]
+            )
+            weekly = cell[months]
+            temp_mean = weekly[:, STAT_INDEX["temperature_mean"]]
+            if np.all(np.isnan(temp_mean)):
+                return None
+
+        rain_daily = np.nanmean(weekly[:, STAT_INDEX["rainfall_daily_mean"]])
+        humidity = np.nanmean(weekly[:, STAT_INDEX["humidity_p50"]])
+        rain_p90 = np.nanmean(weekly[:, STAT_INDEX["rainfall_daily_p90"]])
+
+        return {
+            "avg_temperature": float(np.nanmean(temp_mean)),
+            "temperature_std": float(
+                np.nanmean(weekly[:, STAT_INDEX["temperature_std"]])
+            ),
+            "total_rainfall": float(rain_daily * 90),
+            "avg_humidity": float(humidity),
+            "rainfall_pattern": (
+                "regular" if rain_p90 < 2 * max(rain_daily, 1e-6) else "irregular"
+            ),
+        }
@@ -2,6 +2,8 @@ import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from .models import WeatherForecast, CropWeatherRequirement, WeatherData
+from .station_index import get_station_index, FALLBACK_RADIUS_KM
+from .climatology import ClimatologyNormals
 import logging
 
 logger = logging.getLogger(__name__)
@@ -56,8 +58,16 @@ class ForecastAnalyzer:
         try:
             crop_req = CropWeatherRequirement.objects.get(crop_name=crop_name)
 
-            # Get historical weather patterns
-            historical_data = self._get_historical_patterns(lat, lon)
+            # Precomputed climatology normals for the location's grid cell
+            normals = ClimatologyNormals.load()
+            normals_cell = normals.cell(lat, lon) if normals else None
+
+            # Get historical weather patterns when no normals cover the location
+            historical_data = (
+                self._get_historical_patterns(lat, lon)
+                if normals_cell is None
+                else None
+            )
 
             # Analyze forecast for planting conditions
             planting_windows = []
@@ -67,6 +77,11 @@ class ForecastAnalyzer:
                 window_start = current_date + timedelta(days=i)
                 window_end = window_start + timedelta(days=crop_req.growth_period_days)
 
+                if normals_cell is not None:
+                    historical_data = normals.window_patterns(
+                        normals_cell, window_start, window_end
+                    ) or self._get_historical_patterns(lat, lon)
+
                 window_score = self._calculate_planting_score(
                     window_start, window_end, crop_req, historical_data
                 )
@@ -99,9 +114,11 @@ class ForecastAnalyzer:
     ) -> Dict:
         """Analyze risk of extreme weather events"""
         try:
+            station = get_station_index().resolve_station(
+                lat, lon, max_distance_km=FALLBACK_RADIUS_KM
+            )
             forecasts = WeatherForecast.objects.filter(
-                station__latitude=lat,
-                station__longitude=lon,
+                station=station,
                 forecast_date__gte=datetime.now().date(),
                 forecast_date__lt=datetime.now().date() + timedelta(days=days),
             )
@@ -298,9 +315,11 @@ class ForecastAnalyzer:
         """Get historical weather patterns for a location"""
         try:
             # Get last 90 days of weather data
+            station = get_station_index().resolve_station(
+                lat, lon, max_distance_km=FALLBACK_RADIUS_KM
+            )
             historical = WeatherData.objects.filter(
-                station__latitude=lat,
-                station__longitude=lon,
+                station=station,
                 timestamp__gte=datetime.now() - timedelta(days=90),
             )
 
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from Apps.WeatherIntegration.climatology import (
+    ClimatologyBuilder,
+    DEFAULT_RESOLUTION_DEG,
+)
+
+
+class Command(BaseCommand):
+    help = "Precompute gridded monthly and weekly climate normals from WeatherData"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--years", type=int, default=10, help="Years of history to include"
+        )
+        parser.add_argument(
+            "--resolution",
+            type=float,
+            default=DEFAULT_RESOLUTION_DEG,
+            help="Grid cell size in degrees",
+        )
+
+    def handle(self, *args, **options):
+        builder = ClimatologyBuilder(resolution=options["resolution"])
+        result = builder.build(years=options["years"])
+
+        if "error" in result:
+            self.stdout.write(self.style.WARNING(result["error"]))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built normals for {result['populated_cells']} cells "
+                f"from {result['stations']} stations ({result['days']} station-days)"
+            )
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from Apps.WeatherIntegration.risk_scanner import ExtremeWeatherScanner
+
+
+class Command(BaseCommand):
+    help = "Scan upcoming forecasts of all stations and generate extreme weather alerts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=7, help="Forecast window to scan (days)"
+        )
+
+    def handle(self, *args, **options):
+        summary = ExtremeWeatherScanner().scan(days=options["days"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scanned {summary['forecasts']} forecasts for "
+                f"{summary['stations']} stations: {summary['created']} alerts "
+                f"created, {summary['updated']} updated, "
+                f"{summary['deactivated']} deactivated"
+            )
+        )
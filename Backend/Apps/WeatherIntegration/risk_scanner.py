@@ -0,0 +1,327 @@
+import logging
+import time
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import WeatherStation, WeatherForecast, WeatherAlert
+
+logger = logging.getLogger(__name__)
+
+# Thresholds shared with ForecastAnalyzer.analyze_extreme_weather_risk
+HEAT_WAVE_TEMP = 40
+HEAT_WAVE_HIGH_TEMP = 45
+COLD_WAVE_TEMP = 5
+COLD_WAVE_HIGH_TEMP = 0
+HEAVY_RAIN_MM = 100
+HEAVY_RAIN_HIGH_MM = 150
+STRONG_WIND_MS = 15
+STRONG_WIND_HIGH_MS = 20
+DROUGHT_RAIN_MM = 10
+DROUGHT_MIN_DAYS = 7
+
+RISK_TYPES = ["heat_wave", "cold_wave", "heavy_rainfall", "drought", "strong_winds"]
+
+RISK_TITLES = {
+    "heat_wave": "Heat wave expected",
+    "cold_wave": "Cold wave expected",
+    "heavy_rainfall": "Heavy rainfall expected",
+    "drought": "Dry spell expected",
+    "strong_winds": "Strong winds expected",
+}
+
+# Analyzer severity -> WeatherAlert.severity
+SEVERITY_MAP = {"high": "severe", "medium": "warning"}
+REVERSE_SEVERITY_MAP = {"severe": "high", "extreme": "high", "warning": "medium"}
+
+LAST_SCAN_CACHE_KEY = "extreme_weather_last_scan"
+LAST_SCAN_TIMEOUT = 86400  # Precomputed alerts are trusted for a day
+
+
+class ExtremeWeatherScanner:
+    """Batch extreme-weather risk evaluation across all stations"""
+
+    def scan(self, days: int = 7) -> Dict:
+        """Evaluate upcoming forecasts of every station and sync WeatherAlert rows"""
+        started = time.perf_counter()
+        today = timezone.localdate()
+        window_end = today + timedelta(days=days)
+
+        rows = list(
+            WeatherForecast.objects.filter(
+                station__is_active=True,
+                forecast_date__gte=today,
+                forecast_date__lt=window_end,
+            )
+            .order_by("station_id", "forecast_date")
+            .values_list(
+                "station_id",
+                "forecast_date",
+                "temperature_max",
+                "temperature_min",
+                "precipitation_amount",
+                "wind_speed",
+            )
+        )
+
+        if not rows:
+            self._record_scan(days)
+            return {
+                "stations": 0,
+                "forecasts": 0,
+                "created": 0,
+                "updated": 0,
+                "deactivated": 0,
+            }
+
+        station_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        day_offsets = np.array([(r[1] - today).days for r in rows], dtype=np.int64)
+        values = np.array([r[2:] for r in rows], dtype=np.float64)
+
+        # Collapse intraday rows into one record per (station, day)
+        keys = station_ids * (days + 1) + day_offsets
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        day_station = station_ids[starts]
+        day_offset = day_offsets[starts]
+        temp_max = np.maximum.reduceat(values[:, 0], starts)
+        temp_min = np.minimum.reduceat(values[:, 1], starts)
+        rainfall = np.add.reduceat(values[:, 2], starts)
+        wind = np.maximum.reduceat(values[:, 3], starts)
+
+        candidates = []
+        daily_rules = [
+            (
+                "heat_wave",
+                temp_max > HEAT_WAVE_TEMP,
+                temp_max > HEAT_WAVE_HIGH_TEMP,
+                temp_max,
+                "°C",
+            ),
+            (
+                "cold_wave",
+                temp_min < COLD_WAVE_TEMP,
+                temp_min < COLD_WAVE_HIGH_TEMP,
+                temp_min,
+                "°C",
+            ),
+            (
+                "heavy_rainfall",
+                rainfall > HEAVY_RAIN_MM,
+                rainfall > HEAVY_RAIN_HIGH_MM,
+                rainfall,
+                " mm",
+            ),
+            (
+                "strong_winds",
+                wind > STRONG_WIND_MS,
+                wind > STRONG_WIND_HIGH_MS,
+                wind,
+                " m/s",
+            ),
+        ]
+        for alert_type, triggered, high, measure, unit in daily_rules:
+            for i in np.flatnonzero(triggered):
+                start = self._day_start(today + timedelta(days=int(day_offset[i])))
+                candidates.append(
+                    {
+                        "station_id": int(day_station[i]),
+                        "alert_type": alert_type,
+                        "severity": SEVERITY_MAP["high" if high[i] else "medium"],
+                        "start_time": start,
+                        "end_time": start + timedelta(days=1),
+                        "value": f"{measure[i]:.1f}{unit}",
+                    }
+                )
+
+        # Drought: low total rainfall from today over each horizon of at least
+        # a week, so a shorter request is answered from its own total
+        if days >= DROUGHT_MIN_DAYS:
+            unique_stations, station_rows = np.unique(day_station, return_inverse=True)
+            daily_rain = np.zeros((len(unique_stations), days))
+            np.add.at(daily_rain, (station_rows, day_offset), rainfall)
+            totals = np.cumsum(daily_rain, axis=1)
+            start = self._day_start(today)
+            for horizon in range(DROUGHT_MIN_DAYS, days + 1):
+                horizon_totals = totals[:, horizon - 1]
+                for i in np.flatnonzero(horizon_totals < DROUGHT_RAIN_MM):
+                    candidates.append(
+                        {
+                            "station_id": int(unique_stations[i]),
+                            "alert_type": "drought",
+                            "severity": SEVERITY_MAP["medium"],
+                            "start_time": start,
+                            "end_time": self._day_start(
+                                today + timedelta(days=horizon)
+                            ),
+                            "value": f"{horizon_totals[i]:.1f} mm over {horizon} days",
+                        }
+                    )
+
+        created, updated, deactivated = self._sync_alerts(candidates, today, window_end)
+        self._record_scan(days)
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Extreme weather scan: {len(rows)} forecasts, {len(candidates)} risks, "
+            f"{created} new alerts in {elapsed:.2f}s"
+        )
+
+        return {
+            "stations": int(len(np.unique(station_ids))),
+            "forecasts": len(rows),
+            "risks": len(candidates),
+            "created": created,
+            "updated": updated,
+            "deactivated": deactivated,
+            "elapsed_seconds": round(elapsed, 3),
+        }
+
+    def get_station_risks(
+        self, station: Optional[WeatherStation], days: int = 7
+    ) -> Optional[Dict]:
+        """Build the extreme_weather_risk response from precomputed alerts.
+
+        Returns None when no recent scan exists, so callers can fall back to
+        on-demand analysis.
+        """
+        last_scan = cache.get(LAST_SCAN_CACHE_KEY)
+        if last_scan is None or last_scan["days"] < days:
+            return None
+
+        risks = {risk_type: False for risk_type in RISK_TYPES}
+        risks["risk_days"] = []
+        risks["overall_risk"] = "low"
+
+        if station is not None:
+            today = timezone.localdate()
+            alerts = WeatherAlert.objects.filter(
+                station=station,
+                is_active=True,
+                alert_type__in=RISK_TYPES,
+                start_time__gte=self._day_start(today),
+                start_time__lt=self._day_start(today + timedelta(days=days)),
+            ).order_by("start_time")
+
+            drought_end = self._day_start(today + timedelta(days=days))
+            for alert in alerts:
+                # Drought alerts exist per horizon; only this request's counts
+                if alert.alert_type == "drought" and (
+                    days < DROUGHT_MIN_DAYS or alert.end_time != drought_end
+                ):
+                    continue
+                risks[alert.alert_type] = True
+                if alert.alert_type != "drought":
+                    risks["risk_days"].append(
+                        {
+                            "date": timezone.localtime(alert.start_time).date(),
+                            "type": alert.alert_type,
+                            "severity": REVERSE_SEVERITY_MAP.get(
+                                alert.severity, "medium"
+                            ),
+                        }
+                    )
+
+        risk_count = sum(risks[risk_type] for risk_type in RISK_TYPES)
+        if risk_count >= 3:
+            risks["overall_risk"] = "high"
+        elif risk_count >= 1:
+            risks["overall_risk"] = "medium"
+
+        risks["is_precomputed"] = True
+        return risks
+
+    def _sync_alerts(self, candidates, today, window_end):
+        """Bulk-create new alerts, update changed ones and deactivate ones no longer forecast"""
+        existing = {
+            (station_id, alert_type, start_time, end_time): (
+                alert_id,
+                severity,
+                description,
+            )
+            for alert_id, station_id, alert_type, start_time, end_time, severity, description in WeatherAlert.objects.filter(
+                is_active=True,
+                alert_type__in=RISK_TYPES,
+                start_time__gte=self._day_start(today),
+                start_time__lt=self._day_start(window_end),
+            ).values_list(
+                "id",
+                "station_id",
+                "alert_type",
+                "start_time",
+                "end_time",
+                "severity",
+                "description",
+            )
+        }
+
+        new_alerts, changed_alerts = [], []
+        current_keys = set()
+        for candidate in candidates:
+            key = (
+                candidate["station_id"],
+                candidate["alert_type"],
+                candidate["start_time"],
+                candidate["end_time"],
+            )
+            current_keys.add(key)
+            description = (
+                f"{RISK_TITLES[candidate['alert_type']]}: "
+                f"{candidate['value']} forecast"
+            )
+
+            if key in existing:
+                alert_id, severity, stored_description = existing[key]
+                # A forecast that worsened or changed its totals
+                if (severity, stored_description) != (
+                    candidate["severity"],
+                    description,
+                ):
+                    changed_alerts.append(
+                        WeatherAlert(
+                            id=alert_id,
+                            severity=candidate["severity"],
+                            description=description,
+                        )
+                    )
+                continue
+
+            new_alerts.append(
+                WeatherAlert(
+                    station_id=candidate["station_id"],
+                    alert_type=candidate["alert_type"],
+                    severity=candidate["severity"],
+                    title=RISK_TITLES[candidate["alert_type"]],
+                    description=description,
+                    start_time=candidate["start_time"],
+                    end_time=candidate["end_time"],
+                )
+            )
+
+        stale_ids = [
+            alert_id
+            for key, (alert_id, _, _) in existing.items()
+            if key not in current_keys
+        ]
+
+        with transaction.atomic():
+            WeatherAlert.objects.bulk_create(new_alerts, batch_size=1000)
+            WeatherAlert.objects.bulk_update(
+                changed_alerts, ["severity", "description"], batch_size=1000
+            )
+            if stale_ids:
+                WeatherAlert.objects.filter(id__in=stale_ids).update(is_active=False)
+
+        return len(new_alerts), len(changed_alerts), len(stale_ids)
+
+    def _record_scan(self, days: int):
+        cache.set(
+            LAST_SCAN_CACHE_KEY,
+            {"scanned_at": timezone.now(), "days": days},
+            LAST_SCAN_TIMEOUT,
+        )
+
+    @staticmethod
+    def _day_start(day) -> datetime:
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import WeatherStation
+from .station_index import get_station_index
+
+
+@receiver(post_save, sender=WeatherStation)
+@receiver(post_delete, sender=WeatherStation)
+def invalidate_station_index(sender, **kwargs):
+    """Rebuild the nearest-station index after any station change"""
+    get_station_index().invalidate()
@@ -0,0 +1,54 @@
+from typing import Optional
+from Utils.spatial_index import HaversineIndex
+from .models import WeatherStation
+
+# Stations closer than this are treated as the same physical station
+STATION_MATCH_RADIUS_KM = 1.0
+
+# Maximum distance at which a station's data is used as a fallback
+FALLBACK_RADIUS_KM = 50.0
+
+INDEX_VERSION_KEY = "weather_station_index_version"
+
+
+class StationIndex(HaversineIndex):
+    """In-memory haversine BallTree over active weather stations"""
+
+    version_key = INDEX_VERSION_KEY
+    label = "weather station"
+
+    def station_coords(self):
+        """Return (station_ids, coords_deg) arrays backing the current index"""
+        return self.coords()
+
+    def resolve_station(
+        self, lat: float, lon: float, max_distance_km: float = STATION_MATCH_RADIUS_KM
+    ) -> Optional[WeatherStation]:
+        """Resolve coordinates to the nearest station within max_distance_km"""
+        match = self.nearest(lat, lon, k=1, max_distance_km=max_distance_km)
+        if not match:
+            return None
+
+        return WeatherStation.objects.filter(id=match[0][0]).first()
+
+    def get_or_create_station(self, lat: float, lon: float) -> WeatherStation:
+        """Reuse a station within the match radius or register a new one"""
+        station = self.resolve_station(lat, lon)
+        if station is None:
+            station = WeatherStation.objects.create(
+                latitude=lat, longitude=lon, name=f"Station_{lat}_{lon}"
+            )
+        return station
+
+    def _rows(self):
+        return WeatherStation.objects.filter(is_active=True).values_list(
+            "id", "latitude", "longitude"
+        )
+
+
+_station_index = StationIndex()
+
+
+def get_station_index() -> StationIndex:
+    """Return the process-wide station index"""
+    return _station_index
@@ -22,6 +22,8 @@ from .serializers import (
 )
 from .weather_service import WeatherService
 from .forecast_analyzer import ForecastAnalyzer
+from .risk_scanner import ExtremeWeatherScanner
+from .station_index import get_station_index, FALLBACK_RADIUS_KM
 import logging
 
 logger = logging.getLogger(__name__)
@@ -360,7 +362,14 @@ class WeatherAPIViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        analyzer = ForecastAnalyzer()
-        risks = analyzer.analyze_extreme_weather_risk(lat, lon, days)
+        # Serve alerts from the batch scan; analyze on demand if none is recent
+        station = get_station_index().resolve_station(
+            lat, lon, max_distance_km=FALLBACK_RADIUS_KM
+        )
+        risks = ExtremeWeatherScanner().get_station_risks(station, days)
+
+        if risks is None:
+            analyzer = ForecastAnalyzer()
+            risks = analyzer.analyze_extreme_weather_risk(lat, lon, days)
 
         return Response(risks)
@@ -4,7 +4,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from django.conf import settings
 from django.core.cache import cache
-from .models import WeatherStation, WeatherData, WeatherForecast, WeatherAlert
+from .models import WeatherData, WeatherForecast, WeatherAlert
+from .station_index import get_station_index, FALLBACK_RADIUS_KM
 
 logger = logging.getLogger(__name__)
 
@@ -201,9 +202,7 @@ class WeatherService:
     def _save_weather_data(self, data: Dict, lat: float, lon: float):
         """Save weather data to database"""
         try:
-            station, _ = WeatherStation.objects.get_or_create(
-                latitude=lat, longitude=lon, defaults={"name": f"Station_{lat}_{lon}"}
-            )
+            station = get_station_index().get_or_create_station(lat, lon)
 
             WeatherData.objects.update_or_create(
                 station=station, timestamp=data["timestamp"], defaults=data
@@ -214,9 +213,7 @@ class WeatherService:
     def _save_forecast_data(self, forecasts: List[Dict], lat: float, lon: float):
         """Save forecast data to database"""
         try:
-            station, _ = WeatherStation.objects.get_or_create(
-                latitude=lat, longitude=lon, defaults={"name": f"Station_{lat}_{lon}"}
-            )
+            station = get_station_index().get_or_create_station(lat, lon)
 
             for forecast in forecasts:
                 WeatherForecast.objects.update_or_create(
@@ -243,8 +240,10 @@ class WeatherService:
     def _get_fallback_weather(self, lat: float, lon: float) -> Dict:
         """Get fallback weather data from database"""
         try:
-            station = WeatherStation.objects.get(latitude=lat, longitude=lon)
-            latest = station.weather_data.first()
+            station = get_station_index().resolve_station(
+                lat, lon, max_distance_km=FALLBACK_RADIUS_KM
+            )
+            latest = station.weather_data.first() if station else None
 
             if latest:
                 return {
@@ -262,7 +261,12 @@ class WeatherService:
     def _get_fallback_forecast(self, lat: float, lon: float, days: int) -> List[Dict]:
         """Get fallback forecast data from database"""
         try:
-            station = WeatherStation.objects.get(latitude=lat, longitude=lon)
+            station = get_station_index().resolve_station(
+                lat, lon, max_distance_km=FALLBACK_RADIUS_KM
+            )
+            if station is None:
+                return []
+
             forecasts = station.forecasts.all()[:days]
 
             return [
@@ -0,0 +1,266 @@
+import logging
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from django.core.cache import cache
+from django.utils import timezone
+from sklearn.neighbors import BallTree
+from Utils.spatial_index import EARTH_RADIUS_KM
+from .models import WeatherStation, WeatherData, WeatherForecast
+
+logger = logging.getLogger(__name__)
+
+CURRENT_VARIABLES = [
+    "temperature",
+    "humidity",
+    "pressure",
+    "wind_speed",
+    "rainfall",
+    "cloud_coverage",
+]
+
+FORECAST_VARIABLES = [
+    "temperature_min",
+    "temperature_max",
+    "temperature_avg",
+    "humidity",
+    "precipitation_amount",
+    "precipitation_probability",
+    "wind_speed",
+    "cloud_coverage",
+]
+
+# Variables corrected for elevation with the standard atmospheric lapse rate
+TEMPERATURE_VARIABLES = {
+    "temperature",
+    "temperature_min",
+    "temperature_max",
+    "temperature_avg",
+}
+LAPSE_RATE_C_PER_M = 0.0065
+
+SURFACE_CACHE_KEY = "weather_surface"
+SURFACE_CACHE_TIMEOUT = 1800  # 30 minutes, same as WeatherService
+
+
+class WeatherSurface:
+    """Inverse-distance-weighted weather surface built from station data"""
+
+    def __init__(
+        self,
+        station_ids: np.ndarray,
+        coords: np.ndarray,
+        altitudes: np.ndarray,
+        current: np.ndarray,
+        forecast: np.ndarray,
+        forecast_start,
+        built_at: datetime,
+    ):
+        self.station_ids = station_ids
+        self.coords = coords
+        self.altitudes = altitudes
+        # current: (stations, len(CURRENT_VARIABLES)), NaN where missing
+        self.current = current
+        # forecast: (stations, days, len(FORECAST_VARIABLES)), NaN where missing
+        self.forecast = forecast
+        self.forecast_start = forecast_start
+        self.built_at = built_at
+        self._tree = (
+            BallTree(np.radians(coords), metric="haversine") if len(coords) else None
+        )
+
+    @classmethod
+    def build(cls, horizon_days: int = 7, max_age_hours: int = 6) -> "WeatherSurface":
+        """Load the latest observation and upcoming forecasts of every station"""
+        stations = list(
+            WeatherStation.objects.filter(is_active=True).values_list(
+                "id", "latitude", "longitude", "altitude"
+            )
+        )
+        station_ids = np.array([s[0] for s in stations], dtype=np.int64)
+        coords = np.array([[s[1], s[2]] for s in stations], dtype=np.float64).reshape(
+            -1, 2
+        )
+        altitudes = np.array(
+            [np.nan if s[3] is None else s[3] for s in stations], dtype=np.float64
+        )
+        position = {station_id: i for i, station_id in enumerate(station_ids)}
+
+        # Latest observation per station: rows ordered newest-first per station
+        current = np.full((len(stations), len(CURRENT_VARIABLES)), np.nan)
+        observations = (
+            WeatherData.objects.filter(
+                station_id__in=station_ids.tolist(),
+                timestamp__gte=timezone.now() - timedelta(hours=max_age_hours),
+            )
+            .order_by("station_id", "-timestamp")
+            .values_list("station_id", *CURRENT_VARIABLES)
+        )
+        seen = set()
+        for row in observations:
+            if row[0] in seen:
+                continue
+            seen.add(row[0])
+            current[position[row[0]]] = row[1:]
+
+        # Daily forecasts for the horizon
+        start = timezone.now().date()
+        forecast = np.full(
+            (len(stations), horizon_days, len(FORECAST_VARIABLES)), np.nan
+        )
+        rows = WeatherForecast.objects.filter(
+            station_id__in=station_ids.tolist(),
+            forecast_date__gte=start,
+            forecast_date__lt=start + timedelta(days=horizon_days),
+        ).values_list("station_id", "forecast_date", *FORECAST_VARIABLES)
+        for row in rows:
+            forecast[position[row[0]], (row[1] - start).days] = row[2:]
+
+        # Only stations that contribute at least one value take part in the surface
+        has_data = ~np.all(np.isnan(current), axis=1) | ~np.all(
+            np.isnan(forecast), axis=(1, 2)
+        )
+
+        logger.info(
+            f"Built weather surface from {int(has_data.sum())} of {len(stations)} stations"
+        )
+
+        return cls(
+            station_ids=station_ids[has_data],
+            coords=coords[has_data],
+            altitudes=altitudes[has_data],
+            current=current[has_data],
+            forecast=forecast[has_data],
+            forecast_start=start,
+            built_at=timezone.now(),
+        )
+
+    def estimate_many(
+        self,
+        coords: np.ndarray,
+        elevations: Optional[np.ndarray] = None,
+        k: int = 6,
+        power: float = 2.0,
+        max_distance_km: float = 150.0,
+    ) -> Dict[str, np.ndarray]:
+        """Evaluate the surface at many points at once.
+
+        Returns arrays keyed by variable: current values shaped (n,), forecast
+        values under "forecast_<variable>" shaped (n, days), plus
+        "nearest_station_km". Points with no station within max_distance_km get NaN.
+        """
+        coords = np.atleast_2d(np.asarray(coords, dtype=np.float64))
+        n = len(coords)
+        days = self.forecast.shape[1]
+
+        if self._tree is None or n == 0:
+            result = {var: np.full(n, np.nan) for var in CURRENT_VARIABLES}
+            for var in FORECAST_VARIABLES:
+                result[f"forecast_{var}"] = np.full((n, days), np.nan)
+            result["nearest_station_km"] = np.full(n, np.nan)
+            return result
+
+        k = min(k, len(self.station_ids))
+        distances, indices = self._tree.query(np.radians(coords), k=k)
+        distances_km = distances * EARTH_RADIUS_KM
+
+        # Exact station hits get all the weight; distant stations get none
+        weights = 1.0 / np.maximum(distances_km, 1e-6) ** power
+        weights[distances_km > max_distance_km] = 0.0
+
+        elevation_delta = None
+        if elevations is not None:
+            elevations = np.asarray(elevations, dtype=np.float64)
+            station_alt = self.altitudes[indices]
+            elevation_delta = np.where(
+                np.isnan(station_alt) | np.isnan(elevations)[:, None],
+                0.0,
+                station_alt - elevations[:, None],
+            )
+
+        result = {}
+
+        current = self.current[indices]  # (n, k, vars)
+        for v, var in enumerate(CURRENT_VARIABLES):
+            values = current[:, :, v]
+            if elevation_delta is not None and var in TEMPERATURE_VARIABLES:
+                values = values + elevation_delta * LAPSE_RATE_C_PER_M
+            result[var] = self._weighted_mean(values, weights)
+
+        forecast = self.forecast[indices]  # (n, k, days, vars)
+        day_weights = np.broadcast_to(weights[:, :, None], forecast.shape[:3])
+        for v, var in enumerate(FORECAST_VARIABLES):
+            values = forecast[:, :, :, v]
+            if elevation_delta is not None and var in TEMPERATURE_VARIABLES:
+                values = values + elevation_delta[:, :, None] * LAPSE_RATE_C_PER_M
+            result[f"forecast_{var}"] = self._weighted_mean(values, day_weights)
+
+        result["nearest_station_km"] = distances_km[:, 0]
+        return result
+
+    def estimate(
+        self, lat: float, lon: float, elevation: Optional[float] = None, **kwargs
+    ) -> Optional[Dict]:
+        """Estimate current weather and daily forecast at a single point"""
+        values = self.estimate_many(
+            [[lat, lon]],
+            elevations=None if elevation is None else [elevation],
+            **kwargs,
+        )
+        if np.isnan(values["nearest_station_km"][0]):
+            return None
+
+        current = {var: self._to_float(values[var][0]) for var in CURRENT_VARIABLES}
+        if all(value is None for value in current.values()):
+            current = None
+
+        return {
+            "current": current,
+            "forecast": self._forecast_rows(values, 0),
+            "nearest_station_km": round(float(values["nearest_station_km"][0]), 2),
+            "is_interpolated": True,
+            "built_at": self.built_at,
+        }
+
+    def forecast_many(self, coords: np.ndarray, **kwargs) -> List[List[Dict]]:
+        """Per-point daily forecast rows for many coordinates"""
+        values = self.estimate_many(coords, **kwargs)
+        return [
+            self._forecast_rows(values, i) for i in range(len(np.atleast_2d(coords)))
+        ]
+
+    def _forecast_rows(self, values: Dict[str, np.ndarray], i: int) -> List[Dict]:
+        rows = []
+        for day in range(self.forecast.shape[1]):
+            row = {
+                var: self._to_float(values[f"forecast_{var}"][i, day])
+                for var in FORECAST_VARIABLES
+            }
+            if all(value is None for value in row.values()):
+                continue
+            row["date"] = self.forecast_start + timedelta(days=day)
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _weighted_mean(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """NaN-aware weighted mean over the neighbour axis (axis 1)"""
+        valid = ~np.isnan(values)
+        w = np.where(valid, weights, 0.0)
+        total = w.sum(axis=1)
+        weighted = (np.where(valid, values, 0.0) * w).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(total > 0, weighted / total, np.nan)
+
+    @staticmethod
+    def _to_float(value) -> Optional[float]:
+        return None if np.isnan(value) else round(float(value), 2)
+
+
+def get_weather_surface(refresh: bool = False) -> WeatherSurface:
+    """Return the shared weather surface, rebuilding it when the cache expires"""
+    surface = None if refresh else cache.get(SURFACE_CACHE_KEY)
+    if surface is None:
+        surface = WeatherSurface.build()
+        cache.set(SURFACE_CACHE_KEY, surface, SURFACE_CACHE_TIMEOUT)
+    return surface
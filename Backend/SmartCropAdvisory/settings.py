@@ -92,6 +92,10 @@ if IS_RENDER:
     CSRF_TRUSTED_ORIGINS.extend(["https://smartcropadvisory.onrender.com"])
     CSRF_TRUSTED_ORIGINS = list(set(CSRF_TRUSTED_ORIGINS))
 
+# Shared token sensors send first on each connection or datagram to the
+# soil moisture gateway (run_sensor_gateway); required off localhost
+SENSOR_GATEWAY_TOKEN = config("SENSOR_GATEWAY_TOKEN", default="")
+
 # ==========================================
 # 📱 APPLICATION DEFINITION
 # ==========================================
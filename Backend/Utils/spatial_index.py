@@ -0,0 +1,153 @@
+import threading
+import logging
+import numpy as np
+from typing import List, Optional, Tuple
+from django.core.cache import cache
+from sklearn.neighbors import BallTree
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+
+class VersionedIndex:
+    """Process-local index rebuilt when its cache version changes.
+
+    Subclasses set version_key and implement _build(). invalidate() bumps
+    the shared version, so every worker process rebuilds on its next read.
+    """
+
+    version_key = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+
+    def invalidate(self):
+        """Mark the index stale in this and every other worker process"""
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 1, None)
+        with self._lock:
+            self._version = None
+
+    def _ensure_built(self):
+        current_version = cache.get(self.version_key, 0)
+        with self._lock:
+            if self._version != current_version:
+                self._build()
+                self._version = current_version
+            return self._current()
+
+    def _build(self):
+        raise NotImplementedError
+
+    def _current(self):
+        """What _ensure_built returns, read while the lock is held"""
+        return None
+
+
+class HaversineIndex(VersionedIndex):
+    """In-memory haversine BallTree over (id, latitude, longitude) rows.
+
+    Subclasses implement _rows() returning those rows for the current
+    objects; label names them in log messages.
+    """
+
+    label = "spatial"
+
+    def __init__(self):
+        super().__init__()
+        self._tree = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._coords = np.empty((0, 2), dtype=np.float64)
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 1,
+        max_distance_km: Optional[float] = None,
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (id, distance_km) pairs ordered by distance"""
+        tree, ids = self._ensure_built()
+        if tree is None or k < 1:
+            return []
+
+        k = min(k, len(ids))
+        distances, indices = tree.query(self._to_radians(lat, lon), k=k)
+        distances_km = distances[0] * EARTH_RADIUS_KM
+
+        if max_distance_km is not None:
+            keep = distances_km <= max_distance_km
+            indices, distances_km = indices[:, keep], distances_km[keep]
+
+        return list(zip(ids[indices[0]].tolist(), distances_km.tolist()))
+
+    def within_radius(
+        self, lat: float, lon: float, radius_km: float
+    ) -> List[Tuple[int, float]]:
+        """Return all (id, distance_km) pairs within radius_km, nearest first"""
+        tree, ids = self._ensure_built()
+        if tree is None:
+            return []
+
+        indices, distances = tree.query_radius(
+            self._to_radians(lat, lon),
+            r=radius_km / EARTH_RADIUS_KM,
+            return_distance=True,
+            sort_results=True,
+        )
+
+        return list(
+            zip(ids[indices[0]].tolist(), (distances[0] * EARTH_RADIUS_KM).tolist())
+        )
+
+    def nearest_many(
+        self, coords: np.ndarray, k: int = 1
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized k-nearest lookup for an (n, 2) array of lat/lon degrees.
+
+        Returns (ids, distances_km), both shaped (n, k).
+        """
+        tree, ids = self._ensure_built()
+        coords = np.atleast_2d(np.asarray(coords, dtype=np.float64))
+        if tree is None or len(coords) == 0:
+            return (
+                np.empty((len(coords), 0), dtype=np.int64),
+                np.empty((len(coords), 0), dtype=np.float64),
+            )
+
+        k = min(k, len(ids))
+        distances, indices = tree.query(np.radians(coords), k=k)
+        return ids[indices], distances * EARTH_RADIUS_KM
+
+    def coords(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, coords_deg) arrays backing the current index"""
+        self._ensure_built()
+        return self._ids, self._coords
+
+    def _rows(self) -> List[Tuple[int, float, float]]:
+        raise NotImplementedError
+
+    def _build(self):
+        rows = list(self._rows())
+        if not rows:
+            self._tree = None
+            self._ids = np.empty(0, dtype=np.int64)
+            self._coords = np.empty((0, 2), dtype=np.float64)
+            return
+
+        data = np.asarray(rows, dtype=np.float64)
+        self._ids = data[:, 0].astype(np.int64)
+        self._coords = data[:, 1:3]
+        self._tree = BallTree(np.radians(self._coords), metric="haversine")
+        logger.info(f"Built {self.label} index over {len(rows)} entries")
+
+    def _current(self):
+        return self._tree, self._ids
+
+    @staticmethod
+    def _to_radians(lat: float, lon: float) -> np.ndarray:
+        return np.radians([[lat, lon]])